@@ -1,11 +1,14 @@
 """FastAPI backend for the AI Agent."""
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
+import json
 import uvicorn
 
 from config import settings
+from src.executor import RequestExecutor, ServerBusyError
 from src.rag_system import RAGSystem
 
 # Initialize FastAPI app
@@ -27,18 +30,63 @@ app.add_middleware(
 # Initialize RAG system
 rag_system = RAGSystem()
 
+# Blocking RAG calls run here so the event loop stays responsive
+executor = RequestExecutor(
+    max_workers=settings.request_workers,
+    max_queue=settings.request_queue_size
+)
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """Run a blocking RAG call on the worker pool (503 when it is saturated)."""
+    try:
+        return await executor.run(func, *args, **kwargs)
+    except ServerBusyError:
+        raise HTTPException(status_code=503, detail="Serveur surchargé, réessayez plus tard")
+
+
+def sse_event(event: Dict[str, Any]) -> str:
+    """Format an event of RAGSystem.stream_response as a server-sent event."""
+    data = json.dumps(event["data"], ensure_ascii=False)
+    return f"event: {event['event']}\ndata: {data}\n\n"
+
+
+def check_batch_size(items: List[Any]):
+    """Reject batches larger than settings.batch_max_items."""
+    if len(items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Trop d'éléments dans le lot (maximum {settings.batch_max_items})"
+        )
+
 
 # Pydantic models
 class QueryRequest(BaseModel):
     """Request model for queries."""
     query: str
     k: Optional[int] = 5
+    genres: Optional[List[str]] = None
+    min_year: Optional[int] = None
+    max_year: Optional[int] = None
+    min_rating: Optional[float] = None
+    mode: Optional[Literal["vector", "hybrid"]] = None
+
+
+class BatchQueryRequest(BaseModel):
+    """Request model for batched queries."""
+    queries: List[str]
+    k: Optional[int] = 5
+    genres: Optional[List[str]] = None
+    min_year: Optional[int] = None
+    max_year: Optional[int] = None
+    min_rating: Optional[float] = None
 
 
 class ChatRequest(BaseModel):
     """Request model for chat."""
     message: str
     user_profile: Optional[Dict[str, Any]] = None
+    mmr_lambda: Optional[float] = None
 
 
 class ChatResponse(BaseModel):
@@ -51,6 +99,14 @@ class ProfileRequest(BaseModel):
     """Request model for profile-based suggestions."""
     user_profile: Dict[str, Any]
     k: Optional[int] = 4
+    mmr_lambda: Optional[float] = None
+
+
+class BatchProfileRequest(BaseModel):
+    """Request model for batched profile-based suggestions."""
+    user_profiles: List[Dict[str, Any]]
+    k: Optional[int] = 4
+    mmr_lambda: Optional[float] = None
 
 
 @app.on_event("startup")
@@ -62,6 +118,12 @@ async def startup_event():
     print("RAG system ready!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the worker pool."""
+    executor.shutdown(wait=False)
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -69,9 +131,14 @@ async def root():
         "message": "Bienvenue sur l'API de recommandations de films!",
         "endpoints": {
             "/chat": "Envoyer un message au chatbot",
+            "/chat/stream": "Réponse du chatbot en flux (server-sent events)",
             "/search": "Rechercher des films similaires",
+            "/search/batch": "Rechercher pour plusieurs requêtes",
+            "/suggestions/batch": "Suggestions pour plusieurs profils",
+            "/movies/{movie_id}": "Détails d'un film",
             "/reset": "Réinitialiser la conversation",
-            "/health": "Vérifier l'état de l'API"
+            "/health": "Vérifier l'état de l'API",
+            "/stats": "Statistiques des caches"
         }
     }
 
@@ -86,75 +153,204 @@ async def health_check():
     }
 
 
+@app.get("/stats")
+async def cache_stats():
+    """Cache and worker pool statistics."""
+    return {**rag_system.cache_stats(), "executor": executor.stats()}
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, x_session_id: Optional[str] = Header(None)):
     """
     Chat with the AI agent.
     
     Args:
         request: Chat request with user message and optional profile
+        x_session_id: Client session id (X-Session-Id header)
         
     Returns:
         Chat response with answer and sources
     """
     try:
-        response = rag_system.get_response(request.message, request.user_profile)
+        response = await run_in_pool(rag_system.get_response, request.message,
+                                     request.user_profile, session_id=x_session_id,
+                                     mmr_lambda=request.mmr_lambda)
         return ChatResponse(**response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, x_session_id: Optional[str] = Header(None)):
+    """
+    Chat with the AI agent, streaming the answer as server-sent events.
+    
+    Events are "text" (next chunk of the answer), "source" (document of
+    the movie just described) and "done" (whole answer).
+    
+    Args:
+        request: Chat request with user message and optional profile
+        x_session_id: Client session id (X-Session-Id header)
+        
+    Returns:
+        text/event-stream response
+    """
+    events = rag_system.stream_response(request.message, request.user_profile,
+                                        session_id=x_session_id,
+                                        mmr_lambda=request.mmr_lambda)
+    # Retrieval runs on the worker pool with the first event; the movies are
+    # then formatted one by one as the client reads
+    try:
+        first = await run_in_pool(next, events, None)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def body():
+        if first is not None:
+            yield sse_event(first)
+        for event in events:
+            yield sse_event(event)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.post("/search")
-async def search_movies(request: QueryRequest):
+async def search_movies(request: QueryRequest, x_session_id: Optional[str] = Header(None)):
     """
     Search for similar movies.
     
     Args:
         request: Search query and number of results
+        x_session_id: Client session id (X-Session-Id header)
         
     Returns:
         List of similar movies
     """
     try:
-        results = rag_system.search_similar_movies(
+        results = await run_in_pool(
+            rag_system.search_similar_movies,
             query=request.query,
-            k=request.k
+            k=request.k,
+            genres=request.genres,
+            min_year=request.min_year,
+            max_year=request.max_year,
+            min_rating=request.min_rating,
+            session_id=x_session_id,
+            mode=request.mode
         )
         return {
             "query": request.query,
             "results": results
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/search/batch")
+async def search_movies_batch(request: BatchQueryRequest):
+    """
+    Search for similar movies for many queries in one call.
+    
+    Args:
+        request: Search queries, number of results per query and filters
+        
+    Returns:
+        Results of each query, in input order
+    """
+    check_batch_size(request.queries)
+    try:
+        results = await run_in_pool(
+            rag_system.search_similar_movies_batch,
+            request.queries,
+            k=request.k,
+            genres=request.genres,
+            min_year=request.min_year,
+            max_year=request.max_year,
+            min_rating=request.min_rating
+        )
+        return {
+            "results": [
+                {"query": query, "results": query_results}
+                for query, query_results in zip(request.queries, results)
+            ]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/movies/{movie_id}")
+async def get_movie(movie_id: int):
+    """Get a movie from the in-memory catalog."""
+    movie = rag_system.get_movie(movie_id)
+    if movie is None:
+        raise HTTPException(status_code=404, detail="Film introuvable")
+    return movie
+
+
 @app.post("/reset")
-async def reset_conversation():
-    """Reset the conversation history."""
+async def reset_conversation(x_session_id: Optional[str] = Header(None)):
+    """Reset the conversation history of the calling session."""
     try:
-        rag_system.reset_conversation()
+        rag_system.reset_conversation(session_id=x_session_id)
         return {"message": "Conversation réinitialisée avec succès"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/suggestions")
-async def get_suggestions(request: ProfileRequest):
+async def get_suggestions(request: ProfileRequest, x_session_id: Optional[str] = Header(None)):
     """Get movie suggestions based on user profile."""
     try:
-        suggestions = rag_system.get_profile_suggestions(request.user_profile, request.k)
+        suggestions = await run_in_pool(rag_system.get_profile_suggestions,
+                                        request.user_profile, request.k,
+                                        session_id=x_session_id,
+                                        mmr_lambda=request.mmr_lambda)
         return {"suggestions": suggestions}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/suggestions/batch")
+async def get_suggestions_batch(request: BatchProfileRequest):
+    """Get movie suggestions for many profiles in one call (no session state)."""
+    check_batch_size(request.user_profiles)
+    try:
+        suggestions = await run_in_pool(rag_system.get_profile_suggestions_batch,
+                                        request.user_profiles, request.k,
+                                        mmr_lambda=request.mmr_lambda)
+        return {"suggestions": suggestions}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/initialize")
-async def initialize_database():
+async def initialize_database(incremental: bool = True):
     """Initialize or reinitialize the vector database."""
     try:
-        rag_system.initialize_vectorstore()
+        report = await run_in_pool(rag_system.initialize_vectorstore, incremental=incremental)
         rag_system.setup_conversation_chain()
-        return {"message": "Base de données vectorielle initialisée avec succès"}
+        return {
+            "message": "Base de données vectorielle initialisée avec succès",
+            "report": report
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
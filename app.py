@@ -2,8 +2,9 @@
 import streamlit as st
 import requests
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 import json
+import uuid
 from PIL import Image
 from io import BytesIO
 import pandas as pd
@@ -301,6 +302,15 @@ if "show_profile_form" not in st.session_state:
 if "suggestion_refresh" not in st.session_state:
     st.session_state.suggestion_refresh = 0
 
+# Identifies this browser session to the API (recommended movies, history)
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+
+def session_headers() -> Dict[str, str]:
+    """Headers identifying the current session to the API."""
+    return {"X-Session-Id": st.session_state.session_id}
+
 
 def check_api_health():
     """Check if the API is running."""
@@ -311,26 +321,33 @@ def check_api_health():
         return False
 
 
-def send_message(message: str) -> Dict[str, Any]:
-    """Send a message to the chatbot."""
+def stream_message(message: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Send a message to the chatbot and yield the server-sent events of its answer."""
     try:
         # Include user profile in the request
         payload = {
             "message": message,
             "user_profile": st.session_state.user_profile
         }
-        response = requests.post(
-            f"{API_URL}/chat",
+        with requests.post(
+            f"{API_URL}/chat/stream",
             json=payload,
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
+            headers=session_headers(),
+            stream=True,
+            timeout=(5, 30)  # connexion, puis délai maximal entre deux événements
+        ) as response:
+            response.raise_for_status()
+            event, data = "message", []
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data.append(line[len("data:"):].strip())
+                elif not line and data:
+                    yield event, json.loads("\n".join(data))
+                    event, data = "message", []
     except Exception as e:
-        return {
-            "answer": f"Erreur de communication avec l'API: {str(e)}",
-            "source_documents": []
-        }
+        yield "error", {"text": f"Erreur de communication avec l'API: {str(e)}"}
 
 
 def search_movies(query: str, k: int = 5) -> Dict[str, Any]:
@@ -339,6 +356,7 @@ def search_movies(query: str, k: int = 5) -> Dict[str, Any]:
         response = requests.post(
             f"{API_URL}/search",
             json={"query": query, "k": k},
+            headers=session_headers(),
             timeout=30
         )
         response.raise_for_status()
@@ -353,7 +371,7 @@ def search_movies(query: str, k: int = 5) -> Dict[str, Any]:
 def reset_conversation():
     """Reset the conversation history."""
     try:
-        response = requests.post(f"{API_URL}/reset", timeout=10)
+        response = requests.post(f"{API_URL}/reset", headers=session_headers(), timeout=10)
         response.raise_for_status()
         st.session_state.messages = []
         return True
@@ -522,6 +540,7 @@ with st.spinner("Chargement de vos recommandations..."):
         response = requests.post(
             f"{API_URL}/suggestions",
             json={"user_profile": st.session_state.user_profile, "k": 4, "refresh": st.session_state.suggestion_refresh},
+            headers=session_headers(),
             timeout=10
         )
         if response.ok:
@@ -671,9 +690,24 @@ with tab1:
                 "content": user_input
             })
             
-            # Get response
-            with st.spinner("Réflexion en cours..."):
-                response = send_message(user_input)
+            # Show the answer movie by movie as it streams in
+            placeholder = st.empty()
+            placeholder.info("Réflexion en cours...")
+            answer, sources = "", []
+            for event, data in stream_message(user_input):
+                if event in ("text", "error"):
+                    answer += data["text"]
+                    placeholder.markdown(f"""
+                    <div class="chat-message assistant-message">
+                        <b style="color: #2c3e50 !important; font-size: 1.1rem;">🤖 Assistant</b><br>
+                        <span style="color: #2c3e50 !important; font-size: 1rem; line-height: 1.6;">{answer}</span>
+                    </div>
+                    """, unsafe_allow_html=True)
+                elif event == "source":
+                    sources.append(data)
+                elif event == "done":
+                    answer = data["answer"]
+            response = {"answer": answer, "source_documents": sources}
             
             # Add assistant message with movie images from sources
             movie_images = []
@@ -0,0 +1,545 @@
+"""Micro-benchmarks for the retrieval pipeline."""
+import argparse
+import asyncio
+import json
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
+import numpy as np
+
+from src.batching import QueryBatcher
+from src.catalog import MovieCatalog
+from src.data_processor import MovieDataProcessor
+from src.diversity import mmr
+from src.executor import RequestExecutor
+from src.genres import _extract_genres, extract_genres, profile_genre_key
+from src.lexical import LexicalIndex
+from src.rag_system import SimpleLLM
+from src.scoring import match_scores, profile_weights
+from src.vector_index import (
+    VECTOR_BACKENDS, NumpyIndex, QuantizedIndex, SearchHit, build_vector_index, faiss
+)
+
+
+def random_vectors(count, dim, seed=0):
+    """Generate normalized random vectors."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_collection(vectors):
+    """Store vectors in an in-memory Chroma collection."""
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection(f"benchmark_{time.time_ns()}")
+    batch_size = 5000
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        ids = [str(i) for i in range(start, start + len(batch))]
+        collection.add(
+            ids=ids,
+            embeddings=batch.tolist(),
+            documents=[f"Document {i}" for i in ids],
+            metadatas=[{"id": int(i)} for i in ids]
+        )
+    return collection
+
+
+def time_queries(index, queries, k):
+    """Return the mean latency of index.search in milliseconds."""
+    index.search(queries[0], k)  # warm-up
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, k)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def bench_index(args):
+    """Compare per-query latency of the vector backends."""
+    vectors = random_vectors(args.docs, args.dim)
+    queries = random_vectors(args.queries, args.dim, seed=1)
+    collection = make_collection(vectors)
+
+    print(f"{args.docs} documents, dim {args.dim}, {args.queries} queries, k={args.k}")
+    for backend in VECTOR_BACKENDS:
+        if backend == "faiss" and faiss is None:
+            print(f"  {backend:<8} skipped (faiss-cpu not installed)")
+            continue
+        start = time.perf_counter()
+        index = build_vector_index(backend, collection)
+        build_ms = (time.perf_counter() - start) * 1000
+        latency = time_queries(index, queries, args.k)
+        print(f"  {backend:<8} build {build_ms:8.1f} ms   query {latency:8.3f} ms")
+
+
+def allocated_bytes(build):
+    """Return an object and the memory allocated while building it."""
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def bench_catalog(args):
+    """Compare the memory of document dicts with the columnar catalog."""
+    processor = MovieDataProcessor()
+    sample = processor.load_sample_movies()
+    # Serialized copies so that every synthetic movie owns its strings
+    lines = [
+        json.dumps({**sample[i % len(sample)], "id": i + 1})
+        for i in range(args.movies)
+    ]
+
+    def build_dicts():
+        processor.movies_data = [json.loads(line) for line in lines]
+        return processor.format_movies_for_rag()
+
+    documents, dict_bytes = allocated_bytes(build_dicts)
+    pairs = [(doc["content"], doc["metadata"]) for doc in documents]
+    catalog, catalog_bytes = allocated_bytes(lambda: MovieCatalog(pairs))
+
+    print(f"{args.movies} movies")
+    print(f"  dicts    {dict_bytes / args.movies:8.0f} bytes/movie")
+    print(f"  catalog  {catalog_bytes / args.movies:8.0f} bytes/movie "
+          f"(columns {catalog.nbytes / args.movies:.0f}, id lookup included)")
+
+
+def catalog_vectors(docs, noise, seed=0):
+    """
+    Embed the movie catalog with the local model, padded to docs vectors.
+
+    Extra vectors are noisy copies of the catalog vectors, so that the
+    neighbourhood structure stays the one of real movie embeddings.
+    """
+    from src.rag_system import create_embeddings
+    processor = MovieDataProcessor()
+    processor.load_sample_movies()
+    documents = processor.format_movies_for_rag()
+    encoder = create_embeddings()
+    vectors = np.asarray(encoder.embed_documents([doc["content"] for doc in documents]),
+                         dtype=np.float32)
+    queries = np.asarray(encoder.embed_documents(
+        [f"{doc['metadata']['title']} {doc['metadata'].get('genres', '')}" for doc in documents]
+    ), dtype=np.float32)
+    if docs > len(vectors):
+        rng = np.random.default_rng(seed)
+        copies = vectors[rng.integers(0, len(vectors), docs - len(vectors))]
+        copies = copies + noise * rng.standard_normal(copies.shape).astype(np.float32)
+        copies /= np.linalg.norm(copies, axis=1, keepdims=True)
+        vectors = np.vstack([vectors, copies])
+    return vectors, queries
+
+
+def recall_at(index, baseline, queries, k):
+    """Mean share of the float32 top-k found in the top-k of an index."""
+    found = 0
+    for hits, expected in zip(index.search_batch(queries, k), baseline.search_batch(queries, k)):
+        found += len({h.id for h in hits} & {h.id for h in expected})
+    return found / (k * len(queries))
+
+
+def bench_recall(args):
+    """Recall@k, memory and latency of quantized indexes against float32."""
+    if args.source == "catalog":
+        vectors, queries = catalog_vectors(args.docs, args.noise)
+    else:
+        vectors = random_vectors(args.docs, args.dim)
+        queries = random_vectors(args.queries, args.dim, seed=1)
+    queries = queries[:args.queries]
+    ids = np.arange(len(vectors))
+    baseline = NumpyIndex(ids, vectors)
+
+    print(f"{len(vectors)} vectors ({args.source}), dim {vectors.shape[1]}, "
+          f"{len(queries)} queries, rescore factor {args.rescore_factor}")
+    latency = time_queries(baseline, queries, max(args.k))
+    print(f"  float32  {baseline.nbytes / 1024 / 1024:7.1f} MiB   query {latency:7.3f} ms")
+    with tempfile.TemporaryDirectory() as directory:
+        for precision in QuantizedIndex.PRECISIONS:
+            index = QuantizedIndex(ids, vectors, precision, args.rescore_factor, directory)
+            # A factor of 1 re-orders the quantized top-k without widening it
+            scan = QuantizedIndex(ids, vectors, precision, 1)
+            latency = time_queries(index, queries, max(args.k))
+            recalls = "   ".join(
+                f"recall@{k} {recall_at(scan, baseline, queries, k):.3f} -> "
+                f"{recall_at(index, baseline, queries, k):.3f}"
+                for k in args.k
+            )
+            print(f"  {precision:<8} {index.nbytes / 1024 / 1024:7.1f} MiB   "
+                  f"query {latency:7.3f} ms   {recalls}")
+            del index
+
+
+def legacy_extract_genres(query):
+    """Previous per-call implementation: rebuilt map and substring scan."""
+    query_lower = query.lower()
+    genre_map = {
+        "action": ["action"],
+        "aventure": ["adventure", "aventure"],
+        "comédie": ["comedy", "comedie", "comédie"],
+        "drame": ["drama", "drame"],
+        "horreur": ["horror", "horreur", "épouvante"],
+        "science-fiction": ["sci-fi", "science fiction", "science-fiction", "sf"],
+        "thriller": ["thriller", "suspense"],
+        "romance": ["romance", "romantique"],
+        "fantastique": ["fantasy", "fantastique"],
+        "animation": ["animation", "animé"],
+        "crime": ["crime", "policier"],
+        "guerre": ["war", "guerre"],
+        "western": ["western"]
+    }
+    return [
+        genre for genre, keywords in genre_map.items()
+        if any(keyword in query_lower for keyword in keywords)
+    ]
+
+
+def bench_matcher(args):
+    """Per-call cost of genre extraction on short queries and long descriptions."""
+    sample = MovieDataProcessor().load_sample_movies()
+    long_text = " ".join(movie["description"] for movie in sample)
+    long_text = (long_text * (args.chars // max(1, len(long_text)) + 1))[:args.chars]
+    texts = {
+        "query": "Recommande-moi une comédie romantique ou un film de science-fiction",
+        f"{args.chars} chars": long_text,
+    }
+
+    extractors = (
+        ("legacy", legacy_extract_genres),
+        ("lookup", _extract_genres.__wrapped__),  # bypasses the text cache
+        ("cached", extract_genres),
+    )
+    print(f"{args.calls} calls per measure")
+    for label, text in texts.items():
+        for name, extract in extractors:
+            seconds = timeit.timeit(lambda: extract(text), number=args.calls)
+            print(f"  {label:<12} {name:<9} {seconds / args.calls * 1e6:8.2f} µs/call")
+
+
+def legacy_match_score(user_profile, metadata):
+    """Previous per-suggestion implementation: JSON parse and Python sum."""
+    preferences = user_profile.get("genres", {}) or {}
+    if not preferences:
+        return 0.0
+    genres = metadata.get("genre", []) or []
+    if isinstance(genres, str):
+        genres = json.loads(genres)
+    score_raw = sum(preferences.get(profile_genre_key(genre), 0) for genre in genres)
+    return round(min(100.0, score_raw / sum(preferences.values()) * 100), 1)
+
+
+def bench_scoring(args):
+    """Cost of scoring candidates against a profile, per movie vs in one product."""
+    processor = MovieDataProcessor()
+    sample = processor.load_sample_movies()
+    processor.movies_data = [
+        {**sample[i % len(sample)], "id": i + 1} for i in range(args.movies)
+    ]
+    documents = processor.format_movies_for_rag()
+    catalog = MovieCatalog((doc["content"], doc["metadata"]) for doc in documents)
+    profile = {"genres": {"action": 5, "science-fiction": 4, "drame": 3, "horreur": 1}}
+    rng = np.random.default_rng(0)
+
+    print(f"{args.movies} movies, {args.repeat} requests per measure")
+    for count in args.candidates:
+        rows = rng.choice(len(catalog), size=min(count, len(catalog)), replace=False)
+        metadatas = [catalog.metadata(row) for row in rows]
+
+        def legacy():
+            return [legacy_match_score(profile, metadata) for metadata in metadatas]
+
+        def vectorized():
+            weights = profile_weights(profile, catalog.profile_keys)
+            return match_scores(catalog.profile_genre_counts[rows], weights)
+
+        assert legacy() == vectorized().tolist()
+        for name, score in (("legacy", legacy), ("vectorized", vectorized)):
+            seconds = timeit.timeit(score, number=args.repeat)
+            print(f"  {len(rows):>6} candidates  {name:<10} "
+                  f"{seconds / args.repeat * 1e6:10.1f} µs/request")
+
+
+def bench_lexical(args):
+    """Latency of name lookups and BM25 searches on the lexical index."""
+    processor = MovieDataProcessor()
+    sample = processor.load_sample_movies()
+    # Every copy gets its own director so that names stay selective
+    processor.movies_data = [
+        {**sample[i % len(sample)], "id": i + 1,
+         "director": f"{sample[i % len(sample)]['director']} v{i // len(sample)}"}
+        for i in range(args.movies)
+    ]
+    documents = processor.format_movies_for_rag()
+    catalog = MovieCatalog((doc["content"], doc["metadata"]) for doc in documents)
+    started = time.perf_counter()
+    index = LexicalIndex(catalog)
+    build = time.perf_counter() - started
+
+    director = processor.movies_data[len(sample) + 1]["director"]
+    actor = sample[0]["actors"][0]
+    queries = {
+        "director lookup": f"Les films de {director}",
+        "actor lookup": f"avec {actor}",
+        "title lookup": sample[0]["title"],
+        "bm25 search": f"{actor} {director}",
+    }
+    print(f"{args.movies} movies, index built in {build:.2f} s, "
+          f"{index.nbytes / 1024 / 1024:.1f} MiB")
+    for label, query in queries.items():
+        run = index.search if label.startswith("bm25") else index.lookup
+        hits = run(query, args.k)
+        seconds = timeit.timeit(lambda: run(query, args.k), number=args.repeat)
+        print(f"  {label:<16} {seconds / args.repeat * 1e6:8.1f} µs/query "
+              f"({len(hits)} hits)")
+
+
+def legacy_render(documents):
+    """Previous SimpleLLM rendering: description scan and string concatenation."""
+    response = "Voici mes recommandations de films pour vous :\n\n"
+    for i, doc in enumerate(documents[:5], 1):
+        metadata = doc.metadata
+        content = doc.page_content
+        desc_start = content.find("Description: ")
+        if desc_start != -1:
+            desc = content[desc_start + 13:].split("\n")[0]
+        else:
+            desc = content[:500]
+        response += f"{i}. **{metadata.get('title')}** ({metadata.get('year')}) - " \
+                    f"Note: {metadata.get('rating')}/10\n"
+        response += f"   Réalisé par {metadata.get('director')}.\n"
+        response += f"   {desc}\n\n"
+    return response.strip()
+
+
+def bench_render(args):
+    """Chat answer rendering cost for documents of growing length."""
+    sample = MovieDataProcessor().load_sample_movies()[:5]
+    llm = SimpleLLM()
+    print(f"5 results per answer, {args.repeat} answers per measure")
+    for extra in args.extra_chars:
+        processor = MovieDataProcessor()
+        # Long documents: the extra text comes after the description line
+        documents = [
+            (processor.get_movie_text(movie) + "Notes: " + "x" * extra,
+             processor.format_movie_for_rag(movie)["metadata"])
+            for movie in sample
+        ]
+        catalog = MovieCatalog(documents)
+        hits = catalog.hydrate([SearchHit(int(movie["id"]), 1.0) for movie in sample])
+        assert llm.render("", hits) == legacy_render(hits)
+        for name, render in (("legacy", lambda: legacy_render(hits)),
+                             ("snippets", lambda: llm.render("", hits))):
+            seconds = timeit.timeit(render, number=args.repeat)
+            print(f"  {extra:>7} extra chars  {name:<9} "
+                  f"{seconds / args.repeat * 1e6:8.1f} µs/answer")
+
+
+def legacy_mmr(relevance, vectors, k, lambda_mult):
+    """Per-candidate greedy loop recomputing similarities to every pick."""
+    relevance = np.asarray(relevance, dtype=np.float32)
+    relevance = (relevance - relevance.min()) / (relevance.max() - relevance.min())
+    picked = [int(np.argmax(relevance))]
+    while len(picked) < min(k, len(vectors)):
+        best, best_score = None, -np.inf
+        for i in range(len(vectors)):
+            if i in picked:
+                continue
+            redundancy = max(float(np.dot(vectors[i], vectors[j])) for j in picked)
+            score = lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        picked.append(best)
+    return picked
+
+
+def bench_mmr(args):
+    """Cost of MMR diversity re-ranking over candidate vectors."""
+    print(f"dim {args.dim}, lambda {args.lambda_mult}, {args.repeat} runs per measure")
+    for count in args.candidates:
+        vectors = random_vectors(count, args.dim)
+        relevance = np.random.default_rng(1).random(count)
+        for k in args.k:
+            assert mmr(relevance, vectors, k, args.lambda_mult).tolist() == \
+                legacy_mmr(relevance, vectors, k, args.lambda_mult)
+            for name, run in (("legacy", lambda: legacy_mmr(relevance, vectors, k, args.lambda_mult)),
+                              ("vectorized", lambda: mmr(relevance, vectors, k, args.lambda_mult))):
+                seconds = timeit.timeit(run, number=args.repeat)
+                print(f"  {count:>5} candidates  k={k:<3} {name:<10} "
+                      f"{seconds / args.repeat * 1e6:10.1f} µs")
+
+
+class SyntheticEncoder:
+    """
+    Stand-in for the transformer: a fixed cost per call plus a cost per text,
+    one call at a time (the model saturates the CPU).
+    """
+
+    def __init__(self, call_ms, text_ms):
+        self.call_ms = call_ms
+        self.text_ms = text_ms
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            time.sleep((self.call_ms + self.text_ms * len(texts)) / 1000)
+        return [[0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def run_clients(embed, clients, per_client):
+    """Return the queries per second served to concurrent clients."""
+    def client(i):
+        for j in range(per_client):
+            embed(f"requête {i} {j}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    return clients * per_client / (time.perf_counter() - start)
+
+
+def run_pool_clients(embed, clients, per_client, workers):
+    """Return the queries per second when clients go through the API worker pool."""
+    executor = RequestExecutor(max_workers=workers, max_queue=clients)
+
+    async def client(i):
+        for j in range(per_client):
+            await executor.run(embed, f"requête {i} {j}")
+
+    async def run():
+        await asyncio.gather(*(client(i) for i in range(clients)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+    return clients * per_client / elapsed
+
+
+def bench_batching(args):
+    """Compare per-query encoding with micro-batched encoding under concurrency."""
+    if args.encoder == "synthetic":
+        encoder = SyntheticEncoder(args.call_ms, args.text_ms)
+    else:
+        from src.rag_system import create_embeddings
+        encoder = create_embeddings()
+        encoder.embed_query("warm-up")
+
+    print(f"{args.clients} clients x {args.queries} queries, encoder {args.encoder}")
+    direct = run_clients(encoder.embed_query, args.clients, args.queries)
+    print(f"  direct   {direct:8.1f} queries/s")
+
+    batcher = QueryBatcher(encoder.embed_documents, max_batch_size=args.batch_size,
+                           max_wait=args.window_ms / 1000)
+    batched = run_clients(batcher.embed, args.clients, args.queries)
+    stats = batcher.stats()
+    batcher.close()
+    print(f"  batched  {batched:8.1f} queries/s   x{batched / direct:.1f} "
+          f"(window {stats['window_ms']} ms, max batch {stats['max_batch_size']}, "
+          f"mean batch {stats['mean_batch_size']}, mean wait {stats['mean_wait_ms']} ms)")
+
+    # Through the RequestExecutor of the API: the pool caps the queries in flight
+    print(f"  through the API worker pool ({args.clients} clients)")
+    for workers in sorted({4, args.batch_size}):
+        direct = run_pool_clients(encoder.embed_query, args.clients, args.queries, workers)
+        batcher = QueryBatcher(encoder.embed_documents, max_batch_size=args.batch_size,
+                               max_wait=args.window_ms / 1000)
+        batched = run_pool_clients(batcher.embed, args.clients, args.queries, workers)
+        stats = batcher.stats()
+        batcher.close()
+        print(f"    {workers:>3} workers  direct {direct:8.1f} queries/s   "
+              f"batched {batched:8.1f} queries/s   x{batched / direct:.1f} "
+              f"(mean batch {stats['mean_batch_size']})")
+
+    # A lone client should not pay the batching window
+    batcher = QueryBatcher(encoder.embed_documents, max_batch_size=args.batch_size,
+                           max_wait=args.window_ms / 1000)
+    single = run_clients(batcher.embed, 1, args.queries)
+    batcher.close()
+    alone = run_clients(encoder.embed_query, 1, args.queries)
+    print(f"  single client  direct {1000 / alone:6.2f} ms/query   "
+          f"batched {1000 / single:6.2f} ms/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="vector backend latency")
+    index_parser.add_argument("--docs", type=int, default=20000)
+    index_parser.add_argument("--dim", type=int, default=384)
+    index_parser.add_argument("--queries", type=int, default=200)
+    index_parser.add_argument("--k", type=int, default=50)
+    index_parser.set_defaults(func=bench_index)
+
+    catalog_parser = subparsers.add_parser("catalog", help="catalog memory per movie")
+    catalog_parser.add_argument("--movies", type=int, default=50000)
+    catalog_parser.set_defaults(func=bench_catalog)
+
+    recall_parser = subparsers.add_parser("recall", help="quantized index recall and memory")
+    recall_parser.add_argument("--source", choices=["catalog", "random"], default="catalog")
+    recall_parser.add_argument("--docs", type=int, default=20000)
+    recall_parser.add_argument("--dim", type=int, default=384, help="random source only")
+    recall_parser.add_argument("--noise", type=float, default=0.05,
+                               help="noise of the padded catalog copies")
+    recall_parser.add_argument("--queries", type=int, default=100)
+    recall_parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    recall_parser.add_argument("--rescore-factor", type=int, default=4)
+    recall_parser.set_defaults(func=bench_recall)
+
+    matcher_parser = subparsers.add_parser("matcher", help="genre extraction cost per call")
+    matcher_parser.add_argument("--calls", type=int, default=20000)
+    matcher_parser.add_argument("--chars", type=int, default=2000)
+    matcher_parser.set_defaults(func=bench_matcher)
+
+    scoring_parser = subparsers.add_parser("scoring", help="profile match scoring cost")
+    scoring_parser.add_argument("--movies", type=int, default=20000)
+    scoring_parser.add_argument("--candidates", type=int, nargs="+", default=[4, 100, 1000, 20000])
+    scoring_parser.add_argument("--repeat", type=int, default=20)
+    scoring_parser.set_defaults(func=bench_scoring)
+
+    lexical_parser = subparsers.add_parser("lexical", help="name lookup latency")
+    lexical_parser.add_argument("--movies", type=int, default=20000)
+    lexical_parser.add_argument("--k", type=int, default=5)
+    lexical_parser.add_argument("--repeat", type=int, default=1000)
+    lexical_parser.set_defaults(func=bench_lexical)
+
+    render_parser = subparsers.add_parser("render", help="chat answer rendering cost")
+    render_parser.add_argument("--extra-chars", type=int, nargs="+", default=[0, 10000, 100000])
+    render_parser.add_argument("--repeat", type=int, default=2000)
+    render_parser.set_defaults(func=bench_render)
+
+    mmr_parser = subparsers.add_parser("mmr", help="diversity re-ranking cost")
+    mmr_parser.add_argument("--candidates", type=int, nargs="+", default=[20, 100, 500])
+    mmr_parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    mmr_parser.add_argument("--dim", type=int, default=384)
+    mmr_parser.add_argument("--lambda-mult", type=float, default=0.5)
+    mmr_parser.add_argument("--repeat", type=int, default=200)
+    mmr_parser.set_defaults(func=bench_mmr)
+
+    batching_parser = subparsers.add_parser("batching", help="query micro-batching throughput")
+    batching_parser.add_argument("--clients", type=int, default=32)
+    batching_parser.add_argument("--queries", type=int, default=8)
+    batching_parser.add_argument("--batch-size", type=int, default=32)
+    batching_parser.add_argument("--window-ms", type=float, default=5)
+    batching_parser.add_argument("--encoder", choices=["model", "synthetic"], default="model")
+    batching_parser.add_argument("--call-ms", type=float, default=8,
+                                 help="synthetic encoder cost per call")
+    batching_parser.add_argument("--text-ms", type=float, default=0.5,
+                                 help="synthetic encoder cost per text")
+    batching_parser.set_defaults(func=bench_batching)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -34,6 +34,81 @@ class Settings(BaseSettings):
     temperature: float = 0.7
     max_tokens: int = 500
     
+    # Embedding Cache Settings
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+    embedding_cache_directory: str = os.getenv(
+        "EMBEDDING_CACHE_DIRECTORY",
+        "./data/embedding_cache"
+    )
+    embedding_cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+    
+    # Query Embedding Cache Settings (0 = no byte limit / no expiry)
+    query_cache_max_entries: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+    query_cache_max_bytes: int = int(os.getenv("QUERY_CACHE_MAX_BYTES", "0"))
+    query_cache_ttl: float = float(os.getenv("QUERY_CACHE_TTL", "0"))
+    
+    # Query Micro-Batching Settings (concurrent queries share one encoder call)
+    query_batch_enabled: bool = os.getenv("QUERY_BATCH_ENABLED", "True").lower() == "true"
+    query_batch_max_size: int = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+    query_batch_window_ms: float = float(os.getenv("QUERY_BATCH_WINDOW_MS", "5"))
+    
+    # Search Result Cache Settings
+    result_cache_max_entries: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+    
+    # Session Settings (per-client recommendation state)
+    session_max_sessions: int = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    session_idle_timeout: float = float(os.getenv("SESSION_IDLE_TIMEOUT", "3600"))
+    session_max_bytes: int = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+    session_history_size: int = int(os.getenv("SESSION_HISTORY_SIZE", "20"))
+    
+    # Request Execution Settings (worker threads for blocking RAG calls; with
+    # micro-batching, enough workers for concurrent queries to fill a batch)
+    request_workers: int = int(os.getenv(
+        "REQUEST_WORKERS",
+        str(query_batch_max_size if query_batch_enabled else min(4, os.cpu_count() or 1))
+    ))
+    request_queue_size: int = int(os.getenv("REQUEST_QUEUE_SIZE", "64"))
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    
+    # Adaptive Retrieval Settings (candidates fetched per search, as multiples of k)
+    retrieval_initial_factor: int = int(os.getenv("RETRIEVAL_INITIAL_FACTOR", "1"))
+    retrieval_growth_factor: int = int(os.getenv("RETRIEVAL_GROWTH_FACTOR", "4"))
+    retrieval_max_candidates: int = int(os.getenv("RETRIEVAL_MAX_CANDIDATES", "500"))
+    
+    # Profile Re-ranking Settings (share of the match score in the ranking, 0 = similarity only)
+    match_rerank_weight: float = float(os.getenv("MATCH_RERANK_WEIGHT", "0"))
+    match_rerank_factor: int = int(os.getenv("MATCH_RERANK_FACTOR", "4"))
+    
+    # Profile Vector Cache Settings (profile vectors keyed by profile hash)
+    profile_cache_max_entries: int = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "4096"))
+    
+    # Diversity Re-ranking Settings (MMR relevance share, 1 = off; k x factor candidates)
+    mmr_lambda: float = float(os.getenv("MMR_LAMBDA", "1"))
+    mmr_factor: int = int(os.getenv("MMR_FACTOR", "4"))
+    
+    # Search Mode Settings ("vector", or "hybrid" = BM25 over names fused with vectors)
+    search_mode: str = os.getenv("SEARCH_MODE", "vector")
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    hybrid_min_coverage: float = float(os.getenv("HYBRID_MIN_COVERAGE", "0.5"))
+    
+    # Vector Index Settings ("chroma", "numpy" or "faiss")
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "numpy")
+    # Quantized numpy index ("float32", "float16" or "int8"), re-scored exactly;
+    # saves memory only with a rescore directory, and scans no faster than float32
+    vector_precision: str = os.getenv("VECTOR_PRECISION", "float32")
+    vector_rescore_factor: int = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+    vector_rescore_directory: str = os.getenv(
+        "VECTOR_RESCORE_DIRECTORY",
+        "./data/vector_index"
+    )
+    
+    # Indexing Settings
+    indexing_batch_size: int = int(os.getenv("INDEXING_BATCH_SIZE", "256"))
+    indexing_commit_size: int = int(os.getenv("INDEXING_COMMIT_SIZE", "2048"))
+    indexing_workers: int = int(os.getenv("INDEXING_WORKERS", "0"))
+    # Rows per collection.get when the search index is loaded from Chroma
+    indexing_read_page_size: int = int(os.getenv("INDEXING_READ_PAGE_SIZE", "2048"))
+    
     # RAG Settings
     chunk_size: int = 1000
     chunk_overlap: int = 200
@@ -1,9 +1,17 @@
 """Fetch movies from TMDB API and update the database."""
-import requests
+import argparse
+import asyncio
+import email.utils
+import hashlib
 import json
 import os
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from src.data_processor import MovieDataProcessor
+
+import httpx
+
+from src.data_processor import MovieDataProcessor, TMDB_JSONL_FILE
 from src.rag_system import RAGSystem
 
 # TMDB API Configuration (free API key)
@@ -11,8 +19,226 @@ TMDB_API_KEY = "8265bd1679663a7ea12ac168da84d2e8"  # Free public key for testing
 TMDB_BASE_URL = "https://api.themoviedb.org/3"
 TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
 LOCAL_IMAGE_DIR = Path("data/images")
+HTTP_CACHE_DIR = Path("data/http_cache")
+HARVEST_DIR = Path("data/harvest")
+
+# Client settings (TMDB allows roughly 50 requests per second per IP)
+MAX_CONCURRENCY = 16
+REQUESTS_PER_SECOND = 40
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+REQUEST_TIMEOUT = 10
+
+
+class RetryableError(Exception):
+    """Transient HTTP error (rate limit or server error)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Asynchronous token-bucket rate limiter."""
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size (defaults to rate)
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ResponseCache:
+    """On-disk cache of API responses, revalidated with ETag/Last-Modified."""
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or HTTP_CACHE_DIR)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, url, params):
+        # The API key is not part of the resource identity
+        items = sorted((k, str(v)) for k, v in (params or {}).items() if k != "api_key")
+        key = hashlib.sha256(json.dumps([url, items]).encode("utf-8")).hexdigest()
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, url, params):
+        """Return the cached entry of a request, or None."""
+        path = self._path(url, params)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def validators(self, entry):
+        """Conditional request headers for a cached entry."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, params, response):
+        """Save a successful response with its validators."""
+        path = self._path(url, params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body": response.json()
+        }
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+
+class HarvestCheckpoint:
+    """
+    Per-page progress of a harvest.
+
+    Each completed page is appended as one JSON line holding its movies, so
+    a torn last line simply means that page is fetched again on resume.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or HARVEST_DIR)
+        self.path = self.directory / "pages.jsonl"
+        self.pages = {}
+
+    def load(self):
+        """Read the pages completed by a previous run."""
+        self.pages = {}
+        if not self.path.exists():
+            return self
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.pages[entry["page"]] = entry["movies"]
+        return self
+
+    def record_page(self, page, movies):
+        """Durably mark a page as completed."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"page": page, "movies": movies}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.pages[page] = movies
+
+    def movies(self):
+        """Movies of all completed pages, in page order."""
+        return [movie for page in sorted(self.pages) for movie in self.pages[page]]
+
+    def clear(self):
+        """Forget the harvest once its result has been saved."""
+        if self.path.exists():
+            self.path.unlink()
+        self.pages = {}
+
+
+def parse_retry_after(value):
+    """
+    Convert a Retry-After header to a delay in seconds.
+
+    Args:
+        value: Header value, either a number of seconds or an HTTP date
+
+    Returns:
+        Seconds to wait (0 for a date in the past), or None if missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+async def get_with_retry(client, url, params=None, limiter=None, headers=None):
+    """
+    GET a URL, retrying rate-limited, server and transport errors with backoff.
+
+    Returns:
+        The response (possibly 304), or None for a non-retryable client error (e.g. 404)
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            response = await client.get(url, params=params, headers=headers)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise RetryableError(
+                    f"HTTP {response.status_code} for {url}",
+                    parse_retry_after(response.headers.get("Retry-After"))
+                )
+            if response.is_error:
+                return None
+            return response
+        except (RetryableError, httpx.TransportError) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = getattr(e, "retry_after", None)
+            if delay is None:
+                delay = RETRY_BACKOFF * (2 ** attempt)
+            await asyncio.sleep(delay)
+
+
+async def get_json(client, url, params, limiter, cache=None):
+    """
+    Fetch a JSON API resource, going through the response cache when given.
 
-def download_image(image_url, movie_id):
+    Returns:
+        Decoded body, or None if the resource does not exist
+    """
+    entry = cache.get(url, params) if cache is not None else None
+    headers = cache.validators(entry) if cache is not None else None
+    response = await get_with_retry(client, url, params=params, limiter=limiter, headers=headers)
+    if response is None:
+        return None
+    if response.status_code == 304 and entry is not None:
+        cache.hits += 1
+        return entry["body"]
+    if cache is not None:
+        cache.misses += 1
+        cache.store(url, params, response)
+    return response.json()
+
+
+async def download_image(client, image_url, movie_id):
     """Download movie poster locally."""
     if not image_url:
         return None
@@ -21,9 +247,14 @@ def download_image(image_url, movie_id):
         LOCAL_IMAGE_DIR.mkdir(parents=True, exist_ok=True)
         local_path = LOCAL_IMAGE_DIR / f"{movie_id}.jpg"
         
+        # Posters never change for a given path, keep the one we have
+        if local_path.exists() and local_path.stat().st_size > 0:
+            return str(local_path)
+        
         # Download image
-        response = requests.get(image_url, timeout=10)
-        response.raise_for_status()
+        response = await get_with_retry(client, image_url)
+        if response is None:
+            raise ValueError("image not found")
         
         # Save locally
         with open(local_path, 'wb') as f:
@@ -35,81 +266,210 @@ def download_image(image_url, movie_id):
         print(f"  ✗ Image download error {movie_id}: {e}")
         return None
 
-def fetch_popular_movies(num_pages=5):
-    """Fetch popular movies from TMDB."""
-    movies = []
-    
-    for page in range(1, num_pages + 1):
-        url = f"{TMDB_BASE_URL}/movie/popular"
-        params = {
-            "api_key": TMDB_API_KEY,
-            "language": "fr-FR",
-            "page": page
-        }
+
+def build_movie_data(movie, details, image_url, local_image_path):
+    """Convert a TMDB movie (details with appended credits) to our movie format."""
+    credits = details.get("credits") or {}
+    
+    # Extract director
+    director = "Unknown"
+    crew = credits.get("crew", [])
+    for member in crew:
+        if member.get("job") == "Director":
+            director = member.get("name", "Unknown")
+            break
+    
+    # Extract top actors
+    cast = credits.get("cast", [])
+    actors = [actor.get("name") for actor in cast[:3]]
+    
+    # Extract genres
+    genres = [g["name"] for g in details.get("genres", [])]
+    
+    return {
+        "id": movie["id"],
+        "title": details.get("title", movie.get("title", "Unknown")),
+        "year": details.get("release_date", "")[:4] if details.get("release_date") else "N/A",
+        "genre": genres,
+        "director": director,
+        "description": details.get("overview", movie.get("overview", "No description available")),
+        "rating": round(details.get("vote_average", 0), 1),
+        "actors": actors,
+        "image_url": image_url,
+        "local_image_path": local_image_path
+    }
+
+
+async def fetch_movie(client, limiter, semaphore, movie, base_url, image_base, cache=None):
+    """
+    Fetch details and credits of one movie in a single request, then its poster.
+
+    Returns:
+        Movie dictionary, or None if TMDB does not know the movie
+
+    Raises:
+        RetryableError, httpx.HTTPError: The movie could not be fetched once
+            retries ran out; it should be fetched again later
+    """
+    async with semaphore:
+        movie_id = movie["id"]
+        details = await get_json(
+            client,
+            f"{base_url}/movie/{movie_id}",
+            {
+                "api_key": TMDB_API_KEY,
+                "language": "fr-FR",
+                "append_to_response": "credits"
+            },
+            limiter,
+            cache
+        )
+        if details is None:
+            return None
         
+        # Download image locally
+        image_url = f"{image_base}{movie['poster_path']}" if movie.get("poster_path") else ""
+        local_image_path = await download_image(client, image_url, movie_id)
+    
+    movie_data = build_movie_data(movie, details, image_url, local_image_path)
+    print(f"✓ Loaded: {movie_data['title']} ({movie_data['year']})")
+    return movie_data
+
+
+async def fetch_page(client, limiter, semaphore, page, base_url, cache=None):
+    """
+    Fetch one page of popular movies.
+
+    Returns:
+        Listed movies, or None if the page could not be fetched
+    """
+    async with semaphore:
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            for movie in data.get("results", []):
-                # Get movie details for more info
-                movie_id = movie["id"]
-                details_url = f"{TMDB_BASE_URL}/movie/{movie_id}"
-                details_params = {
-                    "api_key": TMDB_API_KEY,
-                    "language": "fr-FR"
-                }
-                
-                details_response = requests.get(details_url, params=details_params, timeout=10)
-                if details_response.ok:
-                    details = details_response.json()
-                    
-                    # Get credits for director and actors
-                    credits_url = f"{TMDB_BASE_URL}/movie/{movie_id}/credits"
-                    credits_response = requests.get(credits_url, params={"api_key": TMDB_API_KEY}, timeout=10)
-                    credits = credits_response.json() if credits_response.ok else {}
-                    
-                    # Extract director
-                    director = "Unknown"
-                    crew = credits.get("crew", [])
-                    for member in crew:
-                        if member.get("job") == "Director":
-                            director = member.get("name", "Unknown")
-                            break
-                    
-                    # Extract top actors
-                    cast = credits.get("cast", [])
-                    actors = [actor.get("name") for actor in cast[:3]]
-                    
-                    # Extract genres
-                    genres = [g["name"] for g in details.get("genres", [])]
-                    
-                    # Download image locally
-                    image_url = f"{TMDB_IMAGE_BASE}{movie['poster_path']}" if movie.get("poster_path") else ""
-                    local_image_path = download_image(image_url, movie_id)
-                    
-                    movie_data = {
-                        "id": movie_id,
-                        "title": details.get("title", movie.get("title", "Unknown")),
-                        "year": details.get("release_date", "")[:4] if details.get("release_date") else "N/A",
-                        "genre": genres,
-                        "director": director,
-                        "description": details.get("overview", movie.get("overview", "No description available")),
-                        "rating": round(details.get("vote_average", 0), 1),
-                        "actors": actors,
-                        "image_url": image_url,
-                        "local_image_path": local_image_path
-                    }
-                    
-                    movies.append(movie_data)
-                    print(f"✓ Loaded: {movie_data['title']} ({movie_data['year']})")
-            
-            print(f"Page {page}/{num_pages} completed")
-            
+            data = await get_json(
+                client,
+                f"{base_url}/movie/popular",
+                {"api_key": TMDB_API_KEY, "language": "fr-FR", "page": page},
+                limiter,
+                cache
+            )
         except Exception as e:
             print(f"Error fetching page {page}: {e}")
+            return None
+    return data.get("results", []) if data is not None else []
+
+
+async def fetch_popular_movies_async(num_pages=5, base_url=TMDB_BASE_URL,
+                                     image_base=TMDB_IMAGE_BASE,
+                                     concurrency=MAX_CONCURRENCY,
+                                     requests_per_second=REQUESTS_PER_SECOND,
+                                     cache=None, checkpoint=None):
+    """
+    Fetch popular movies from TMDB concurrently.
+    
+    Args:
+        num_pages: Number of result pages to fetch
+        base_url: TMDB API base URL
+        image_base: Base URL of the posters
+        concurrency: Maximum number of requests in flight
+        requests_per_second: API rate limit
+        cache: Optional ResponseCache for API responses
+        checkpoint: Optional HarvestCheckpoint; completed pages are skipped
+            and every newly completed page is recorded. A page with a
+            movie that failed after all retries is not recorded, so the
+            next run fetches it again
+        
+    Returns:
+        List of movie dictionaries, in page order
+    """
+    limiter = TokenBucket(requests_per_second)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    done_pages = set(checkpoint.pages) if checkpoint is not None else set()
+    todo_pages = [page for page in range(1, num_pages + 1) if page not in done_pages]
+    if done_pages:
+        print(f"Resuming: {len(done_pages)} pages already harvested")
+    
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=limits) as client:
+        listings = await asyncio.gather(*[
+            fetch_page(client, limiter, semaphore, page, base_url, cache)
+            for page in todo_pages
+        ])
+        print(f"{len(todo_pages)} pages fetched")
+        
+        # The popular list shifts between pages, so the same movie can show up twice:
+        # each movie belongs to the first page listing it
+        seen_ids = {
+            movie["id"] for page in done_pages for movie in checkpoint.pages[page]
+        }
+        assigned = {}
+        for page, results in zip(todo_pages, listings):
+            if results is None:
+                continue
+            assigned[page] = []
+            for movie in results:
+                if movie["id"] not in seen_ids:
+                    seen_ids.add(movie["id"])
+                    assigned[page].append(movie)
+        
+        async def harvest_page(page, listed):
+            results = await asyncio.gather(*[
+                fetch_movie(client, limiter, semaphore, movie, base_url, image_base, cache)
+                for movie in listed
+            ], return_exceptions=True)
+            movies, failed = [], []
+            for movie, result in zip(listed, results):
+                if isinstance(result, Exception):
+                    print(f"✗ Error fetching movie {movie['id']}: {result}")
+                    failed.append(movie["id"])
+                elif result is not None:
+                    movies.append(result)
+            # Only successes and definitive 404s complete a page
+            if failed:
+                print(f"Page {page}/{num_pages} incomplete ({len(failed)} movies failed), "
+                      f"it will be fetched again on the next run")
+            else:
+                if checkpoint is not None:
+                    checkpoint.record_page(page, movies)
+                print(f"Page {page}/{num_pages} completed")
+            return page, movies
+        
+        pages = dict(await asyncio.gather(*[
+            harvest_page(page, listed) for page, listed in assigned.items()
+        ]))
+    
+    if checkpoint is not None:
+        pages = {**pages, **checkpoint.pages}
+    return [movie for page in sorted(pages) for movie in pages[page]]
+
+
+def fetch_popular_movies(num_pages=5, **kwargs):
+    """Fetch popular movies from TMDB."""
+    return asyncio.run(fetch_popular_movies_async(num_pages, **kwargs))
+
+
+def harvest_popular_movies(num_pages=5, resume=True, use_cache=True, **kwargs):
+    """
+    Fetch popular movies with per-page checkpoints and cached API responses.
     
+    Args:
+        num_pages: Number of result pages to fetch
+        resume: Continue from the pages completed by an interrupted run
+        use_cache: Revalidate cached API responses instead of downloading them again
+        
+    Returns:
+        List of movie dictionaries, in page order
+    """
+    checkpoint = HarvestCheckpoint()
+    if resume:
+        checkpoint.load()
+    else:
+        checkpoint.clear()
+    cache = ResponseCache() if use_cache else None
+    
+    movies = fetch_popular_movies(num_pages, cache=cache, checkpoint=checkpoint, **kwargs)
+    if cache is not None:
+        print(f"HTTP cache: {cache.hits} not modified, {cache.misses} downloaded")
     return movies
 
 
@@ -120,6 +480,18 @@ def save_to_json(movies, filename="data/tmdb_movies.json"):
     print(f"\n✓ Saved {len(movies)} movies to {filename}")
 
 
+def save_to_jsonl(movies, filename=TMDB_JSONL_FILE):
+    """Save movies to a JSONL catalog, one movie per line."""
+    count = 0
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        for movie in movies:
+            f.write(json.dumps(movie, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(tmp_filename, filename)
+    print(f"\n✓ Saved {count} movies to {filename}")
+
+
 def update_database(movies):
     """Update the vector database with TMDB movies."""
     print("\nInitializing RAG system...")
@@ -137,17 +509,33 @@ def update_database(movies):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch movies from TMDB API")
+    parser.add_argument("--pages", type=int, default=5, help="number of pages (20 movies each)")
+    parser.add_argument("--fresh", action="store_true", help="ignore the checkpoint of a previous run")
+    parser.add_argument("--no-cache", action="store_true", help="do not use cached API responses")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("Fetching movies from TMDB API")
     print("=" * 60)
     
-    # Fetch 5 pages (about 100 movies)
-    movies = fetch_popular_movies(num_pages=5)
+    # Fetch 5 pages (about 100 movies) by default
+    movies = harvest_popular_movies(
+        num_pages=args.pages,
+        resume=not args.fresh,
+        use_cache=not args.no_cache
+    )
     
     print(f"\n✓ Total movies fetched: {len(movies)}")
     
-    # Save to JSON
-    save_to_json(movies)
+    # Save the JSONL catalog, then drop the checkpoint once every page is harvested
+    save_to_jsonl(movies)
+    checkpoint = HarvestCheckpoint().load()
+    missing = [page for page in range(1, args.pages + 1) if page not in checkpoint.pages]
+    if missing:
+        print(f"{len(missing)} pages incomplete, run again to retry them: {missing}")
+    else:
+        checkpoint.clear()
     
     # Update vector database
     update_choice = input("\nUpdate vector database with these movies? (y/n): ")
@@ -0,0 +1,114 @@
+"""Coalesce concurrent query embeddings into batched encoder calls."""
+from typing import Any, Callable, Dict, List, Sequence
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+
+class QueryBatcher:
+    """
+    Collect queries from concurrent requests and embed them together.
+
+    A dispatcher thread takes the first waiting query; when other queries
+    are already queued it keeps collecting for at most max_wait seconds or
+    until max_batch_size queries are queued, then embeds the batch in one
+    call and hands each vector back to its caller. A query arriving alone
+    is embedded at once, so a single client never pays the window; under
+    load, queries pile up while the encoder is busy and form the batches.
+    """
+
+    def __init__(self, embed_many: Callable[[List[str]], Sequence[Any]],
+                 max_batch_size: int = 32, max_wait: float = 0.005):
+        """
+        Args:
+            embed_many: Batched encoder, e.g. Embeddings.embed_documents
+            max_batch_size: Maximum number of queries per encoder call
+            max_wait: Seconds to wait for more queries after the first one
+        """
+        self.embed_many = embed_many
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self.encoded = 0
+        self.largest_batch = 0
+        self.wait_seconds = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._dispatch, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def embed(self, text: str) -> Any:
+        """Embed one query, batched with the queries of concurrent callers."""
+        if self._closed:
+            raise RuntimeError("QueryBatcher is closed")
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self) -> List[Any]:
+        batch = [self._queue.get()]
+        if self._queue.empty():
+            return batch
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch(self):
+        while True:
+            batch = self._collect()
+            if batch[0] is None:
+                return
+            # The close sentinel may arrive in the middle of a batch
+            stop = any(item is None for item in batch)
+            batch = [item for item in batch if item is not None]
+
+            # Identical queries in a batch are encoded once
+            texts = list(dict.fromkeys(text for text, _, _ in batch))
+            started = time.perf_counter()
+            try:
+                vectors = dict(zip(texts, self.embed_many(texts)))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for text, future, _ in batch:
+                    future.set_result(vectors[text])
+
+            with self._lock:
+                self.batches += 1
+                self.queries += len(batch)
+                self.encoded += len(texts)
+                self.largest_batch = max(self.largest_batch, len(batch))
+                self.wait_seconds += sum(started - queued for _, _, queued in batch)
+            if stop:
+                return
+
+    def close(self):
+        """Stop the dispatcher once the queued queries are served."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batching settings and counters."""
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "window_ms": round(self.max_wait * 1000, 3),
+                "batches": self.batches,
+                "queries": self.queries,
+                "encoded": self.encoded,
+                "mean_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "mean_wait_ms": round(self.wait_seconds / self.queries * 1000, 3) if self.queries else 0.0
+            }
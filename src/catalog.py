@@ -0,0 +1,307 @@
+"""Compact, columnar in-memory movie catalog."""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+
+import numpy as np
+
+from src.genres import genre_mask, profile_genre_key
+from src.vector_index import SearchHit
+
+
+class StringColumn:
+    """Immutable list of strings stored as one UTF-8 buffer plus offsets."""
+
+    def __init__(self, values: Iterable[str]):
+        encoded = [(value or "").encode("utf-8") for value in values]
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=self.offsets[1:])
+        self.buffer = b"".join(encoded)
+
+    def __getitem__(self, row: int) -> str:
+        return self.buffer[self.offsets[row]:self.offsets[row + 1]].decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.nbytes
+
+
+class InternedColumn:
+    """Repeated strings stored once and referenced by integer codes."""
+
+    def __init__(self, values: Iterable[str], dtype=np.int32):
+        self.values = []
+        lookup = {}
+        codes = []
+        for value in values:
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(self.values)
+                self.values.append(value)
+            codes.append(code)
+        self.codes = np.asarray(codes, dtype=dtype)
+
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(len(v.encode("utf-8")) for v in self.values)
+
+
+class MovieCatalog:
+    """
+    Movie metadata stored as columns, one row per movie.
+
+    Numbers live in typed NumPy arrays, free text in UTF-8 buffers, directors
+    and genre names are interned, and each movie's genres are also kept as a
+    mask of canonical genres (src.genres) for filtering and as counts per
+    profile genre key for match scoring (src.scoring). The answer snippet of each movie (title and director
+    lines, plus the description kept as a span of the document text) is
+    prepared once for chat rendering. Rows follow the order of the vector
+    index, so a search hit's row hydrates in O(1).
+    """
+
+    def __init__(self, documents: Iterable[Tuple[str, Dict[str, Any]]]):
+        """
+        Args:
+            documents: (content, metadata) pairs as produced by
+                MovieDataProcessor.format_movie_for_rag
+        """
+        ids, ratings, years = [], [], []
+        titles, directors, contents, image_urls, local_paths = [], [], [], [], []
+        genre_lists = []
+        for content, metadata in documents:
+            ids.append(int(metadata["id"]))
+            ratings.append(float(metadata.get("rating") or 0))
+            years.append(self._parse_year(metadata.get("year")))
+            titles.append(metadata.get("title", ""))
+            directors.append(metadata.get("director", ""))
+            contents.append(content or "")
+            image_urls.append(metadata.get("image_url", ""))
+            local_paths.append(metadata.get("local_image_path", ""))
+            genre_lists.append(self._parse_genres(metadata.get("genre")))
+
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.ratings = np.asarray(ratings, dtype=np.float32)
+        self.years = np.asarray(years, dtype=np.int16)
+        self.titles = StringColumn(titles)
+        self.directors = InternedColumn(directors)
+        self.contents = StringColumn(contents)
+        self.image_urls = StringColumn(image_urls)
+        self.local_image_paths = StringColumn(local_paths)
+
+        # Genre names are interned; per-movie lists keep their original order
+        self.genre_names = []
+        genre_lookup = {}
+        codes, lengths = [], []
+        for genres in genre_lists:
+            for genre in genres:
+                if genre not in genre_lookup:
+                    genre_lookup[genre] = len(self.genre_names)
+                    self.genre_names.append(genre)
+                codes.append(genre_lookup[genre])
+            lengths.append(len(genres))
+        self.genre_codes = np.asarray(
+            codes, dtype=np.min_scalar_type(max(len(self.genre_names) - 1, 0))
+        )
+        self.genre_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.genre_offsets[1:])
+
+        # Canonical genre mask per row, whatever the spelling of the names
+        name_masks = np.asarray([genre_mask([name]) for name in self.genre_names] or [0],
+                                dtype=np.uint32)
+        self.genre_masks = np.zeros(len(lengths), dtype=np.uint32)
+        if len(self.genre_codes):
+            rows = np.repeat(np.arange(len(lengths)), lengths)
+            np.bitwise_or.at(self.genre_masks, rows, name_masks[self.genre_codes])
+
+        # Movies × profile genre keys matrix; a key may be counted twice
+        # (thriller and horreur both count for horreur)
+        name_keys = [profile_genre_key(name) for name in self.genre_names]
+        self.profile_keys = sorted(set(name_keys))
+        key_columns = np.asarray(
+            [self.profile_keys.index(key) for key in name_keys] or [0], dtype=np.intp
+        )
+        self.profile_genre_counts = np.zeros((len(lengths), len(self.profile_keys)),
+                                             dtype=np.uint8)
+        if len(self.genre_codes):
+            np.add.at(self.profile_genre_counts,
+                      (rows, key_columns[self.genre_codes]), 1)
+
+        # Answer snippets: formatted header lines, description as byte offsets
+        # into the contents buffer (no copy of the text)
+        headers = []
+        self.description_spans = np.zeros((len(contents), 2), dtype=np.int64)
+        for row, content in enumerate(contents):
+            year = int(self.years[row])
+            headers.append(
+                f"**{titles[row]}** ({year if year else 'N/A'}) - "
+                f"Note: {round(float(self.ratings[row]), 3)}/10\n"
+                f"   Réalisé par {directors[row]}.\n"
+                f"   "
+            )
+            start, end = self._description_span(content)
+            base = self.contents.offsets[row]
+            self.description_spans[row] = (
+                base + len(content[:start].encode("utf-8")),
+                base + len(content[:end].encode("utf-8"))
+            )
+        self.answer_headers = StringColumn(headers)
+
+        self._rows = {movie_id: row for row, movie_id in enumerate(ids)}
+
+    @staticmethod
+    def _parse_year(year: Any) -> int:
+        try:
+            return int(str(year)[:4])
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def _description_span(content: str) -> Tuple[int, int]:
+        """Character span of the description line of a document, or of its start."""
+        start = content.find("Description: ")
+        if start == -1:
+            return 0, min(len(content), 500)
+        start += len("Description: ")
+        end = content.find("\n", start)
+        return start, len(content) if end == -1 else end
+
+    @staticmethod
+    def _parse_genres(genres: Any) -> List[str]:
+        if isinstance(genres, str):
+            try:
+                genres = json.loads(genres)
+            except ValueError:
+                genres = [genres]
+        return [str(genre) for genre in (genres or [])]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row_of(self, movie_id: Any) -> Optional[int]:
+        """Return the row of a movie id, or None if unknown."""
+        try:
+            return self._rows.get(int(movie_id))
+        except (TypeError, ValueError):
+            return None
+
+    def filter_mask(self, genres: int = 0, min_year: Optional[int] = None,
+                    max_year: Optional[int] = None, min_rating: Optional[float] = None,
+                    exclude_ids: Optional[Iterable[Any]] = None) -> Optional[np.ndarray]:
+        """
+        Build the boolean mask of the rows matching structured filters.
+
+        Args:
+            genres: Canonical genre mask (src.genres); rows need one of them
+            min_year: Earliest release year, inclusive
+            max_year: Latest release year, inclusive
+            min_rating: Minimum rating, inclusive
+            exclude_ids: Movie ids to leave out
+
+        Returns:
+            One boolean per row, or None when no filter applies
+        """
+        mask = None
+
+        def restrict(condition):
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+
+        if genres:
+            restrict((self.genre_masks & np.uint32(genres)) != 0)
+        if min_year is not None:
+            restrict(self.years >= min_year)
+        if max_year is not None:
+            # Movies without a known year are kept out of a year range
+            restrict((self.years <= max_year) & (self.years > 0))
+        if min_rating is not None:
+            restrict(self.ratings >= min_rating)
+        if exclude_ids:
+            rows = [row for row in map(self.row_of, exclude_ids) if row is not None]
+            if rows:
+                if mask is None:
+                    mask = np.ones(len(self), dtype=bool)
+                mask[rows] = False
+        return mask
+
+    def genres(self, row: int) -> List[str]:
+        """Genre names of a row, in their original order."""
+        codes = self.genre_codes[self.genre_offsets[row]:self.genre_offsets[row + 1]]
+        return [self.genre_names[code] for code in codes]
+
+    def content(self, row: int) -> str:
+        """Document text of a row."""
+        return self.contents[row]
+
+    def snippet(self, row: int) -> str:
+        """Answer snippet of a row: title line, director line and description."""
+        start, end = self.description_spans[row]
+        return self.answer_headers[row] + self.contents.buffer[start:end].decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        """Rebuild the document metadata of a row."""
+        year = int(self.years[row])
+        metadata = {
+            "id": int(self.ids[row]),
+            "title": self.titles[row],
+            "year": str(year) if year else "N/A",
+            "genre": json.dumps(self.genres(row)),
+            "director": self.directors[row],
+            "rating": round(float(self.ratings[row]), 3)
+        }
+        image_url = self.image_urls[row]
+        if image_url:
+            metadata["image_url"] = image_url
+        local_image_path = self.local_image_paths[row]
+        if local_image_path:
+            metadata["local_image_path"] = local_image_path
+        return metadata
+
+    def get(self, movie_id: Any) -> Optional[Dict[str, Any]]:
+        """Return a movie document ({"content", "metadata"}) by id."""
+        row = self.row_of(movie_id)
+        if row is None:
+            return None
+        return {"content": self.content(row), "metadata": self.metadata(row)}
+
+    def hydrate(self, hits: List[Any]) -> List[SearchHit]:
+        """
+        Build documents for search hits from the catalog.
+
+        The given hits are left untouched, so ranked lists can be cached and
+        shared between requests.
+
+        Args:
+            hits: Search hits carrying a movie id and score
+
+        Returns:
+            New hits with page_content, metadata, snippet and row, for the
+            hits whose id is known to the catalog
+        """
+        hydrated = []
+        for hit in hits:
+            row = self.row_of(hit.id)
+            if row is None:
+                continue
+            hydrated.append(SearchHit(hit.id, hit.score, self.content(row), self.metadata(row),
+                                      row, self.snippet(row)))
+        return hydrated
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the columns (excluding the id lookup)."""
+        return (
+            self.ids.nbytes + self.ratings.nbytes + self.years.nbytes
+            + self.titles.nbytes + self.directors.nbytes + self.contents.nbytes
+            + self.image_urls.nbytes + self.local_image_paths.nbytes
+            + self.genre_codes.nbytes + self.genre_offsets.nbytes
+            + self.genre_masks.nbytes + self.profile_genre_counts.nbytes
+            + self.answer_headers.nbytes + self.description_spans.nbytes
+        )
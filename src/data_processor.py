@@ -1,8 +1,14 @@
 """Data processing module for movie recommendations."""
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Iterable, Optional
 import json
 import os
+import hashlib
+
+
+# Catalog files written by fetch_tmdb_movies.py (JSONL streams, JSON is the legacy format)
+TMDB_JSONL_FILE = "data/tmdb_movies.jsonl"
+TMDB_JSON_FILE = "data/tmdb_movies.json"
 
 
 class MovieDataProcessor:
@@ -11,6 +17,7 @@ class MovieDataProcessor:
     def __init__(self):
         """Initialize the movie data processor."""
         self.movies_data = []
+        self.skipped_movies = 0
         
     def load_sample_movies(self) -> List[Dict[str, Any]]:
         """
@@ -19,8 +26,13 @@ class MovieDataProcessor:
         Returns:
             List of movie dictionaries
         """
-        # Try to load from TMDB JSON first
-        tmdb_file = "data/tmdb_movies.json"
+        # Prefer the JSONL catalog, then the legacy TMDB JSON
+        if os.path.exists(TMDB_JSONL_FILE):
+            self.movies_data = list(self.iter_movies())
+            print(f"✓ Loaded {len(self.movies_data)} movies from TMDB dataset")
+            return self.movies_data
+        
+        tmdb_file = TMDB_JSON_FILE
         if os.path.exists(tmdb_file):
             try:
                 with open(tmdb_file, 'r', encoding='utf-8') as f:
@@ -169,6 +181,69 @@ class MovieDataProcessor:
         
         return self.movies_data
     
+    def validate_movie(self, movie: Any) -> Optional[Dict[str, Any]]:
+        """
+        Check a raw catalog record and fill in missing optional fields.
+        
+        Args:
+            movie: Decoded catalog record
+            
+        Returns:
+            Movie dictionary, or None if the record has no usable id or title
+        """
+        if not isinstance(movie, dict) or not movie.get("title"):
+            return None
+        try:
+            movie_id = int(movie["id"])
+            rating = float(movie.get("rating") or 0)
+        except (KeyError, TypeError, ValueError):
+            return None
+        
+        return {
+            **movie,
+            "id": movie_id,
+            "year": movie.get("year") or "N/A",
+            "genre": list(movie.get("genre") or []),
+            "director": movie.get("director") or "Unknown",
+            "description": movie.get("description") or "",
+            "rating": rating,
+            "actors": [a for a in (movie.get("actors") or []) if a]
+        }
+    
+    def iter_movies(self, path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream validated movies from a JSONL catalog, one line at a time.
+        
+        Without a JSONL catalog, falls back to load_sample_movies.
+        
+        Args:
+            path: JSONL file (defaults to data/tmdb_movies.jsonl)
+            
+        Yields:
+            Validated movie dictionaries
+        """
+        path = path or TMDB_JSONL_FILE
+        if not os.path.exists(path):
+            yield from self.load_sample_movies()
+            return
+        
+        self.skipped_movies = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    movie = self.validate_movie(json.loads(line))
+                except ValueError:
+                    movie = None
+                if movie is None:
+                    self.skipped_movies += 1
+                    continue
+                yield movie
+        
+        if self.skipped_movies:
+            print(f"Warning: skipped {self.skipped_movies} invalid catalog lines in {path}")
+    
     def get_movie_text(self, movie: Dict[str, Any]) -> str:
         """
         Convert movie data to text format for embedding.
@@ -189,36 +264,76 @@ class MovieDataProcessor:
         
         return text
     
-    def format_movies_for_rag(self) -> List[Dict[str, str]]:
+    def get_content_hash(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """
-        Format movies for RAG system.
+        Compute a stable hash of a movie document.
         
+        Args:
+            text: Text returned by get_movie_text
+            metadata: Stored metadata (image paths included), without its hash
+            
         Returns:
-            List of formatted movie documents
+            Hex digest identifying the stored content
         """
-        documents = []
-        for movie in self.movies_data:
-            # Prepare metadata without None values
-            # Convert id to int to ensure it's stored correctly
-            metadata = {
-                "id": int(movie["id"]),
-                "title": movie["title"],
-                "year": str(movie["year"]),
-                "genre": json.dumps(movie["genre"]),
-                "director": movie["director"],
-                "rating": float(movie["rating"])
-            }
+        if metadata is not None:
+            text += "\n" + json.dumps(metadata, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    def format_movie_for_rag(self, movie: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Format a single movie as a RAG document.
+        
+        Args:
+            movie: Movie dictionary
             
-            # Add optional fields only if they exist and are not None
-            if movie.get("image_url"):
-                metadata["image_url"] = movie["image_url"]
-            if movie.get("local_image_path"):
-                metadata["local_image_path"] = movie["local_image_path"]
+        Returns:
+            Document with content and metadata
+        """
+        content = self.get_movie_text(movie)
+        
+        # Prepare metadata without None values
+        # Convert id to int to ensure it's stored correctly
+        metadata = {
+            "id": int(movie["id"]),
+            "title": movie["title"],
+            "year": str(movie["year"]),
+            "genre": json.dumps(movie["genre"]),
+            "director": movie["director"],
+            "rating": float(movie["rating"])
+        }
+        
+        # Add optional fields only if they exist and are not None
+        if movie.get("image_url"):
+            metadata["image_url"] = movie["image_url"]
+        if movie.get("local_image_path"):
+            metadata["local_image_path"] = movie["local_image_path"]
+        
+        # Metadata-only changes (e.g. a new poster) must reach Chroma too
+        metadata["content_hash"] = self.get_content_hash(content, metadata)
+        
+        return {
+            "content": content,
+            "metadata": metadata
+        }
+    
+    def iter_rag_documents(self, movies: Optional[Iterable[Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily format movies for RAG system, one document at a time.
+        
+        Args:
+            movies: Movies to format (defaults to movies_data), e.g. iter_movies()
             
-            doc = {
-                "content": self.get_movie_text(movie),
-                "metadata": metadata
-            }
-            documents.append(doc)
+        Yields:
+            Formatted movie documents
+        """
+        for movie in (self.movies_data if movies is None else movies):
+            yield self.format_movie_for_rag(movie)
+    
+    def format_movies_for_rag(self) -> List[Dict[str, str]]:
+        """
+        Format movies for RAG system.
         
-        return documents
+        Returns:
+            List of formatted movie documents
+        """
+        return list(self.iter_rag_documents())
@@ -0,0 +1,53 @@
+"""Maximal marginal relevance re-ranking over candidate vectors."""
+from typing import Sequence
+
+import numpy as np
+
+
+def mmr(relevance: Sequence[float], vectors: np.ndarray, k: int,
+        lambda_mult: float = 0.5) -> np.ndarray:
+    """
+    Pick k candidates by maximal marginal relevance.
+
+    The pairwise similarities of the candidates are computed in one matrix
+    product; the greedy loop then only keeps, per candidate, its highest
+    similarity to the movies already picked. Relevance is rescaled to [0, 1]
+    over the candidates, so that vector similarities, blended profile scores
+    and fused rank scores all trade off the same way against redundancy.
+
+    Args:
+        relevance: Ranking score of each candidate, higher is better
+        vectors: Normalized candidate vectors, one row per candidate
+        k: Number of candidates to pick
+        lambda_mult: Share of relevance, from 0 (diversity only) to 1
+            (relevance order)
+
+    Returns:
+        Positions of the picked candidates, in pick order
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    count = len(relevance)
+    k = min(k, count)
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    lambda_mult = min(max(lambda_mult, 0.0), 1.0)
+    span = float(relevance.max() - relevance.min())
+    if span > 0:
+        relevance = (relevance - relevance.min()) / span
+    else:
+        relevance = np.ones(count, dtype=np.float32)
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    similarities = vectors @ vectors.T
+    gain = lambda_mult * relevance
+    penalty = np.full(count, -np.inf, dtype=np.float32)  # Highest similarity to a pick
+    picked = np.empty(k, dtype=np.intp)
+    picked[0] = int(np.argmax(relevance))
+    scores = np.empty(count, dtype=np.float32)
+    for i in range(1, k):
+        np.maximum(penalty, similarities[picked[i - 1]], out=penalty)
+        np.multiply(penalty, 1.0 - lambda_mult, out=scores)
+        np.subtract(gain, scores, out=scores)
+        scores[picked[:i]] = -np.inf
+        picked[i] = int(np.argmax(scores))
+    return picked
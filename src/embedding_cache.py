@@ -0,0 +1,329 @@
+"""Persistent, content-addressed cache for embedding vectors."""
+from typing import List, Optional, Dict
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import hashlib
+import json
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in other processes are not serialized
+    fcntl = None
+
+
+class EmbeddingCache:
+    """
+    Disk-backed store of embedding vectors keyed by content hash.
+
+    Vectors live in a memory-mapped float32 matrix (``vectors.f32``) and the
+    key -> row table in an append-only log (``keys.log``). When the cache is
+    full the least recently used rows are evicted and their slots reused.
+
+    Each slot also stores a fingerprint of its key (``slots.u64``). A reused
+    slot is unclaimed before its vector is overwritten and claimed again once
+    the new vector is on disk, and reads check the fingerprint, so neither a
+    crash nor another process sharing the directory can make a key return
+    the vector of another. Writers take an exclusive lock on the directory
+    and first replay the log lines other processes appended.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    SLOTS_FILE = "slots.u64"
+    KEYS_FILE = "keys.log"
+    META_FILE = "meta.json"
+    LOCK_FILE = "lock"
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, directory: str, max_entries: int = 200000):
+        """
+        Open (or create) a cache directory.
+
+        Args:
+            directory: Directory holding the cache files
+            max_entries: Maximum number of vectors kept on disk
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.dimension = None
+        self.capacity = 0
+        self._vectors = None
+        self._fingerprints = None  # Fingerprint of the key owning each slot, 0 when free
+        self._entries = OrderedDict()  # key -> slot, least recently used first
+        self._free_slots = []
+        self._next_slot = 0
+        self._log_lines = 0
+        self._log_inode = None
+        self._log_position = 0  # Bytes of the key log already applied
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._file_lock():
+            self._sync()
+
+    @staticmethod
+    def make_key(model_name: str, normalize: bool, text: str) -> str:
+        """Build the cache key of a text for a given model configuration."""
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}|{int(normalize)}|{text_hash}"
+
+    @staticmethod
+    def fingerprint(key: str) -> int:
+        """64-bit fingerprint of a key, never 0 (the mark of a free slot)."""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold the exclusive lock of the cache directory, across processes."""
+        with open(self.directory / self.LOCK_FILE, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _sync(self):
+        """Catch up with the files, which other processes may have written."""
+        meta_path = self.directory / self.META_FILE
+        if not meta_path.exists():
+            return
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.dimension = meta["dimension"]
+        if meta["capacity"] > self.capacity or self._vectors is None:
+            self.capacity = meta["capacity"]
+            self._open_vectors()
+        self._read_log()
+
+    def _read_log(self):
+        """Apply the key log lines appended since the last read."""
+        path = self.directory / self.KEYS_FILE
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return
+        reload = stat.st_ino != self._log_inode or stat.st_size < self._log_position
+        if reload:
+            # First read, or the log was compacted: start over
+            self._entries.clear()
+            self._log_inode = stat.st_ino
+            self._log_position = 0
+            self._log_lines = 0
+        with open(path, 'rb') as f:
+            f.seek(self._log_position)
+            data = f.read()
+        # A line cut by a crash is left out
+        data = data[:data.rfind(b"\n") + 1]
+        self._log_position += len(data)
+
+        # A slot reused after eviction only belongs to the key it is fingerprinted with
+        for line in data.decode("utf-8").splitlines():
+            key, _, slot = line.rpartition("\t")
+            if not key or not slot.isdigit():
+                continue
+            slot = int(slot)
+            self._log_lines += 1
+            if slot < self.capacity and int(self._fingerprints[slot]) == self.fingerprint(key):
+                self._entries.pop(key, None)
+                self._entries[key] = slot
+                self._next_slot = max(self._next_slot, slot + 1)
+        if reload:
+            self._next_slot = max(self._entries.values(), default=-1) + 1
+            used = set(self._entries.values())
+            self._free_slots = [slot for slot in range(self._next_slot) if slot not in used]
+        elif self._free_slots:
+            used = set(self._entries.values())
+            self._free_slots = [slot for slot in self._free_slots if slot not in used]
+
+    def _open_vectors(self):
+        """Memory-map the vector and fingerprint files with the current capacity."""
+        self._vectors = self._map(self.VECTORS_FILE, np.float32, (self.capacity, self.dimension))
+        self._fingerprints = self._map(self.SLOTS_FILE, np.uint64, (self.capacity,))
+
+    def _map(self, name: str, dtype, shape) -> np.memmap:
+        path = self.directory / name
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, 'ab') as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode='r+', shape=shape)
+
+    def _write_meta(self):
+        path = self.directory / self.META_FILE
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"dimension": self.dimension, "capacity": self.capacity}, f)
+        tmp_path.replace(path)
+
+    def _grow(self):
+        """Double the capacity of the vector file, up to max_entries."""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._fingerprints.flush()
+            self._vectors = self._fingerprints = None
+        self.capacity = min(self.max_entries, max(self.INITIAL_CAPACITY, self.capacity * 2))
+        self._open_vectors()
+        self._write_meta()
+
+    def _allocate_slot(self, evicted: List[str]) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._next_slot >= self.capacity and self.capacity < self.max_entries:
+            self._grow()
+        if self._next_slot < self.capacity:
+            self._next_slot += 1
+            return self._next_slot - 1
+        key, slot = self._entries.popitem(last=False)
+        evicted.append(key)
+        return slot
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up vectors by key.
+
+        Args:
+            keys: Cache keys built with make_key
+
+        Returns:
+            One vector (or None on a miss) per key
+        """
+        results = []
+        with self._lock:
+            for key in keys:
+                slot = self._entries.get(key)
+                vector = None
+                if slot is not None:
+                    vector = np.array(self._vectors[slot])
+                    # Checked after the copy: a writer unclaims a slot before overwriting it
+                    if int(self._fingerprints[slot]) != self.fingerprint(key):
+                        del self._entries[key]
+                        vector = None
+                if vector is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        """
+        Store vectors, evicting the least recently used ones if needed.
+
+        Args:
+            keys: Cache keys built with make_key
+            vectors: Embedding vectors, one per key
+        """
+        if not keys or self.max_entries <= 0:
+            return
+
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dimension is None:
+                self.dimension = len(vectors[0])
+                self._grow()
+
+            slots, rows, fingerprints, lines = [], [], [], []
+            evicted = []
+            for key, vector in zip(keys, vectors):
+                if key in self._entries:
+                    continue
+                slot = self._allocate_slot(evicted)
+                self._entries[key] = slot
+                slots.append(slot)
+                rows.append(vector)
+                fingerprints.append(self.fingerprint(key))
+                lines.append(f"{key}\t{slot}\n")
+
+            if not lines:
+                return
+            # Unclaim, write, claim: each step is on disk before the next starts
+            self._fingerprints[slots] = 0
+            self._fingerprints.flush()
+            self._vectors[slots] = np.asarray(rows, dtype=np.float32)
+            self._vectors.flush()
+            self._fingerprints[slots] = np.asarray(fingerprints, dtype=np.uint64)
+            self._fingerprints.flush()
+            data = "".join(lines).encode("utf-8")
+            with open(self.directory / self.KEYS_FILE, 'ab') as f:
+                f.write(data)
+            self._log_position += len(data)
+            self._log_inode = (self.directory / self.KEYS_FILE).stat().st_ino
+            self._log_lines += len(lines)
+
+            # Rewrite the log once superseded lines dominate it
+            if evicted and self._log_lines > 2 * len(self._entries):
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the key log with only live entries, in recency order."""
+        path = self.directory / self.KEYS_FILE
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{key}\t{slot}\n" for key, slot in self._entries.items())
+        tmp_path.replace(path)
+        stat = path.stat()
+        self._log_inode, self._log_position = stat.st_ino, stat.st_size
+        self._log_lines = len(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and occupancy."""
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated texts from an EmbeddingCache."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache,
+                 model_name: str, normalize: bool = True):
+        """
+        Wrap an embedding model.
+
+        Args:
+            embeddings: Underlying embedding model
+            cache: Cache used for both documents and queries
+            model_name: Model name, part of the cache key
+            normalize: Whether the model normalizes its vectors, part of the cache key
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.normalize = normalize
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, computing only the vectors missing from the cache."""
+        keys = [EmbeddingCache.make_key(self.model_name, self.normalize, t) for t in texts]
+        cached = self.cache.get_many(keys)
+
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            self.cache.put_many([keys[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+
+        return [v.tolist() if isinstance(v, np.ndarray) else list(v) for v in cached]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, served from the cache when already known."""
+        key = EmbeddingCache.make_key(self.model_name, self.normalize, text)
+        vector = self.cache.get_many([key])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many([key], [vector])
+            return list(vector)
+        return vector.tolist()
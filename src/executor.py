@@ -0,0 +1,70 @@
+"""Bounded worker pool running blocking RAG calls off the event loop."""
+from typing import Any, Callable, Dict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import threading
+
+
+class ServerBusyError(RuntimeError):
+    """Raised when every worker is busy and the queue is full."""
+
+
+class RequestExecutor:
+    """
+    Run blocking calls on a fixed pool of worker threads.
+
+    At most max_workers calls run at once and at most max_queue more wait
+    for a worker; further calls are rejected immediately with
+    ServerBusyError instead of piling up.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 64):
+        """
+        Args:
+            max_workers: Number of worker threads
+            max_queue: Number of calls allowed to wait for a worker
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                       thread_name_prefix="rag-worker")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) on a worker and await its result.
+
+        Raises:
+            ServerBusyError: If the pool and its queue are full
+        """
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ServerBusyError("Too many requests in progress")
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, functools.partial(func, *args, **kwargs))
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def shutdown(self, wait: bool = True):
+        self.pool.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the load of the pool."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": min(self.pending, self.max_workers),
+                "queued": max(0, self.pending - self.max_workers),
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,163 @@
+"""Genre vocabulary shared by filtering and match scoring."""
+from typing import Iterable, List, Optional
+from functools import lru_cache
+from itertools import islice
+import re
+import unicodedata
+
+
+# Canonical genres, in bit order
+GENRES = (
+    "action", "aventure", "comedie", "drame", "horreur", "science-fiction",
+    "thriller", "romance", "fantastique", "animation", "crime", "guerre",
+    "western", "historique", "mystere", "familial", "musique", "documentaire",
+)
+
+GENRE_BITS = {genre: 1 << i for i, genre in enumerate(GENRES)}
+
+# Keywords (FR/EN, accent-folded) recognized for each canonical genre
+GENRE_KEYWORDS = {
+    "action": ["action"],
+    "aventure": ["adventure", "aventure"],
+    "comedie": ["comedy", "comedie"],
+    "drame": ["drama", "drame"],
+    "horreur": ["horror", "horreur", "epouvante"],
+    "science-fiction": ["sci-fi", "science fiction", "science-fiction", "sf"],
+    "thriller": ["thriller", "suspense"],
+    "romance": ["romance", "romantique"],
+    "fantastique": ["fantasy", "fantastique"],
+    "animation": ["animation", "anime"],
+    "crime": ["crime", "policier"],
+    "guerre": ["war", "guerre"],
+    "western": ["western"],
+    "historique": ["historical", "history", "historique"],
+    "mystere": ["mystery", "mystere"],
+    "familial": ["family", "familial"],
+    "musique": ["music", "musique"],
+    "documentaire": ["documentary", "documentaire"],
+}
+
+# Genre names that are too common as plain words to be used as query keywords
+GENRE_NAME_ALIASES = {
+    "histoire": "historique",  # TMDB (fr-FR) name of the History genre
+}
+
+GENRE_SYNONYMS = {
+    keyword: genre for genre, keywords in GENRE_KEYWORDS.items() for keyword in keywords
+}
+GENRE_SYNONYMS.update(GENRE_NAME_ALIASES)
+
+# Profile preference keys (see app.py) that differ from the canonical genre
+PROFILE_GENRE_KEYS = {
+    "romance": "romantique",
+    "thriller": "horreur",  # rapproché suspense/horreur
+}
+
+
+_COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+
+
+def fold(text: str) -> str:
+    """Lowercase a text and strip its accents."""
+    text = str(text).lower()
+    if text.isascii():
+        return text
+    return _COMBINING_MARKS.sub("", unicodedata.normalize("NFD", text))
+
+
+def _fold_table() -> bytes:
+    """Map each Latin-1 byte to its folded ASCII letter or digit, others to a space."""
+    table = bytearray(b" " * 256)
+    for byte in range(256):
+        char = fold(chr(byte))
+        if len(char) == 1 and char.isascii() and char.isalnum():
+            table[byte] = ord(char)
+    return bytes(table)
+
+
+# Texts are folded and cut into words in one translate of their Latin-1
+# bytes; characters outside Latin-1 separate words
+_FOLD_TABLE = _fold_table()
+
+
+def _fold_words(text: str) -> List[bytes]:
+    """Folded words of a text, split on everything but letters and digits."""
+    if not text.isascii():
+        text = unicodedata.normalize("NFC", text)  # Decomposed accents become Latin-1
+    return text.encode("latin-1", "replace").translate(_FOLD_TABLE).split()
+
+
+def _keyword_tables():
+    """
+    Index the query keywords by folded word, with an optional plural s/x.
+
+    Keywords are whole words: "sf" never matches inside "transfert",
+    "westerns" matches "western" and "action-aventure" both genres.
+    Two-word keywords ("sci-fi", "science fiction") are indexed as word pairs.
+    """
+    words, pairs = {}, {}
+    for keyword, genre in GENRE_SYNONYMS.items():
+        if keyword in GENRE_NAME_ALIASES:
+            continue
+        *head, last = _fold_words(keyword)
+        for plural in (b"", b"s", b"x"):
+            if head:
+                pairs.setdefault((head[0], last + plural), genre)
+            else:
+                words.setdefault(last + plural, genre)
+    return words, pairs
+
+
+_KEYWORD_WORDS, _KEYWORD_PAIRS = _keyword_tables()
+
+
+@lru_cache(maxsize=1024)
+def normalize_genre(name: str) -> Optional[str]:
+    """Map a genre name in any supported spelling to its canonical genre."""
+    return GENRE_SYNONYMS.get(fold(name).strip())
+
+
+def genre_mask(names: Iterable[str]) -> int:
+    """
+    Build the bitmask of a list of genre names or canonical genres.
+
+    Args:
+        names: Genre names, e.g. ["Science-Fiction", "Drama"]
+
+    Returns:
+        Integer with one bit set per recognized canonical genre
+    """
+    mask = 0
+    for name in names:
+        genre = name if name in GENRE_BITS else normalize_genre(name)
+        if genre is not None:
+            mask |= GENRE_BITS[genre]
+    return mask
+
+
+def profile_genre_key(name: str) -> str:
+    """Map a movie genre to the profile preference key it counts for."""
+    genre = normalize_genre(name)
+    if genre is None:
+        return str(name).lower()
+    return PROFILE_GENRE_KEYS.get(genre, genre)
+
+
+@lru_cache(maxsize=4096)
+def _extract_genres(text: str) -> tuple:
+    # Folded and split once; keywords are then set and dict lookups
+    words = _fold_words(text)
+    present = set(words)
+    found = {_KEYWORD_WORDS[word] for word in present.intersection(_KEYWORD_WORDS)}
+    for (first, second), genre in _KEYWORD_PAIRS.items():
+        if genre not in found and first in present and second in present and any(
+            a == first and b == second for a, b in zip(words, islice(words, 1, None))
+        ):
+            found.add(genre)
+    return tuple(genre for genre in GENRES if genre in found)
+
+
+def extract_genres(text: str) -> List[str]:
+    """Return the canonical genres mentioned in a free text, in GENRES order."""
+    # Repeated texts (common queries, profile queries) are served from a cache
+    return list(_extract_genres(text))
@@ -0,0 +1,183 @@
+"""Batched indexing pipeline for large movie catalogs."""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+import multiprocessing
+import os
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from src.embedding_cache import CachedEmbeddings
+
+
+# Embedding model of the current worker process
+_worker_embeddings = None
+
+
+def _init_worker(embeddings_factory: Callable[[], Embeddings], torch_threads: int):
+    """Load the embedding model once per worker process."""
+    global _worker_embeddings
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _worker_embeddings = embeddings_factory()
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Yield lists of at most batch_size items."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_collection_pages(collection, include: List[str],
+                          page_size: int) -> Iterator[Dict[str, Any]]:
+    """
+    Read a Chroma collection in pages of at most page_size rows.
+
+    Args:
+        collection: chromadb collection to read
+        include: Fields to return besides the ids
+        page_size: Rows per collection.get call
+
+    Yields:
+        collection.get results, in collection order
+    """
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+class IndexingPipeline:
+    """Embed documents in batches and write them to Chroma in bulk commits."""
+
+    def __init__(self, embeddings: Embeddings, collection, batch_size: int = 256,
+                 commit_size: int = 2048, workers: int = 0,
+                 embeddings_factory: Optional[Callable[[], Embeddings]] = None):
+        """
+        Args:
+            embeddings: Embedding model used in-process (and for cache lookups)
+            collection: chromadb collection receiving the documents
+            batch_size: Number of texts per embedding call
+            commit_size: Number of documents per upsert into Chroma
+            workers: Number of embedding worker processes (0 embeds in-process)
+            embeddings_factory: Picklable callable creating the model in each worker
+        """
+        if workers > 0 and embeddings_factory is None:
+            raise ValueError("embeddings_factory is required when workers > 0")
+        self.embeddings = embeddings
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.commit_size = max(self.batch_size, commit_size)
+        self.workers = workers
+        self.embeddings_factory = embeddings_factory
+
+    def run(self, documents: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+        """
+        Embed and store a stream of documents.
+
+        Args:
+            documents: Documents from MovieDataProcessor (content + metadata)
+
+        Returns:
+            Number of documents indexed, elapsed seconds and throughput
+        """
+        self._start = time.perf_counter()
+        self._indexed = 0
+        self._pending = []
+
+        if self.workers > 0:
+            self._run_pooled(documents)
+        else:
+            for batch in iter_batches(documents, self.batch_size):
+                texts = [doc["content"] for doc in batch]
+                self._collect(batch, self.embeddings.embed_documents(texts))
+        self._commit()
+
+        elapsed = time.perf_counter() - self._start
+        return {
+            "documents": self._indexed,
+            "seconds": round(elapsed, 3),
+            "docs_per_second": round(self._indexed / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+    def _run_pooled(self, documents: Iterable[Dict[str, Any]]):
+        """Shard batches across worker processes, keeping a bounded number in flight."""
+        # Workers only run the model; the embedding cache is read and written here
+        cache = self.embeddings.cache if isinstance(self.embeddings, CachedEmbeddings) else None
+        torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        context = multiprocessing.get_context("spawn")
+
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(self.embeddings_factory, torch_threads)) as pool:
+            in_flight = deque()
+            for batch in iter_batches(documents, self.batch_size):
+                texts = [doc["content"] for doc in batch]
+                vectors = [None] * len(batch)
+                missing = list(range(len(batch)))
+                if cache is not None:
+                    keys = [self._cache_key(text) for text in texts]
+                    vectors = cache.get_many(keys)
+                    missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+                future = None
+                if missing:
+                    future = pool.submit(_embed_in_worker, [texts[i] for i in missing])
+                in_flight.append((batch, vectors, missing, future))
+
+                if len(in_flight) >= 2 * self.workers:
+                    self._finish(in_flight.popleft(), cache)
+            while in_flight:
+                self._finish(in_flight.popleft(), cache)
+
+    def _cache_key(self, text: str) -> str:
+        return self.embeddings.cache.make_key(self.embeddings.model_name,
+                                              self.embeddings.normalize, text)
+
+    def _finish(self, item, cache):
+        batch, vectors, missing, future = item
+        if future is not None:
+            computed = future.result()
+            if cache is not None:
+                cache.put_many([self._cache_key(batch[i]["content"]) for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        self._collect(batch, vectors)
+
+    def _collect(self, batch: List[Dict[str, Any]], vectors: List[Any]):
+        self._pending.extend(zip(batch, vectors))
+        if len(self._pending) >= self.commit_size:
+            self._commit()
+
+    def _commit(self):
+        """Upsert the pending documents in one bulk write."""
+        if not self._pending:
+            return
+        self.collection.upsert(
+            ids=[str(doc["metadata"]["id"]) for doc, _ in self._pending],
+            embeddings=[list(map(float, vector)) for _, vector in self._pending],
+            documents=[doc["content"] for doc, _ in self._pending],
+            metadatas=[doc["metadata"] for doc, _ in self._pending]
+        )
+        self._indexed += len(self._pending)
+        self._pending = []
+
+        elapsed = time.perf_counter() - self._start
+        rate = self._indexed / elapsed if elapsed > 0 else 0.0
+        print(f"  {self._indexed} documents indexés ({rate:.1f} docs/s)")
@@ -0,0 +1,245 @@
+"""BM25 inverted index over movie titles, directors and actors."""
+from typing import Dict, List, Optional, Sequence
+import re
+
+import numpy as np
+
+from src.catalog import StringColumn
+from src.genres import GENRE_SYNONYMS, fold
+from src.vector_index import SearchHit
+
+
+# Function words (FR/EN) and request vocabulary that never identify a movie
+STOPWORDS = frozenset("""
+a au aux avec ce ces cet cette dans de des du en et film films il je la le les leur
+ma me mes moi mon ou par pas pour qu que quel quelle quelles quels qui sa se ses son
+sur ta te tes toi ton un une vos votre
+an and as at by for from in into is of on or the to with
+movie movies show
+cherche conseille conseilles donne joue jouent montre propose recommande recommandes
+recommander realise realises veux voir
+""".split())
+
+# Genre words are served by the genre filter, not by name lookups
+GENRE_TOKENS = frozenset(
+    token for keyword in GENRE_SYNONYMS for token in re.findall(r"\w+", keyword)
+)
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded lowercase words of a text, without stopwords and single letters."""
+    return [
+        token for token in _TOKEN.findall(fold(text or ""))
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def _actors(content: str) -> List[str]:
+    """Actor names from the "Actors:" line of a document (MovieDataProcessor.get_movie_text)."""
+    for line in content.splitlines():
+        if line.startswith("Actors:"):
+            return [name.strip() for name in line[len("Actors:"):].split(",") if name.strip()]
+    return []
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[SearchHit]], k: int,
+                           constant: int = 60) -> List[SearchHit]:
+    """
+    Merge ranked hit lists by reciprocal rank fusion.
+
+    Args:
+        rankings: Hit lists, best first; hits need their catalog row
+        k: Number of hits to return
+        constant: Rank offset damping the weight of the first ranks
+
+    Returns:
+        New hits scored by the sum of 1 / (constant + rank) over the lists
+    """
+    scores = {}
+    ids = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            scores[hit.row] = scores.get(hit.row, 0.0) + 1.0 / (constant + rank)
+            ids[hit.row] = hit.id
+    # Ties keep the order of first appearance
+    rows = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [SearchHit(ids[row], scores[row], row=row) for row in rows]
+
+
+class LexicalIndex:
+    """
+    BM25 search over the title, director and actor names of each movie.
+
+    Postings are stored as contiguous arrays grouped by term, with the BM25
+    weight of each (term, movie) pair precomputed, so a query sums a few
+    array slices. Rows follow the MovieCatalog.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, catalog):
+        """
+        Args:
+            catalog: MovieCatalog to index
+        """
+        self.ids = catalog.ids
+        self.vocabulary: Dict[str, int] = {}
+        term_ids, rows, frequencies = [], [], []
+        lengths = np.zeros(len(catalog), dtype=np.float32)
+        names = []
+        for row in range(len(catalog)):
+            fields = [catalog.titles[row], catalog.directors[row]]
+            fields.extend(_actors(catalog.content(row)))
+            tokenized = [tokenize(field) for field in fields]
+            # Title first, then people; kept for exact name matching
+            names.append("|".join(" ".join(tokens) for tokens in tokenized))
+            counts = {}
+            for tokens in tokenized:
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+            lengths[row] = sum(counts.values())
+            for token, count in counts.items():
+                term_ids.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+                rows.append(row)
+                frequencies.append(count)
+        self.names = StringColumn(names)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self.rows = np.asarray(rows, dtype=np.int32)[order]
+        frequencies = np.asarray(frequencies, dtype=np.float32)[order]
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(document_frequency, out=self.offsets[1:])
+
+        count = max(len(catalog), 1)
+        idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = max(float(lengths.mean()) if len(lengths) else 0.0, 1.0)
+        norms = self.K1 * (1 - self.B + self.B * lengths[self.rows] / average_length)
+        self.weights = (
+            np.repeat(idf, document_frequency) * frequencies * (self.K1 + 1)
+            / (frequencies + norms)
+        ).astype(np.float32)
+
+    def query_terms(self, query: str) -> List[str]:
+        """Words of a query that can name a movie, in query order."""
+        return list(dict.fromkeys(
+            token for token in tokenize(query)
+            if token not in GENRE_TOKENS and not self._is_common(token)
+        ))
+
+    def _is_common(self, token: str) -> bool:
+        # Words found in more than half of the movies identify none of them
+        # (their classic BM25 idf would be negative)
+        term_id = self.vocabulary.get(token)
+        if term_id is None:
+            return False
+        return 2 * (self.offsets[term_id + 1] - self.offsets[term_id]) > len(self.ids)
+
+    def _score(self, terms: List[str], mask: Optional[np.ndarray]):
+        """Rows matching at least one term, with their BM25 score and matched term count."""
+        spans = [
+            (self.offsets[term_id], self.offsets[term_id + 1])
+            for term_id in (self.vocabulary.get(term) for term in terms) if term_id is not None
+        ]
+        if not spans:
+            empty = np.zeros(0)
+            return empty.astype(np.int64), empty, empty
+        rows = np.concatenate([self.rows[start:end] for start, end in spans])
+        weights = np.concatenate([self.weights[start:end] for start, end in spans])
+        if len(spans) == 1:
+            matched = np.ones(len(rows))
+        else:
+            rows, inverse = np.unique(rows, return_inverse=True)
+            weights = np.bincount(inverse, weights=weights)
+            matched = np.bincount(inverse)
+        if mask is not None:
+            keep = mask[rows]
+            rows, weights, matched = rows[keep], weights[keep], matched[keep]
+        return rows, weights, matched
+
+    def _hits(self, rows: np.ndarray, scores: np.ndarray, k: int) -> List[SearchHit]:
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((rows, -scores))
+        return [
+            SearchHit(int(self.ids[row]), float(score), row=int(row))
+            for row, score in zip(rows[order], scores[order])
+        ]
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[SearchHit]:
+        """
+        Rank movies by BM25 over their names.
+
+        Args:
+            query: Search text
+            k: Number of results to return
+            mask: Optional boolean per row; only rows set to True are candidates
+
+        Returns:
+            Hits carrying their catalog row, best first; empty when no
+            query word names a movie
+        """
+        if k <= 0:
+            return []
+        rows, scores, _ = self._score(self.query_terms(query), mask)
+        return self._hits(rows, scores, k)
+
+    def lookup(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[SearchHit]:
+        """
+        Return the movies a query names exactly, for answering without the encoder.
+
+        A movie is named when the query words (stopwords and genres aside)
+        are its whole title, or a phrase of several words of its title, or
+        the end of its director's or an actor's name ("Nolan",
+        "Christopher Nolan", "Leonardo DiCaprio").
+
+        Args:
+            query: Search text
+            k: Number of results to return
+            mask: Optional boolean per row; only rows set to True are candidates
+
+        Returns:
+            Named movies by decreasing BM25 score, or an empty list when the
+            query is not a confident name match
+        """
+        terms = self.query_terms(query)
+        if not terms or k <= 0:
+            return []
+        rows, scores, matched = self._score(terms, mask)
+        complete = matched == len(terms)
+        rows, scores = rows[complete], scores[complete]
+        phrase = " ".join(terms)
+        # Names are checked best first, only until k movies are found
+        hits = []
+        for i in np.lexsort((rows, -scores)):
+            if self._is_named(rows[i], phrase):
+                hits.append(SearchHit(int(self.ids[rows[i]]), float(scores[i]), row=int(rows[i])))
+                if len(hits) == k:
+                    break
+        return hits
+
+    def coverage(self, query: str, hit: SearchHit) -> float:
+        """Share of the query words found in the names of a hit."""
+        terms = self.query_terms(query)
+        if not terms:
+            return 0.0
+        words = set(self.names[hit.row].replace("|", " ").split())
+        return sum(term in words for term in terms) / len(terms)
+
+    def _is_named(self, row: int, phrase: str) -> bool:
+        title, *people = self.names[row].split("|")
+        if title == phrase or (" " in phrase and f" {phrase} " in f" {title} "):
+            return True
+        return any(person == phrase or person.endswith(" " + phrase) for person in people)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.weights.nbytes + self.offsets.nbytes + self.names.nbytes
@@ -0,0 +1,181 @@
+"""Profile embeddings built from precomputed genre centroids and cached texts."""
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+from src.cache import LRUCache
+
+
+def genre_centroids(genre_counts: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """
+    Average the movie vectors of each profile genre key.
+
+    Args:
+        genre_counts: Movies × profile keys matrix (MovieCatalog.profile_genre_counts)
+        matrix: Normalized movie embeddings, rows aligned with the catalog
+
+    Returns:
+        One normalized centroid per profile key; keys without movies get a
+        zero row
+    """
+    members = (genre_counts > 0).astype(np.float32)
+    centroids = members.T @ matrix
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    return centroids / np.maximum(norms, 1e-12)
+
+
+def _normalized(vector: np.ndarray) -> np.ndarray:
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class ProfileEncoder:
+    """
+    Turn user profiles into query vectors without re-encoding them.
+
+    A profile vector mixes three parts, each normalized: the genre centroids
+    weighted by the whole preference distribution, the mean of the mood
+    embeddings and the description embedding. Genre centroids come from the
+    movie vectors of the index; genres without a centroid and the mood and
+    description texts are embedded through embed_texts, which is expected to
+    cache them. Finished vectors are cached by profile hash, so a known
+    profile costs no encoder call at all.
+    """
+
+    def __init__(self, embed_texts: Callable[[List[str]], np.ndarray],
+                 max_entries: int = 4096, genre_weight: float = 1.0,
+                 mood_weight: float = 0.5, description_weight: float = 1.0):
+        """
+        Args:
+            embed_texts: Batched, cached query encoder (RAGSystem._embed_queries)
+            max_entries: Number of profile vectors kept
+            genre_weight: Share of the genre part
+            mood_weight: Share of the mood part
+            description_weight: Share of the description part
+        """
+        self.embed_texts = embed_texts
+        self.genre_weight = genre_weight
+        self.mood_weight = mood_weight
+        self.description_weight = description_weight
+        self.cache = LRUCache(max_entries=max_entries)
+        self._centroids = {}
+        self._lock = threading.Lock()
+
+    def set_centroids(self, keys: Sequence[str], centroids: Optional[np.ndarray]):
+        """
+        Install the genre centroids of a new index and drop cached profiles.
+
+        Args:
+            keys: Profile genre keys, one per centroid row
+            centroids: Output of genre_centroids, or None when the backend
+                does not expose its vectors (genres are then embedded by name)
+        """
+        vectors = {}
+        if centroids is not None:
+            for key, centroid in zip(keys, centroids):
+                if centroid.any():
+                    centroid = np.array(centroid, dtype=np.float32)
+                    centroid.setflags(write=False)
+                    vectors[key] = centroid
+        with self._lock:
+            self._centroids = vectors
+            self.cache.clear()
+
+    @classmethod
+    def profile_key(cls, user_profile: Dict[str, Any]) -> str:
+        """Hash of the profile fields that shape its vector."""
+        fields = {
+            "genres": cls._genres(user_profile),
+            "mood": list(user_profile.get("mood") or []),
+            "description": (user_profile.get("description") or "").strip()
+        }
+        payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def encode(self, user_profile: Dict[str, Any]) -> np.ndarray:
+        """Return the query vector of one profile."""
+        return self.encode_many([user_profile])[0]
+
+    def encode_many(self, user_profiles: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Return the query vectors of many profiles.
+
+        Texts missing from every cache are encoded together in one call.
+
+        Args:
+            user_profiles: User preferences dictionaries
+
+        Returns:
+            One normalized vector per profile, in input order
+        """
+        keys = [self.profile_key(profile) for profile in user_profiles]
+        vectors = {key: self.cache.get(key) for key in keys}
+        missing = {}
+        for key, profile in zip(keys, user_profiles):
+            if vectors[key] is None:
+                missing.setdefault(key, profile)
+        if missing:
+            with self._lock:
+                centroids = self._centroids
+            texts = []
+            for profile in missing.values():
+                texts.extend(self._texts(profile, centroids))
+            texts = list(dict.fromkeys(texts))
+            embedded = dict(zip(texts, self.embed_texts(texts))) if texts else {}
+            for key, profile in missing.items():
+                vector = self._combine(profile, centroids, embedded)
+                vector.setflags(write=False)
+                self.cache.put(key, vector)
+                vectors[key] = vector
+        return np.stack([vectors[key] for key in keys])
+
+    @staticmethod
+    def _genres(user_profile: Dict[str, Any]) -> Dict[str, float]:
+        return {
+            str(key): float(weight)
+            for key, weight in (user_profile.get("genres") or {}).items()
+            if weight and weight > 0
+        }
+
+    def _texts(self, user_profile: Dict[str, Any], centroids: Dict[str, np.ndarray]) -> List[str]:
+        """Texts a profile needs embedded: uncovered genres, moods, description."""
+        texts = [key for key in self._genres(user_profile) if key not in centroids]
+        texts.extend(str(mood) for mood in user_profile.get("mood") or [])
+        description = (user_profile.get("description") or "").strip()
+        if description:
+            texts.append(description)
+        if not texts and not self._genres(user_profile):
+            texts.append("")  # Empty profile: same vector as an empty query
+        return texts
+
+    def _combine(self, user_profile: Dict[str, Any], centroids: Dict[str, np.ndarray],
+                 embedded: Dict[str, np.ndarray]) -> np.ndarray:
+        def vector(text):
+            return np.asarray(embedded[text], dtype=np.float32)
+
+        parts = []
+        genres = self._genres(user_profile)
+        if genres:
+            total = sum(genres.values())
+            mixed = sum(
+                weight / total * (centroids[key] if key in centroids else vector(key))
+                for key, weight in genres.items()
+            )
+            parts.append(self.genre_weight * _normalized(mixed))
+        moods = [str(mood) for mood in user_profile.get("mood") or []]
+        if moods:
+            parts.append(self.mood_weight * _normalized(np.mean([vector(m) for m in moods], axis=0)))
+        description = (user_profile.get("description") or "").strip()
+        if description:
+            parts.append(self.description_weight * _normalized(vector(description)))
+        if not parts:
+            parts.append(vector(""))
+        return _normalized(np.sum(parts, axis=0)).astype(np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the profile cache counters and the number of centroids."""
+        with self._lock:
+            centroids = len(self._centroids)
+        return {**self.cache.stats(), "centroids": centroids}
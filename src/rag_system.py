@@ -1,60 +1,143 @@
 """RAG system implementation with vector database."""
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, NamedTuple, Optional, Tuple
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
 import warnings
-import json
+import threading
+import numpy as np
 
 from config import settings
 from src.data_processor import MovieDataProcessor
+from src.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.cache import LRUCache
+from src.batching import QueryBatcher
+from src.sessions import SessionStore
+from src.vector_index import SearchHit, build_vector_index
+from src.catalog import MovieCatalog
+from src.genres import extract_genres, genre_mask
+from src.scoring import blend_scores, match_scores, profile_weights
+from src.diversity import mmr
+from src.profiles import ProfileEncoder, genre_centroids
+from src.lexical import LexicalIndex, reciprocal_rank_fusion
+from src.indexing import IndexingPipeline, iter_collection_pages
+
+
+# Metadata sent back with chat answers (the answer text already describes the movies)
+CHAT_SOURCE_FIELDS = ("id", "title", "year")
+
+
+class IndexState(NamedTuple):
+    """
+    Everything a search reads, built together from one read of the collection.
+
+    A refresh swaps the whole state in a single assignment and each request
+    reads it once, so no request ever mixes rows of two catalogs.
+    """
+    index: Any  # Search backend selected by settings.vector_backend
+    lexical_index: LexicalIndex  # BM25 over titles, directors and actors, same rows
+    catalog: MovieCatalog  # Columnar movie metadata, rows aligned with the index
+    generation: int  # Keys cached results to the index they were computed on
+
+
+def create_embeddings() -> HuggingFaceEmbeddings:
+    """Create the local embedding model (also used by indexing workers)."""
+    return HuggingFaceEmbeddings(
+        model_name=settings.embedding_model,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
 
 
 class SimpleLLM(LLM):
-    """Simple LLM for local text generation without external API."""
+    """
+    Simple LLM for local text generation without external API.
+    
+    The instance holds no per-request state: the query and retrieved
+    documents are passed to each call, so one instance serves concurrent
+    requests.
+    """
     
-    # Store the user's original query, profile and found documents
-    user_query: str = ""
-    user_profile: Optional[Dict[str, Any]] = None
-    found_documents: List[Any] = []
+    max_documents: int = 5  # Movies described per answer
     
     @property
     def _llm_type(self) -> str:
         return "simple_local"
     
-    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        """Generate a simple response based on the retrieved documents."""
-        question = self.user_query.lower()
-        
-        # If we have documents, use them to create the response
-        if self.found_documents:
-            response = "Voici mes recommandations de films pour vous :\n\n"
-            for i, doc in enumerate(self.found_documents[:5], 1):
-                metadata = doc.metadata
-                title = metadata.get('title', 'Film inconnu')
-                year = metadata.get('year', 'N/A')
-                rating = metadata.get('rating', 'N/A')
-                director = metadata.get('director', 'N/A')
-                
-                # Extract description from content
-                content = doc.page_content
-                desc_start = content.find("Description: ")
-                if desc_start != -1:
-                    desc = content[desc_start + 13:].split("\n")[0]
-                else:
-                    desc = content[:500]
-                
-                response += f"{i}. **{title}** ({year}) - Note: {rating}/10\n"
-                response += f"   Réalisé par {director}.\n"
-                response += f"   {desc}\n\n"
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        """Generate a response to a prompt (documents may be passed as a keyword)."""
+        return self.render(prompt, kwargs.get("documents", []), kwargs.get("user_profile"))
+    
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None,
+                **kwargs: Any) -> Iterator[GenerationChunk]:
+        """Stream the response to a prompt, one recommended movie per chunk."""
+        for text in self.render_stream(prompt, kwargs.get("documents", []),
+                                       kwargs.get("user_profile")):
+            yield GenerationChunk(text=text)
+    
+    def render(self, query: str, documents: List[Any],
+               user_profile: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generate a simple response based on the retrieved documents.
+        
+        Args:
+            query: User's question
+            documents: Retrieved documents (page_content and metadata)
+            user_profile: Optional user profile with preferences
             
-            return response.strip()
+        Returns:
+            Answer text
+        """
+        return "".join(self.render_stream(query, documents, user_profile)).strip()
+    
+    def render_stream(self, query: str, documents: List[Any],
+                      user_profile: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Generate the response incrementally, one recommended movie at a time.
         
+        Args:
+            query: User's question
+            documents: Retrieved documents (page_content and metadata)
+            user_profile: Optional user profile with preferences
+            
+        Yields:
+            The introduction with the first movie, then one chunk per further
+            movie (the chunks of documents[i] come in order), or the fallback
+            message when there is no document
+        """
         # Fallback if no documents
-        return "Désolé, je n'ai pas trouvé de films correspondants à votre recherche."
+        if not documents:
+            yield "Désolé, je n'ai pas trouvé de films correspondants à votre recherche."
+            return
+        
+        for i, doc in enumerate(documents[:self.max_documents], 1):
+            # Catalog hits carry their snippet, prepared at index time
+            snippet = getattr(doc, "snippet", None) or self._snippet(doc)
+            prefix = "Voici mes recommandations de films pour vous :\n\n" if i == 1 else "\n\n"
+            yield f"{prefix}{i}. {snippet}"
+    
+    @staticmethod
+    def _snippet(doc: Any) -> str:
+        """Derive the answer snippet of a document that has none (e.g. a LangChain Document)."""
+        metadata = doc.metadata
+        title = metadata.get('title', 'Film inconnu')
+        year = metadata.get('year', 'N/A')
+        rating = metadata.get('rating', 'N/A')
+        director = metadata.get('director', 'N/A')
+        
+        # Extract description from content
+        content = doc.page_content
+        desc_start = content.find("Description: ")
+        if desc_start != -1:
+            desc = content[desc_start + 13:].split("\n")[0]
+        else:
+            desc = content[:500]
+        
+        return f"**{title}** ({year}) - Note: {rating}/10\n   Réalisé par {director}.\n   {desc}"
 
 
 class RAGSystem:
@@ -65,41 +148,146 @@ class RAGSystem:
         print("Initialisation avec modèle d'embeddings local (gratuit)...")
         
         # Use HuggingFace embeddings (free, local)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+        self.embeddings = create_embeddings()
+        
+        # Serve already computed vectors from disk instead of re-running the model
+        if settings.embedding_cache_enabled:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                EmbeddingCache(
+                    settings.embedding_cache_directory,
+                    max_entries=settings.embedding_cache_max_entries
+                ),
+                model_name=settings.embedding_model,
+                normalize=True
+            )
+        
+        # Repeated queries skip the transformer entirely
+        self.query_cache = LRUCache(
+            max_entries=settings.query_cache_max_entries,
+            max_bytes=settings.query_cache_max_bytes or None,
+            ttl=settings.query_cache_ttl or None,
+            sizeof=lambda vector: vector.nbytes
         )
         
+        # Cache misses of concurrent requests are encoded together
+        self.query_batcher = None
+        if settings.query_batch_enabled:
+            self.query_batcher = QueryBatcher(
+                self.embeddings.embed_documents,
+                max_batch_size=settings.query_batch_max_size,
+                max_wait=settings.query_batch_window_ms / 1000
+            )
+        
+        # Profile vectors from genre centroids and cached mood/description embeddings
+        self.profile_encoder = ProfileEncoder(
+            self._embed_queries,
+            max_entries=settings.profile_cache_max_entries
+        )
+        
+        # Ranked search results, only valid for the index generation they were computed on
+        self.result_cache = LRUCache(max_entries=settings.result_cache_max_entries)
+        
+        # Retrieval rounds per request (see _search) and encoder-free name answers
+        self.retrieval_stats = {"requests": 0, "rounds": {}, "candidates": 0, "fallbacks": 0,
+                                "lexical_answers": 0}
+        self._stats_lock = threading.Lock()
+        
         # Use simple local LLM
         self.llm = SimpleLLM()
         
         self.vectorstore = None
+        self.state = None  # IndexState, replaced as a whole by _refresh_index
         self.conversation_chain = None
-        self.chat_history = []  # Simple list to store conversation history
-        self.recommended_movies = set()  # Track recommended movie IDs
+        self._load_lock = threading.Lock()
         
-    def initialize_vectorstore(self):
-        """Initialize and populate the vector database."""
-        # Load movie data
-        processor = MovieDataProcessor()
-        processor.load_sample_movies()
-        documents = processor.format_movies_for_rag()
-        
-        # Prepare texts and metadatas
-        texts = [doc["content"] for doc in documents]
-        metadatas = [doc["metadata"] for doc in documents]
-        
-        # Create vector store
-        self.vectorstore = Chroma.from_texts(
-            texts=texts,
-            embedding=self.embeddings,
-            metadatas=metadatas,
-            persist_directory=settings.chroma_persist_directory
+        # Recommended movies and history, per client session
+        self.sessions = SessionStore(
+            max_sessions=settings.session_max_sessions,
+            idle_timeout=settings.session_idle_timeout,
+            max_bytes=settings.session_max_bytes,
+            history_size=settings.session_history_size
         )
         
-        print(f"Vector store initialized with {len(texts)} documents")
-        
+    def initialize_vectorstore(self, incremental: bool = True) -> Dict[str, int]:
+        """
+        Initialize and populate the vector database.
+
+        Documents are stored under their movie id. In incremental mode only
+        movies whose content hash changed are embedded again, and movies no
+        longer present in the catalog are deleted.
+
+        Args:
+            incremental: Diff against the stored documents instead of
+                rebuilding the whole collection
+
+        Returns:
+            Counts of added, updated, removed and unchanged documents
+        """
+        # Movies are streamed from the catalog, never held in memory all at once
+        processor = MovieDataProcessor()
+
+        if self.vectorstore is None:
+            self.vectorstore = Chroma(
+                persist_directory=settings.chroma_persist_directory,
+                embedding_function=self.embeddings
+            )
+
+        # Hashes of what is already stored, keyed by document id
+        stored_hashes = {}
+        for page in iter_collection_pages(self.vectorstore._collection, ["metadatas"],
+                                          settings.indexing_read_page_size):
+            stored_hashes.update(
+                (doc_id, (metadata or {}).get("content_hash"))
+                for doc_id, metadata in zip(page["ids"], page["metadatas"])
+            )
+        if not incremental:
+            stored_hashes = {doc_id: None for doc_id in stored_hashes}
+
+        report = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        catalog_ids = set()
+
+        def changed_documents():
+            # Stream the catalog and only let new or modified movies through
+            for doc in processor.iter_rag_documents(processor.iter_movies()):
+                doc_id = str(doc["metadata"]["id"])
+                if doc_id in catalog_ids:
+                    continue
+                catalog_ids.add(doc_id)
+                if doc_id not in stored_hashes:
+                    report["added"] += 1
+                elif stored_hashes[doc_id] != doc["metadata"]["content_hash"]:
+                    report["updated"] += 1
+                else:
+                    report["unchanged"] += 1
+                    continue
+                yield doc
+
+        pipeline = IndexingPipeline(
+            self.embeddings,
+            self.vectorstore._collection,
+            batch_size=settings.indexing_batch_size,
+            commit_size=settings.indexing_commit_size,
+            workers=settings.indexing_workers,
+            embeddings_factory=create_embeddings
+        )
+        stats = pipeline.run(changed_documents())
+
+        # Rows without a catalog id (e.g. duplicates from older full rebuilds) are dropped
+        removed_ids = [doc_id for doc_id in stored_hashes if doc_id not in catalog_ids]
+        if removed_ids:
+            self.vectorstore.delete(ids=removed_ids)
+        report["removed"] = len(removed_ids)
+        self._refresh_index()
+
+        print(
+            f"Vector store initialized with {len(catalog_ids)} documents "
+            f"({report['added']} added, {report['updated']} updated, "
+            f"{report['removed']} removed, {report['unchanged']} unchanged, "
+            f"{stats['docs_per_second']} docs/s)"
+        )
+        return report
+
     def load_vectorstore(self):
         """Load existing vector store."""
         try:
@@ -107,88 +295,413 @@ class RAGSystem:
                 persist_directory=settings.chroma_persist_directory,
                 embedding_function=self.embeddings
             )
+            self._refresh_index()
             print("Vector store loaded successfully")
         except Exception as e:
             print(f"Error loading vector store: {e}")
             print("Initializing new vector store...")
             self.initialize_vectorstore()
     
+    def _ensure_loaded(self) -> IndexState:
+        """Load the vector store once, even when requests arrive concurrently."""
+        state = self.state
+        if state is None:
+            with self._load_lock:
+                if self.state is None:
+                    self.load_vectorstore()
+            state = self.state
+        return state
+    
+    # Read-only views of the current state, for inspection; requests hold one state throughout
+    @property
+    def index(self) -> Any:
+        return self.state.index if self.state is not None else None
+    
+    @property
+    def lexical_index(self) -> Optional[LexicalIndex]:
+        return self.state.lexical_index if self.state is not None else None
+    
+    @property
+    def catalog(self) -> Optional[MovieCatalog]:
+        return self.state.catalog if self.state is not None else None
+    
+    @property
+    def index_generation(self) -> int:
+        return self.state.generation if self.state is not None else 0
+    
+    def _refresh_index(self):
+        """Rebuild the catalog and search backend from what is stored in Chroma."""
+        collection = self.vectorstore._collection
+        include = ["documents", "metadatas"]
+        with_vectors = settings.vector_backend != "chroma"
+        if with_vectors:
+            include.append("embeddings")
+        
+        # The collection is read page by page, so Chroma's raw rows of the
+        # whole catalog are never held at once
+        vector_pages = []
+        
+        def documents():
+            pages = iter_collection_pages(collection, include, settings.indexing_read_page_size)
+            for page in pages:
+                if with_vectors:
+                    vector_pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+                yield from zip(page["documents"], page["metadatas"])
+        
+        catalog = MovieCatalog(documents())
+        vectors = np.concatenate(vector_pages) if vector_pages else None
+        index = build_vector_index(
+            settings.vector_backend,
+            collection,
+            ids=catalog.ids,
+            vectors=vectors,
+            precision=settings.vector_precision,
+            rescore_factor=settings.vector_rescore_factor,
+            rescore_directory=settings.vector_rescore_directory
+        )
+        lexical_index = LexicalIndex(catalog)
+        
+        # Swap in the new state only once it is complete, in one assignment
+        state = IndexState(index, lexical_index, catalog, self.index_generation + 1)
+        self.state = state
+        # Cached results of the previous index can never be served again
+        self.result_cache.clear()
+        self.sessions.remap(catalog)
+        # Genre centroids are averaged from the in-process vectors when the backend has them
+        matrix = getattr(index, "matrix", None)
+        centroids = None
+        if matrix is not None and matrix.size:
+            centroids = genre_centroids(catalog.profile_genre_counts, matrix)
+        self.profile_encoder.set_centroids(catalog.profile_keys, centroids)
+        print(f"Vector index ready ({index.name}, {len(index)} documents)")
+    
+    def _search(self, state: IndexState, query: str, k: int,
+                genres: Optional[List[str]] = None,
+                min_year: Optional[int] = None, max_year: Optional[int] = None,
+                min_rating: Optional[float] = None,
+                exclude: Optional[Any] = None,
+                query_vector: Optional[np.ndarray] = None) -> List[Any]:
+        """
+        Embed a query and return its k nearest documents, hydrated from the catalog.
+
+        Filters are applied inside the index search, so k valid hits are
+        returned whenever k movies match them. The ranked list of a query is
+        cached per index generation as (id, score, row) tuples and excluded
+        rows are removed from it afterwards. The list starts about k deep and grows geometrically while
+        exclusions leave fewer than k hits; past retrieval_max_candidates the
+        exclusions are pushed into the index mask instead, so long sessions
+        still get full pages.
+
+        Args:
+            state: Index state the request reads
+            query: Search text
+            k: Number of results to return
+            genres: Genre names; movies need at least one of them
+            min_year: Earliest release year
+            max_year: Latest release year
+            min_rating: Minimum rating
+            exclude: Catalog rows to leave out (a session's RowBitset)
+            query_vector: Vector to search with; query then only keys the
+                cached ranked list and is not embedded
+
+        Returns:
+            Search hits carrying page_content and metadata
+        """
+        exclude = exclude or ()
+        filters = (genre_mask(genres or []), min_year, max_year, min_rating)
+        key = (state.generation, self._normalize_query(query), filters)
+        
+        ranked, exhaustive = self.result_cache.get(key) or ([], False)
+        depth = len(ranked)
+        ceiling = max(settings.retrieval_max_candidates, k)
+        rounds = 0
+        mask = None
+        
+        while True:
+            hits = [entry for entry in ranked if entry[2] not in exclude]
+            if len(hits) >= k or exhaustive or depth >= ceiling:
+                break
+            if mask is None:
+                mask = state.catalog.filter_mask(*filters)
+                if mask is not None and not mask.any():
+                    return []
+            # Grow the candidate list only when exclusions drained it
+            if rounds == 0 and depth == 0:
+                depth = k * settings.retrieval_initial_factor
+            else:
+                depth *= max(2, settings.retrieval_growth_factor)
+            depth = min(max(depth, k), ceiling)
+            ranked = [
+                (hit.id, hit.score, state.catalog.row_of(hit.id))
+                for hit in state.index.search(self._query_vector(query, query_vector), depth, mask)
+            ]
+            exhaustive = len(ranked) < depth
+            self.result_cache.put(key, (ranked, exhaustive))
+            rounds += 1
+        
+        fallback = len(hits) < k and not exhaustive
+        if fallback:
+            # Exclusions outgrew the ceiling: filter them inside the index
+            if mask is None:
+                mask = state.catalog.filter_mask(*filters)
+            allowed = np.ones(len(state.catalog), dtype=bool) if mask is None else mask.copy()
+            allowed[exclude.rows()] = False
+            hits = state.index.search(self._query_vector(query, query_vector), k, allowed)
+        else:
+            hits = [SearchHit(doc_id, score, row=row) for doc_id, score, row in hits[:k]]
+        self._record_retrieval(rounds, len(ranked), fallback)
+        return state.catalog.hydrate(hits[:k])
+    
+    def _retrieve(self, state: IndexState, query: str, k: int,
+                  genres: Optional[List[str]] = None,
+                  min_year: Optional[int] = None, max_year: Optional[int] = None,
+                  min_rating: Optional[float] = None, exclude: Optional[Any] = None,
+                  mode: Optional[str] = None) -> List[Any]:
+        """
+        Run a search in the given mode ("vector" or "hybrid").
+        
+        Args:
+            state: Index state the request reads
+            query: Search text
+            k: Number of results to return
+            genres: Genre names; movies need at least one of them
+            min_year: Earliest release year
+            max_year: Latest release year
+            min_rating: Minimum rating
+            exclude: Catalog rows to leave out (a session's RowBitset)
+            mode: Search mode, settings.search_mode by default
+            
+        Returns:
+            Search hits carrying page_content and metadata
+        """
+        mode = mode or settings.search_mode
+        if mode == "vector":
+            return self._search(state, query, k, genres, min_year, max_year, min_rating, exclude)
+        if mode != "hybrid":
+            raise ValueError(f"Unknown search mode: {mode}")
+        return self._hybrid_search(state, query, k, genres, min_year, max_year, min_rating,
+                                   exclude)
+    
+    def _hybrid_search(self, state: IndexState, query: str, k: int,
+                       genres: Optional[List[str]] = None,
+                       min_year: Optional[int] = None, max_year: Optional[int] = None,
+                       min_rating: Optional[float] = None,
+                       exclude: Optional[Any] = None) -> List[Any]:
+        """
+        Combine BM25 over movie names with vector search.
+        
+        Movies a query names exactly (a title, a director, an actor) come
+        first; when they fill all k results the query is answered from the
+        lexical index alone, without running the encoder. The remaining
+        results merge the lexical and vector rankings by reciprocal rank
+        fusion, provided the best lexical hit matches at least
+        settings.hybrid_min_coverage of the query words; other queries
+        (descriptions, moods, genres) keep the vector ranking.
+        
+        Args:
+            state: Index state the request reads
+            query: Search text
+            k: Number of results to return
+            genres: Genre names; movies need at least one of them
+            min_year: Earliest release year
+            max_year: Latest release year
+            min_rating: Minimum rating
+            exclude: Catalog rows to leave out (a session's RowBitset)
+            
+        Returns:
+            Search hits carrying page_content and metadata
+        """
+        catalog, lexical_index = state.catalog, state.lexical_index
+        allowed = catalog.filter_mask(genre_mask(genres or []), min_year, max_year, min_rating)
+        if exclude:
+            if allowed is None:
+                allowed = np.ones(len(catalog), dtype=bool)
+            allowed[exclude.rows()] = False
+        
+        named = catalog.hydrate(lexical_index.lookup(query, k, allowed))
+        if len(named) == k:
+            with self._stats_lock:
+                self.retrieval_stats["lexical_answers"] += 1
+            return named
+        
+        depth = max(k, settings.hybrid_candidates)
+        lexical = lexical_index.search(query, depth, allowed)
+        if lexical and lexical_index.coverage(query, lexical[0]) < settings.hybrid_min_coverage:
+            lexical = []
+        results = self._search(state, query, depth if lexical else k, genres, min_year, max_year,
+                               min_rating, exclude)
+        if lexical:
+            results = catalog.hydrate(reciprocal_rank_fusion([results, lexical], k))
+        if not named:
+            return results[:k]
+        # Named movies first, then the best of the others up to k
+        named_rows = {doc.row for doc in named}
+        return (named + [doc for doc in results if doc.row not in named_rows])[:k]
+    
+    def _record_retrieval(self, rounds: int, candidates: int, fallback: bool):
+        with self._stats_lock:
+            stats = self.retrieval_stats
+            stats["requests"] += 1
+            stats["rounds"][rounds] = stats["rounds"].get(rounds, 0) + 1
+            stats["candidates"] += candidates
+            stats["fallbacks"] += int(fallback)
+    
+    def _search_batch(self, state: IndexState, queries: List[str], k: int,
+                      query_genres: List[List[str]],
+                      min_year: Optional[int] = None, max_year: Optional[int] = None,
+                      min_rating: Optional[float] = None,
+                      vectors: Optional[np.ndarray] = None) -> List[List[Any]]:
+        """
+        Run many searches with one multi-query index search per filter.
+        
+        Args:
+            state: Index state the request reads
+            queries: Search texts
+            k: Number of results per query
+            query_genres: Genre names of each query
+            min_year: Earliest release year
+            max_year: Latest release year
+            min_rating: Minimum rating
+            vectors: Vectors to search with, one per query, instead of
+                embedding the queries
+            
+        Returns:
+            Hydrated hits of each query, in input order
+        """
+        results = [[] for _ in queries]
+        if not queries:
+            return results
+        if vectors is None:
+            vectors = self._embed_queries(queries)
+        
+        # Queries sharing the same genre filter share one mask and one index call
+        groups = {}
+        for i, genres in enumerate(query_genres):
+            groups.setdefault(genre_mask(genres or []), []).append(i)
+        for genres, positions in groups.items():
+            mask = state.catalog.filter_mask(genres, min_year, max_year, min_rating)
+            if mask is not None and not mask.any():
+                continue
+            hits = state.index.search_batch(vectors[positions], k, mask)
+            for i, query_hits in zip(positions, hits):
+                results[i] = state.catalog.hydrate(query_hits)
+        return results
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed many queries, encoding only the distinct ones missing from the cache."""
+        texts = [self._normalize_query(query) for query in queries]
+        vectors = {}
+        for text in texts:
+            if text not in vectors:
+                vectors[text] = self.query_cache.get(text)
+        missing = [text for text, vector in vectors.items() if vector is None]
+        for start in range(0, len(missing), settings.indexing_batch_size):
+            chunk = missing[start:start + settings.indexing_batch_size]
+            for text, vector in zip(chunk, self.embeddings.embed_documents(chunk)):
+                vector = np.asarray(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                self.query_cache.put(text, vector)
+                vectors[text] = vector
+        return np.stack([vectors[text] for text in texts])
+    
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        # The MiniLM tokenizer is uncased, so case and spacing do not change the vector
+        return " ".join(query.lower().split())
+    
+    def _query_vector(self, query: str, query_vector: Optional[np.ndarray]) -> np.ndarray:
+        return self._embed_query(query) if query_vector is None else query_vector
+    
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a query, served from the in-memory query cache when possible."""
+        text = self._normalize_query(query)
+        vector = self.query_cache.get(text)
+        if vector is None:
+            if self.query_batcher is not None:
+                vector = self.query_batcher.embed(text)
+            else:
+                vector = self.embeddings.embed_query(text)
+            vector = np.asarray(vector, dtype=np.float32)
+            vector.setflags(write=False)
+            self.query_cache.put(text, vector)
+        return vector
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return the statistics of the in-memory caches."""
+        return {
+            "index_generation": self.index_generation,
+            "query_embeddings": self.query_cache.stats(),
+            "results": self.result_cache.stats(),
+            "query_batching": self.query_batcher.stats() if self.query_batcher else None,
+            "profiles": self.profile_encoder.stats(),
+            "sessions": self.sessions.stats(),
+            "retrieval": self._retrieval_summary()
+        }
+    
+    def _retrieval_summary(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = self.retrieval_stats
+            requests = stats["requests"]
+            return {
+                "requests": requests,
+                "rounds": dict(sorted(stats["rounds"].items())),
+                "mean_candidates": round(stats["candidates"] / requests, 1) if requests else 0.0,
+                "fallbacks": stats["fallbacks"],
+                "lexical_answers": stats["lexical_answers"]
+            }
+    
+    def get_movie(self, movie_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Look up a movie in the catalog.
+        
+        Args:
+            movie_id: TMDB movie id
+            
+        Returns:
+            Movie document (content and metadata), or None if unknown
+        """
+        return self._ensure_loaded().catalog.get(movie_id)
+    
     def setup_conversation_chain(self):
         """Set up the conversational retrieval chain."""
-        if self.vectorstore is None:
-            self.load_vectorstore()
+        self._ensure_loaded()
         
         print("Conversation chain ready")
     
-    def get_response(self, query: str, user_profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def get_response(self, query: str, user_profile: Optional[Dict[str, Any]] = None,
+                     session_id: Optional[str] = None,
+                     mode: Optional[str] = None,
+                     mmr_lambda: Optional[float] = None) -> Dict[str, Any]:
         """
         Get a response from the RAG system.
         
         Args:
             query: User's question or request
             user_profile: Optional user profile with preferences
+            session_id: Client session whose recommendations are tracked
+            mode: Search mode ("vector" or "hybrid"), settings.search_mode by default
+            mmr_lambda: Relevance share of the diversity re-ranking (1 = off),
+                settings.mmr_lambda by default
             
         Returns:
             Dictionary containing answer and source documents
         """
-        if self.vectorstore is None:
-            self.load_vectorstore()
-        
-        # Store the user's query and profile in the LLM so it can use them
-        self.llm.user_query = query
-        self.llm.user_profile = user_profile
+        state = self._ensure_loaded()
         
         try:
-            # Extract genre keywords from query
-            genre_keywords = self._extract_genre_from_query(query)
-            
-            # Get relevant documents - request more to filter out already recommended
-            docs = self.vectorstore.similarity_search(query, k=settings.top_k_results * 10)
+            session = self.sessions.get(session_id)
+            filtered_docs = self._chat_documents(state, query, session, mode, mmr_lambda)
             
-            # Filter by genre if specified, and exclude already recommended
-            filtered_docs = []
-            for doc in docs:
-                movie_id = doc.metadata.get("id")
-                if movie_id in self.recommended_movies:
-                    continue
-                    
-                # If genre specified, check if movie matches
-                if genre_keywords:
-                    movie_genres = doc.metadata.get("genre", "[]")
-                    import json
-                    try:
-                        genres_list = json.loads(movie_genres) if isinstance(movie_genres, str) else movie_genres
-                        genres_lower = [g.lower() for g in genres_list]
-                        
-                        # Check if any requested genre matches movie genres
-                        if not any(keyword in genre for genre in genres_lower for keyword in genre_keywords):
-                            continue
-                    except:
-                        pass
-                
-                filtered_docs.append(doc)
-                self.recommended_movies.add(movie_id)
-                if len(filtered_docs) >= settings.top_k_results:
-                    break
-            
-            # Pass documents to LLM
-            self.llm.found_documents = filtered_docs
-            
-            # Use LLM to generate response
-            answer = self.llm._call("")
+            # Use LLM to generate response from this request's documents only
+            answer = self.llm.render(query, filtered_docs, user_profile)
             
             # Store in history
-            self.chat_history.append({"question": query, "answer": answer})
+            session.add_exchange(query, answer)
+            self.sessions.touch(session_id)
             
             return {
                 "answer": answer,
-                "source_documents": [
-                    {
-                        "content": doc.page_content,
-                        "metadata": doc.metadata
-                    }
-                    for doc in filtered_docs
-                ]
+                "source_documents": [self._chat_source(doc) for doc in filtered_docs]
             }
         except Exception as e:
             return {
@@ -196,108 +709,338 @@ class RAGSystem:
                 "source_documents": []
             }
     
-    def search_similar_movies(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def stream_response(self, query: str, user_profile: Optional[Dict[str, Any]] = None,
+                        session_id: Optional[str] = None,
+                        mode: Optional[str] = None,
+                        mmr_lambda: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the response of the RAG system, one recommended movie at a time.
+        
+        Retrieval runs when the first event is requested; each movie is then
+        rendered and sent on its own, so the first recommendation reaches the
+        client before the others are formatted.
+        
+        Args:
+            query: User's question or request
+            user_profile: Optional user profile with preferences
+            session_id: Client session whose recommendations are tracked
+            mode: Search mode ("vector" or "hybrid"), settings.search_mode by default
+            mmr_lambda: Relevance share of the diversity re-ranking (1 = off),
+                settings.mmr_lambda by default
+            
+        Yields:
+            Events {"event": name, "data": payload}: "text" with the next
+            chunk of the answer, "source" with the document of the movie it
+            describes, and last "done" with the whole answer
+        """
+        state = self._ensure_loaded()
+        
+        try:
+            session = self.sessions.get(session_id)
+            filtered_docs = self._chat_documents(state, query, session, mode, mmr_lambda)
+        except Exception as e:
+            answer = f"Désolé, une erreur s'est produite: {str(e)}"
+            yield {"event": "text", "data": {"text": answer}}
+            yield {"event": "done", "data": {"answer": answer}}
+            return
+        
+        chunks = []
+        for i, chunk in enumerate(self.llm.render_stream(query, filtered_docs, user_profile)):
+            chunks.append(chunk)
+            yield {"event": "text", "data": {"text": chunk}}
+            if i < len(filtered_docs):
+                yield {"event": "source", "data": self._chat_source(filtered_docs[i])}
+        # Documents beyond the described ones are still listed as sources
+        for doc in filtered_docs[len(chunks):]:
+            yield {"event": "source", "data": self._chat_source(doc)}
+        
+        answer = "".join(chunks).strip()
+        session.add_exchange(query, answer)
+        self.sessions.touch(session_id)
+        yield {"event": "done", "data": {"answer": answer}}
+    
+    @staticmethod
+    def _chat_source(doc: Any) -> Dict[str, Any]:
+        """Source entry of a chat answer: only the metadata the client shows."""
+        metadata = doc.metadata
+        return {"metadata": {field: metadata.get(field) for field in CHAT_SOURCE_FIELDS}}
+    
+    def _chat_documents(self, state: IndexState, query: str, session: Any,
+                        mode: Optional[str],
+                        mmr_lambda: Optional[float] = None) -> List[Any]:
+        """Retrieve the documents answering a chat message and mark them recommended."""
+        # Extract genre keywords from query
+        genre_keywords = self._extract_genre_from_query(query)
+        
+        # Genre and already recommended movies are filtered inside the search
+        k = settings.top_k_results
+        lambda_mult = self._mmr_lambda(mmr_lambda)
+        excluded = session.exclusions(state.catalog)
+        filtered_docs = self._retrieve(
+            state,
+            query,
+            k=self._mmr_depth(k, lambda_mult),
+            genres=genre_keywords,
+            exclude=excluded,
+            mode=mode
+        )
+        order = self._mmr_order(state, filtered_docs, [doc.score for doc in filtered_docs], k, lambda_mult)
+        if order is not None:
+            filtered_docs = [filtered_docs[i] for i in order]
+        filtered_docs = filtered_docs[:k]
+        excluded.update(doc.row for doc in filtered_docs)
+        return filtered_docs
+    
+    def search_similar_movies(self, query: str, k: int = 5,
+                              genres: Optional[List[str]] = None,
+                              min_year: Optional[int] = None,
+                              max_year: Optional[int] = None,
+                              min_rating: Optional[float] = None,
+                              session_id: Optional[str] = None,
+                              mode: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Search for similar movies based on query.
         
         Args:
             query: Search query
             k: Number of results to return
+            genres: Genre names to keep (defaults to the genres named in the query)
+            min_year: Earliest release year
+            max_year: Latest release year
+            min_rating: Minimum rating
+            session_id: Client session whose recommendations are excluded
+            mode: Search mode ("vector" or "hybrid"), settings.search_mode by default
             
         Returns:
             List of similar movie documents
         """
-        if self.vectorstore is None:
-            self.load_vectorstore()
+        state = self._ensure_loaded()
+        
+        session = self.sessions.get(session_id)
+        excluded = session.exclusions(state.catalog)
         
         # Extract genre keywords from query
-        genre_keywords = self._extract_genre_from_query(query)
+        if not genres:
+            genres = self._extract_genre_from_query(query)
         
-        # Request more results to account for potential duplicates and already recommended
-        results = self.vectorstore.similarity_search(query, k=k*10)
+        # Filter by genre, year, rating and exclude already recommended inside the search
+        results = self._retrieve(
+            state,
+            query,
+            k=k,
+            genres=genres,
+            min_year=min_year,
+            max_year=max_year,
+            min_rating=min_rating,
+            exclude=excluded,
+            mode=mode
+        )
+        excluded.update(doc.row for doc in results)
+        self.sessions.touch(session_id)
         
-        # Deduplicate by movie ID, filter by genre, and exclude already recommended
-        seen_ids = set()
-        unique_results = []
+        return [doc.to_dict() for doc in results]
+    
+    def search_similar_movies_batch(self, queries: List[str], k: int = 5,
+                                    genres: Optional[List[str]] = None,
+                                    min_year: Optional[int] = None,
+                                    max_year: Optional[int] = None,
+                                    min_rating: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for similar movies for many queries at once.
         
-        for doc in results:
-            movie_id = doc.metadata.get("id")
-            if movie_id in seen_ids or movie_id in self.recommended_movies:
-                continue
-            
-            # If genre specified, check if movie matches
-            if genre_keywords:
-                movie_genres = doc.metadata.get("genre", "[]")
-                import json
-                try:
-                    genres_list = json.loads(movie_genres) if isinstance(movie_genres, str) else movie_genres
-                    genres_lower = [g.lower() for g in genres_list]
-                    
-                    # Check if any requested genre matches movie genres
-                    if not any(keyword in genre for genre in genres_lower for keyword in genre_keywords):
-                        continue
-                except:
-                    pass
-            
-            seen_ids.add(movie_id)
-            self.recommended_movies.add(movie_id)
-            unique_results.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata
-            })
+        Queries are embedded in batches and searched together; no session
+        state is read or recorded.
+        
+        Args:
+            queries: Search queries
+            k: Number of results per query
+            genres: Genre names to keep (defaults to the genres named in each query)
+            min_year: Earliest release year
+            max_year: Latest release year
+            min_rating: Minimum rating
             
-            if len(unique_results) >= k:
-                break
+        Returns:
+            One list of movie documents per query, in input order
+        """
+        state = self._ensure_loaded()
         
-        return unique_results
+        query_genres = [genres or self._extract_genre_from_query(query) for query in queries]
+        results = self._search_batch(state, queries, k, query_genres, min_year, max_year, min_rating)
+        return [[doc.to_dict() for doc in docs] for docs in results]
     
     def _extract_genre_from_query(self, query: str) -> List[str]:
-        """Extract genre keywords from user query."""
-        query_lower = query.lower()
-        genre_map = {
-            "action": ["action"],
-            "aventure": ["adventure", "aventure"],
-            "comédie": ["comedy", "comedie", "comédie"],
-            "drame": ["drama", "drame"],
-            "horreur": ["horror", "horreur", "épouvante"],
-            "science-fiction": ["sci-fi", "science fiction", "science-fiction", "sf"],
-            "thriller": ["thriller", "suspense"],
-            "romance": ["romance", "romantique"],
-            "fantastique": ["fantasy", "fantastique"],
-            "animation": ["animation", "animé"],
-            "crime": ["crime", "policier"],
-            "guerre": ["war", "guerre"],
-            "western": ["western"]
-        }
-        
-        found_genres = []
-        for genre, keywords in genre_map.items():
-            if any(keyword in query_lower for keyword in keywords):
-                found_genres.append(genre)
-        
-        return found_genres
+        """Extract canonical genres (see src.genres) from user query."""
+        return extract_genres(query)
     
-    def reset_conversation(self):
-        """Reset the conversation history."""
-        self.chat_history = []
-        self.recommended_movies.clear()
+    def reset_conversation(self, session_id: Optional[str] = None):
+        """Reset the conversation history and recommended movies of a session."""
+        self.sessions.reset(session_id)
         print("Conversation history and recommended movies cleared")
     
-    def get_profile_suggestions(self, user_profile: Dict[str, Any], k: int = 4) -> List[Dict[str, Any]]:
+    def get_profile_suggestions(self, user_profile: Dict[str, Any], k: int = 4,
+                                session_id: Optional[str] = None,
+                                mmr_lambda: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         Get movie suggestions based on user profile.
         
         Args:
             user_profile: User preferences dictionary
             k: Number of suggestions to return
+            session_id: Client session whose recommendations are excluded
+            mmr_lambda: Relevance share of the diversity re-ranking (1 = off),
+                settings.mmr_lambda by default
             
         Returns:
             List of suggested movies with metadata and images
         """
-        if self.vectorstore is None:
-            self.load_vectorstore()
+        state = self._ensure_loaded()
         
-        # Build search query from profile
+        session = self.sessions.get(session_id)
+        excluded = session.exclusions(state.catalog)
+        lambda_mult = self._mmr_lambda(mmr_lambda)
+        
+        # Profile vector from genre centroids and cached texts, keyed by profile hash
+        query_vector = self.profile_encoder.encode(user_profile)
+        
+        # Extract genre keywords from the top genres, moods and description
+        genre_keywords = self._extract_genre_from_query(self._profile_query(user_profile))
+        
+        # Search for similar movies, filtered by genre and excluding already recommended
+        results = self._search(
+            state,
+            "profile:" + self.profile_encoder.profile_key(user_profile),
+            k=self._rerank_depth(k, lambda_mult),
+            genres=genre_keywords,
+            exclude=excluded,
+            query_vector=query_vector
+        )
+        results, scores = self._rank_by_profile(state, results, user_profile, k, lambda_mult)
+        excluded.update(doc.row for doc in results)
+        self.sessions.touch(session_id)
+        
+        return [self._format_suggestion(doc, score) for doc, score in zip(results, scores)]
+    
+    def get_profile_suggestions_batch(self, user_profiles: List[Dict[str, Any]],
+                                      k: int = 4,
+                                      mmr_lambda: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Get movie suggestions for many profiles at once.
+        
+        Profile vectors are built together and searched in batches; no
+        session state is read or recorded, so this suits precomputing
+        suggestions.
+        
+        Args:
+            user_profiles: User preferences dictionaries
+            k: Number of suggestions per profile
+            mmr_lambda: Relevance share of the diversity re-ranking (1 = off),
+                settings.mmr_lambda by default
+            
+        Returns:
+            One list of suggestions per profile, in input order
+        """
+        state = self._ensure_loaded()
+        
+        lambda_mult = self._mmr_lambda(mmr_lambda)
+        queries = [self._profile_query(profile) for profile in user_profiles]
+        results = self._search_batch(
+            state, queries, self._rerank_depth(k, lambda_mult),
+            [self._extract_genre_from_query(query) for query in queries],
+            vectors=self.profile_encoder.encode_many(user_profiles)
+        )
+        suggestions = []
+        for profile, docs in zip(user_profiles, results):
+            docs, scores = self._rank_by_profile(state, docs, profile, k, lambda_mult)
+            suggestions.append(
+                [self._format_suggestion(doc, score) for doc, score in zip(docs, scores)]
+            )
+        return suggestions
+    
+    @staticmethod
+    def _rerank_depth(k: int, lambda_mult: float = 1.0) -> int:
+        """Number of candidates to retrieve for k profile suggestions."""
+        depth = RAGSystem._mmr_depth(k, lambda_mult)
+        if settings.match_rerank_weight > 0:
+            depth = max(depth, k * max(1, settings.match_rerank_factor))
+        return depth
+    
+    @staticmethod
+    def _mmr_lambda(mmr_lambda: Optional[float]) -> float:
+        return settings.mmr_lambda if mmr_lambda is None else mmr_lambda
+    
+    @staticmethod
+    def _mmr_depth(k: int, lambda_mult: float) -> int:
+        """Number of candidates to retrieve for k diversified results."""
+        if lambda_mult < 1:
+            return k * max(1, settings.mmr_factor)
+        return k
+    
+    def _mmr_order(self, state: IndexState, docs: List[Any], relevance: Any, k: int,
+                   lambda_mult: float) -> Optional[np.ndarray]:
+        """
+        Pick k candidates by maximal marginal relevance.
+        
+        Candidate vectors are read from the vector index by catalog row,
+        never re-embedded.
+        
+        Args:
+            state: Index state the hits come from
+            docs: Hydrated search hits
+            relevance: Ranking score of each hit
+            k: Number of hits to pick
+            lambda_mult: Relevance share, 1 keeps the ranking as is
+            
+        Returns:
+            Positions of the picked hits, or None when diversity is off or
+            the backend cannot return its vectors
+        """
+        if lambda_mult >= 1 or len(docs) < 2:
+            return None
+        vectors = state.index.vectors(np.asarray([doc.row for doc in docs], dtype=np.intp))
+        if vectors is None:
+            return None
+        return mmr(relevance, vectors, k, lambda_mult)
+    
+    def _rank_by_profile(self, state: IndexState, docs: List[Any],
+                         user_profile: Dict[str, Any], k: int,
+                         lambda_mult: float = 1.0) -> Tuple[List[Any], np.ndarray]:
+        """
+        Score candidates against a profile and keep the k best.
+        
+        The match scores of all candidates come from one product of their
+        rows of the catalog's genre matrix with the profile weight vector.
+        With settings.match_rerank_weight above 0 the candidates are reordered
+        by their similarity blended with the match score; otherwise the
+        search order is kept. With lambda_mult below 1 the k hits are then
+        picked from that ranking by maximal marginal relevance.
+        
+        Args:
+            state: Index state the hits come from
+            docs: Search hits, in search order
+            user_profile: User preferences dictionary
+            k: Number of hits to keep
+            lambda_mult: Relevance share of the diversity re-ranking (1 = off)
+            
+        Returns:
+            The kept hits and their match scores
+        """
+        weights = profile_weights(user_profile, state.catalog.profile_keys)
+        rows = np.asarray([doc.row for doc in docs], dtype=np.intp)
+        scores = match_scores(state.catalog.profile_genre_counts[rows], weights)
+        relevance = np.asarray([doc.score for doc in docs], dtype=np.float64)
+        if settings.match_rerank_weight > 0 and weights is not None:
+            relevance = blend_scores(relevance, scores, settings.match_rerank_weight)
+            order = np.argsort(-relevance, kind="stable")[:k]
+        else:
+            order = np.arange(min(k, len(docs)))
+        diverse = self._mmr_order(state, docs, relevance, k, lambda_mult)
+        if diverse is not None:
+            order = diverse
+        return [docs[i] for i in order], scores[order]
+    
+    @staticmethod
+    def _profile_query(user_profile: Dict[str, Any]) -> str:
+        """Build the text of a profile's top genres, moods and description (genre filter)."""
         genres = user_profile.get("genres", {})
         top_genres = sorted(genres.items(), key=lambda x: x[1], reverse=True)[:2]
         
@@ -313,108 +1056,20 @@ class RAGSystem:
         if description:
             query_parts.append(description[:100])
         
-        query = " ".join(query_parts)
-        
-        # Extract genre keywords from query
-        genre_keywords = self._extract_genre_from_query(query)
-        
-        # Search for similar movies - request more to account for duplicates and already recommended
-        results = self.vectorstore.similarity_search(query, k=k*10)
-        
-        # Deduplicate by movie ID, filter by genre, and exclude already recommended
-        seen_ids = set()
-        suggestions = []
-        
-        for doc in results:
-            metadata = doc.metadata
-            movie_id = metadata.get("id")
-            
-            # Skip if we've already added this movie or it was recommended before
-            if movie_id in seen_ids or movie_id in self.recommended_movies:
-                continue
-            
-            # If genre specified, check if movie matches
-            if genre_keywords:
-                movie_genres = metadata.get("genre", "[]")
-                import json
-                try:
-                    genres_list = json.loads(movie_genres) if isinstance(movie_genres, str) else movie_genres
-                    genres_lower = [g.lower() for g in genres_list]
-                    
-                    # Check if any requested genre matches movie genres
-                    if not any(keyword in genre for genre in genres_lower for keyword in genre_keywords):
-                        continue
-                except:
-                    pass
-            
-            seen_ids.add(movie_id)
-            self.recommended_movies.add(movie_id)
-            match_score = self._compute_match_score(user_profile, metadata)
-            suggestions.append({
-                "id": movie_id,
-                "title": metadata.get("title", "Unknown"),
-                "year": metadata.get("year", "N/A"),
-                "genre": metadata.get("genre", []),
-                "director": metadata.get("director", "Unknown"),
-                "rating": metadata.get("rating", 0),
-                "description": doc.page_content,
-                "image_url": metadata.get("image_url", ""),
-                "local_image_path": metadata.get("local_image_path", ""),
-                "match_score": match_score
-            })
-            
-            # Stop once we have enough unique suggestions
-            if len(suggestions) >= k:
-                break
-        
-        return suggestions
-
-    def _compute_match_score(self, user_profile: Dict[str, Any], movie_metadata: Dict[str, Any]) -> float:
-        """Compute a simple compatibility score between profile and movie genres."""
-        genres_pref = user_profile.get("genres", {}) or {}
-        if not genres_pref:
-            return 0.0
-
-        raw_movie_genres = movie_metadata.get("genre", []) or []
-        if isinstance(raw_movie_genres, str):
-            try:
-                raw_movie_genres = json.loads(raw_movie_genres)
-            except Exception:
-                raw_movie_genres = [raw_movie_genres]
-
-        synonym_map = {
-            "action": "action",
-            "adventure": "aventure",
-            "aventure": "aventure",
-            "sci-fi": "science-fiction",
-            "science fiction": "science-fiction",
-            "science-fiction": "science-fiction",
-            "sf": "science-fiction",
-            "drama": "drame",
-            "drame": "drame",
-            "comedy": "comedie",
-            "comedie": "comedie",
-            "comédie": "comedie",
-            "romance": "romantique",
-            "romantique": "romantique",
-            "animation": "animation",
-            "anime": "animation",
-            "historical": "historique",
-            "history": "historique",
-            "historique": "historique",
-            "horror": "horreur",
-            "horreur": "horreur",
-            "thriller": "horreur",  # rapproché suspense/horreur
+        return " ".join(query_parts)
+    
+    def _format_suggestion(self, doc: Any, match_score: float) -> Dict[str, Any]:
+        """Build the suggestion payload of a search hit."""
+        metadata = doc.metadata
+        return {
+            "id": metadata.get("id"),
+            "title": metadata.get("title", "Unknown"),
+            "year": metadata.get("year", "N/A"),
+            "genre": metadata.get("genre", []),
+            "director": metadata.get("director", "Unknown"),
+            "rating": metadata.get("rating", 0),
+            "description": doc.page_content,
+            "image_url": metadata.get("image_url", ""),
+            "local_image_path": metadata.get("local_image_path", ""),
+            "match_score": float(match_score)
         }
-
-        normalized_genres = []
-        for genre in raw_movie_genres:
-            g = str(genre).lower()
-            normalized_genres.append(synonym_map.get(g, g))
-
-        score_raw = sum(genres_pref.get(g, 0) for g in normalized_genres)
-        max_possible = sum(genres_pref.values())
-        if max_possible <= 0:
-            return 0.0
-
-        return round(min(100.0, (score_raw / max_possible) * 100), 1)
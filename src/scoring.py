@@ -0,0 +1,58 @@
+"""Vectorized profile match scores and their blend with vector similarity."""
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+
+def profile_weights(user_profile: Dict[str, Any], keys: Sequence[str]) -> Optional[np.ndarray]:
+    """
+    Turn the genre preferences of a profile into a weight vector.
+
+    Args:
+        user_profile: User preferences; "genres" maps profile keys to weights
+        keys: Profile genre keys of the weight matrix columns
+            (MovieCatalog.profile_keys)
+
+    Returns:
+        Points earned per matching genre, so that matching every preferred
+        genre once scores 100, or None when the profile has no preference
+    """
+    preferences = user_profile.get("genres", {}) or {}
+    total = sum(preferences.values()) if preferences else 0
+    if total <= 0:
+        return None
+    weights = np.asarray([preferences.get(key, 0) for key in keys], dtype=np.float64)
+    return weights * (100.0 / total)
+
+
+def match_scores(genre_counts: np.ndarray, weights: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Score movies against a profile in one matrix product.
+
+    Args:
+        genre_counts: Rows of the movies × profile keys matrix
+            (MovieCatalog.profile_genre_counts), e.g. the candidate rows only
+        weights: Weight vector from profile_weights
+
+    Returns:
+        One score per row in [0, 100], rounded to one decimal
+    """
+    if weights is None:
+        return np.zeros(len(genre_counts))
+    return np.round(np.minimum(genre_counts @ weights, 100.0), 1)
+
+
+def blend_scores(similarities: Sequence[float], scores: np.ndarray, weight: float) -> np.ndarray:
+    """
+    Mix vector similarities with match scores into one ranking signal.
+
+    Args:
+        similarities: Similarity of each candidate to the query
+        scores: Match score of each candidate, in [0, 100]
+        weight: Share of the match score, from 0 (similarity only) to 1
+
+    Returns:
+        (1 - weight) * similarity + weight * score / 100 for each candidate
+    """
+    weight = min(max(weight, 0.0), 1.0)
+    return (1.0 - weight) * np.asarray(similarities, dtype=np.float64) + weight * scores / 100.0
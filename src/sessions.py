@@ -0,0 +1,212 @@
+"""Per-session recommendation state with bounded memory."""
+from typing import Any, Dict, Iterable, Optional
+from collections import OrderedDict, deque
+import threading
+import time
+
+import numpy as np
+
+
+DEFAULT_SESSION_ID = "default"
+
+
+class RowBitset:
+    """Set of catalog rows stored as one bit per row."""
+
+    def __init__(self, size: int):
+        """
+        Args:
+            size: Number of catalog rows
+        """
+        self.size = size
+        self.bits = np.zeros((size + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def add(self, row: int):
+        if not 0 <= row < self.size:
+            return
+        byte, bit = row >> 3, np.uint8(1 << (row & 7))
+        if not self.bits[byte] & bit:
+            self.bits[byte] |= bit
+            self.count += 1
+
+    def update(self, rows: Iterable[int]):
+        for row in rows:
+            self.add(row)
+
+    def __contains__(self, row: Optional[int]) -> bool:
+        if row is None or not 0 <= row < self.size:
+            return False
+        return bool(self.bits[row >> 3] & np.uint8(1 << (row & 7)))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def rows(self) -> np.ndarray:
+        """Rows in the set, in increasing order."""
+        return np.flatnonzero(np.unpackbits(self.bits, bitorder="little")[:self.size])
+
+    def clear(self):
+        self.bits[:] = 0
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+
+class SessionState:
+    """Recommendation state of one client session."""
+
+    def __init__(self, history_size: int):
+        """
+        Args:
+            history_size: Number of exchanges kept in the history
+        """
+        # Ids of the catalog the rows refer to, and the rows already recommended
+        self._exclusions = (None, RowBitset(0))
+        self.history = deque(maxlen=history_size)  # Oldest exchanges drop out first
+        self.last_seen = time.monotonic()
+        self.accounted_bytes = 0  # Size last counted by the SessionStore
+
+    def add_exchange(self, question: str, answer: str):
+        self.history.append({"question": question, "answer": answer})
+
+    @property
+    def excluded(self) -> RowBitset:
+        """Rows already recommended, in the catalog they were last aligned with."""
+        return self._exclusions[1]
+
+    def exclusions(self, catalog) -> RowBitset:
+        """
+        Return the rows already recommended, as rows of the given catalog.
+
+        The set is moved onto the catalog's rows (by movie id) when it was
+        built for another one, so a request still running on the previous
+        index never reads rows of the rebuilt catalog.
+        """
+        ids, excluded = self._exclusions
+        if ids is not catalog.ids:
+            movie_ids = ids[excluded.rows()] if ids is not None else ()
+            excluded = RowBitset(len(catalog))
+            excluded.update(
+                row for row in map(catalog.row_of, movie_ids) if row is not None
+            )
+            self._exclusions = (catalog.ids, excluded)
+        return excluded
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the state."""
+        history = sum(
+            len(item["question"]) + len(item["answer"]) for item in self.history
+        )
+        return self.excluded.nbytes + history
+
+
+class SessionStore:
+    """
+    Session states keyed by client session id.
+
+    Sessions idle for longer than idle_timeout are dropped, and the least
+    recently used ones are evicted when the number of sessions or their
+    total memory exceeds the limits.
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_timeout: float = 3600,
+                 max_bytes: int = 64 * 1024 * 1024, history_size: int = 20):
+        """
+        Args:
+            max_sessions: Maximum number of sessions kept
+            idle_timeout: Seconds without activity before a session is dropped
+            max_bytes: Memory cap for all sessions together
+            history_size: Number of exchanges kept per session
+        """
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self.history_size = history_size
+        self._sessions = OrderedDict()  # session id -> SessionState, LRU first
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, session_id: Optional[str]) -> SessionState:
+        """Return the state of a session, creating it if needed."""
+        session_id = session_id or DEFAULT_SESSION_ID
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            state = self._sessions.get(session_id)
+            if state is None:
+                state = SessionState(self.history_size)
+                self._sessions[session_id] = state
+                self._account(state)
+            self._sessions.move_to_end(session_id)
+            state.last_seen = now
+            self._enforce_limits()
+            return state
+
+    def touch(self, session_id: Optional[str]):
+        """Recount the memory of a session after it changed."""
+        with self._lock:
+            state = self._sessions.get(session_id or DEFAULT_SESSION_ID)
+            if state is not None:
+                self._account(state)
+                self._enforce_limits()
+
+    def reset(self, session_id: Optional[str]):
+        """Forget the state of one session."""
+        with self._lock:
+            state = self._sessions.pop(session_id or DEFAULT_SESSION_ID, None)
+            if state is not None:
+                self.bytes -= state.accounted_bytes
+
+    def _account(self, state: SessionState):
+        size = state.nbytes
+        self.bytes += size - state.accounted_bytes
+        state.accounted_bytes = size
+
+    def remap(self, new_catalog):
+        """Carry every session over to a rebuilt catalog."""
+        with self._lock:
+            for state in self._sessions.values():
+                state.exclusions(new_catalog)
+                self._account(state)
+
+    def _expire(self, now: float):
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state.last_seen <= self.idle_timeout:
+                break
+            del self._sessions[session_id]
+            self.bytes -= state.accounted_bytes
+            self.expirations += 1
+
+    def _enforce_limits(self):
+        # The most recently used session is always kept
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self.bytes > self.max_bytes
+        ):
+            _, state = self._sessions.popitem(last=False)
+            self.bytes -= state.accounted_bytes
+            self.evictions += 1
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return occupancy and eviction counters."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
@@ -0,0 +1,536 @@
+"""Vector index backends used for movie retrieval."""
+from typing import List, Dict, Any, Optional
+import glob
+import os
+import tempfile
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu is optional at runtime
+    faiss = None
+
+
+class SearchHit:
+    """
+    A search result, attribute-compatible with LangChain documents.
+
+    Indexes only return movie ids and scores; page_content, metadata, the
+    answer snippet and the catalog row are filled from the MovieCatalog.
+    """
+
+    __slots__ = ("id", "score", "page_content", "metadata", "row", "snippet")
+
+    def __init__(self, id: int, score: float, page_content: Optional[str] = None,
+                 metadata: Optional[Dict[str, Any]] = None, row: Optional[int] = None,
+                 snippet: Optional[str] = None):
+        self.id = id
+        self.score = score
+        self.page_content = page_content
+        self.metadata = metadata
+        self.row = row
+        self.snippet = snippet  # Answer text of the movie (MovieCatalog.snippet)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the result in the API document format."""
+        return {"content": self.page_content, "metadata": self.metadata}
+
+    def __repr__(self) -> str:
+        return f"SearchHit(id={self.id!r}, score={self.score:.4f})"
+
+
+class VectorIndex:
+    """Base class for vector search backends."""
+
+    name = "base"
+
+    def search(self, query_vector: np.ndarray, k: int,
+               mask: Optional[np.ndarray] = None) -> List[SearchHit]:
+        """
+        Find the k nearest documents of a query vector.
+
+        Args:
+            query_vector: Normalized query embedding
+            k: Number of results to return
+            mask: Optional boolean per row (MovieCatalog order); only rows
+                set to True are candidates
+
+        Returns:
+            Hits ordered by decreasing cosine similarity, exactly k unless
+            fewer rows are allowed
+        """
+        raise NotImplementedError
+
+    def search_batch(self, query_vectors: np.ndarray, k: int,
+                     mask: Optional[np.ndarray] = None) -> List[List[SearchHit]]:
+        """
+        Search many query vectors at once.
+
+        Args:
+            query_vectors: Normalized query embeddings, one per row
+            k: Number of results per query
+            mask: Optional boolean per row, shared by every query
+
+        Returns:
+            Hits of each query, in input order
+        """
+        return [self.search(query_vector, k, mask) for query_vector in query_vectors]
+
+    def vectors(self, rows: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Return the stored vectors of some catalog rows.
+
+        Args:
+            rows: Catalog rows
+
+        Returns:
+            Normalized float32 vectors, one per row, or None when the backend
+            cannot return them
+        """
+        return None
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class ChromaIndex(VectorIndex):
+    """
+    Search directly in a Chroma collection, without LangChain wrapping.
+
+    Masks are pushed down as an id filter while the shorter of the allowed
+    and excluded id lists stays under max_filter_ids (Chroma binds each id
+    as an SQL variable). Larger masks are applied in-process: the query
+    over-fetches in proportion to the share of rows the mask leaves out and
+    grows until k allowed hits are found.
+    """
+
+    name = "chroma"
+    max_filter_ids = 1000
+
+    def __init__(self, collection, ids=None):
+        """
+        Args:
+            collection: chromadb collection holding the movie documents
+            ids: Movie ids in catalog row order, needed to push masks down
+        """
+        self.collection = collection
+        self.ids = None if ids is None else np.asarray(ids, dtype=np.int64)
+        self._rows = None if ids is None else {int(i): row for row, i in enumerate(self.ids)}
+        self.space = (collection.metadata or {}).get("hnsw:space", "l2")
+
+    def _similarity(self, distance: float) -> float:
+        # Vectors are normalized, so every metric maps back to a cosine similarity
+        if self.space == "l2":
+            return 1.0 - distance / 2.0
+        return 1.0 - distance
+
+    def _where(self, mask: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Translate a row mask into a metadata filter on the movie id."""
+        allowed = self.ids[mask]
+        excluded = self.ids[~mask]
+        if len(excluded) == 0:
+            return None
+        # Send whichever id list is shorter
+        if len(allowed) <= len(excluded):
+            return {"id": {"$in": allowed.tolist()}}
+        return {"id": {"$nin": excluded.tolist()}}
+
+    def _query(self, query_vectors: np.ndarray, n_results: int,
+               where: Optional[Dict[str, Any]] = None) -> List[List[SearchHit]]:
+        results = self.collection.query(
+            query_embeddings=np.asarray(query_vectors, dtype=np.float32).tolist(),
+            n_results=n_results,
+            where=where,
+            include=["distances"]
+        )
+        # Documents are stored under their movie id
+        return [
+            [
+                SearchHit(int(doc_id), self._similarity(distance))
+                for doc_id, distance in zip(ids, distances)
+            ]
+            for ids, distances in zip(results["ids"], results["distances"])
+        ]
+
+    def _search_masked(self, query_vectors: np.ndarray, k: int, mask: np.ndarray,
+                       count: int) -> List[List[SearchHit]]:
+        """Apply a mask too large for an id filter to over-fetched results."""
+        total = len(self)
+        k = min(k, count)
+        depth = min(total, 2 * k * -(-total // count))
+        results = [None] * len(query_vectors)
+        pending = list(range(len(query_vectors)))
+        while pending:
+            hits = self._query(query_vectors[pending], depth)
+            remaining = []
+            for i, query_hits in zip(pending, hits):
+                rows = (self._rows.get(hit.id) for hit in query_hits)
+                kept = [hit for hit, row in zip(query_hits, rows) if row is not None and mask[row]]
+                if len(kept) >= k or depth >= total:
+                    results[i] = kept[:k]
+                else:
+                    remaining.append(i)
+            pending = remaining
+            depth = min(total, depth * 4)
+        return results
+
+    def search(self, query_vector: np.ndarray, k: int,
+               mask: Optional[np.ndarray] = None) -> List[SearchHit]:
+        return self.search_batch(np.asarray(query_vector).reshape(1, -1), k, mask)[0]
+
+    def search_batch(self, query_vectors: np.ndarray, k: int,
+                     mask: Optional[np.ndarray] = None) -> List[List[SearchHit]]:
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        count = len(self)
+        where = None
+        if mask is not None:
+            if self.ids is None:
+                raise ValueError("ChromaIndex needs the catalog ids to apply a mask")
+            count = int(np.count_nonzero(mask))
+            if count and k > 0 and min(count, len(mask) - count) > self.max_filter_ids:
+                return self._search_masked(query_vectors, k, mask, count)
+            where = self._where(mask)
+        if count == 0 or k <= 0:
+            return [[] for _ in query_vectors]
+        return self._query(query_vectors, min(k, count), where)
+
+    def vectors(self, rows: np.ndarray) -> Optional[np.ndarray]:
+        if self.ids is None:
+            return None
+        ids = [str(doc_id) for doc_id in self.ids[rows]]
+        data = self.collection.get(ids=ids, include=["embeddings"])
+        # Chroma does not keep the requested order
+        stored = dict(zip(data["ids"], data["embeddings"]))
+        matrix = np.asarray([stored[doc_id] for doc_id in ids], dtype=np.float32)
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    def __len__(self) -> int:
+        return self.collection.count()
+
+
+class NumpyIndex(VectorIndex):
+    """Exact in-process search over a contiguous normalized matrix."""
+
+    name = "numpy"
+    SCORE_BLOCK = 1 << 25
+
+    def __init__(self, ids, vectors):
+        """
+        Args:
+            ids: Movie ids, one per row
+            vectors: Embeddings, one row per movie
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        if vectors is None or len(vectors) == 0:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+        if matrix.size:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.maximum(norms, 1e-12)
+        self.matrix = matrix
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of vector data held in memory."""
+        return self.matrix.nbytes
+
+    @classmethod
+    def from_collection(cls, collection, **options) -> "VectorIndex":
+        """Build the index from the vectors already stored in Chroma."""
+        data = collection.get(include=["embeddings"])
+        return cls([int(doc_id) for doc_id in data["ids"]], data["embeddings"], **options)
+
+    def _hits(self, rows, scores) -> List[SearchHit]:
+        return [
+            SearchHit(int(self.ids[row]), float(score))
+            for row, score in zip(rows, scores)
+        ]
+
+    def vectors(self, rows: np.ndarray) -> Optional[np.ndarray]:
+        return np.asarray(self.matrix[rows])
+
+    def search(self, query_vector: np.ndarray, k: int,
+               mask: Optional[np.ndarray] = None) -> List[SearchHit]:
+        count = len(self)
+        if count == 0 or k <= 0:
+            return []
+        scores = self.matrix @ np.asarray(query_vector, dtype=np.float32)
+        candidates = None
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            scores = scores[candidates]
+            count = len(candidates)
+            if count == 0:
+                return []
+        if k < count:
+            rows = np.argpartition(-scores, k - 1)[:k]
+        else:
+            rows = np.arange(count)
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        if candidates is None:
+            return self._hits(rows, scores[rows])
+        return self._hits(candidates[rows], scores[rows])
+
+    def search_batch(self, query_vectors: np.ndarray, k: int,
+                     mask: Optional[np.ndarray] = None) -> List[List[SearchHit]]:
+        count = len(self)
+        if count == 0 or k <= 0:
+            return [[] for _ in query_vectors]
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        matrix, candidates = self.matrix, None
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            if len(candidates) == 0:
+                return [[] for _ in queries]
+            matrix = self.matrix[candidates]
+        count = len(matrix)
+        k = min(k, count)
+
+        results = []
+        # Bound the score matrix to about 32M floats per chunk of queries
+        chunk = max(1, self.SCORE_BLOCK // count)
+        for start in range(0, len(queries), chunk):
+            scores = queries[start:start + chunk] @ matrix.T
+            if k < count:
+                rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                rows = np.broadcast_to(np.arange(count), scores.shape)
+            top = np.take_along_axis(scores, rows, axis=1)
+            order = np.argsort(-top, axis=1, kind="stable")
+            rows = np.take_along_axis(rows, order, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            if candidates is not None:
+                rows = candidates[rows]
+            results.extend(self._hits(r, s) for r, s in zip(rows, top))
+        return results
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class FaissIndex(NumpyIndex):
+    """In-process search with a FAISS inner-product index."""
+
+    name = "faiss"
+
+    def __init__(self, ids, vectors):
+        if faiss is None:
+            raise ImportError("faiss-cpu is required for the 'faiss' vector backend")
+        super().__init__(ids, vectors)
+        self.faiss_index = None
+        if self.matrix.size:
+            self.faiss_index = faiss.IndexFlatIP(self.matrix.shape[1])
+            self.faiss_index.add(self.matrix)
+
+    def search(self, query_vector: np.ndarray, k: int,
+               mask: Optional[np.ndarray] = None) -> List[SearchHit]:
+        if mask is not None:
+            # A flat index is exact either way; the masked matrix scan avoids
+            # depending on FAISS selector support
+            return super().search(query_vector, k, mask)
+        count = len(self)
+        if count == 0 or k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        scores, rows = self.faiss_index.search(query, min(k, count))
+        return self._hits(rows[0], scores[0])
+
+    def search_batch(self, query_vectors: np.ndarray, k: int,
+                     mask: Optional[np.ndarray] = None) -> List[List[SearchHit]]:
+        count = len(self)
+        if mask is not None or count == 0 or k <= 0:
+            return super().search_batch(query_vectors, k, mask)
+        queries = np.ascontiguousarray(query_vectors, dtype=np.float32)
+        scores, rows = self.faiss_index.search(queries, min(k, count))
+        return [self._hits(r, s) for r, s in zip(rows, scores)]
+
+
+class QuantizedIndex(NumpyIndex):
+    """
+    In-process search over float16 or int8 vectors, re-scored exactly.
+
+    The scan reads the quantized matrix (2x or 4x smaller than float32) in
+    blocks converted to float32, keeps the rescore_factor × k best rows and
+    scores those again against the float32 vectors. int8 codes are symmetric,
+    with one float32 scale per vector. When a directory is given, the float32
+    vectors are written there and memory-mapped, so only the re-scored rows
+    are paged in instead of the whole matrix living on the heap.
+
+    Quantization only trades speed for memory, and only with a directory:
+    without one the codes are kept on top of the float32 matrix. Scans are
+    never faster than float32, since NumPy has no int8 or float16 matrix
+    product. The int8 conversion costs little, but the float16 one dominates
+    the scan (about 9x slower than float32 at 20k × 384), so int8 is the
+    precision to use when both are acceptable.
+    """
+
+    name = "quantized"
+    PRECISIONS = ("float16", "int8")
+    SCAN_BLOCK = 1024  # Rows converted to float32 at a time (about 1.5 MiB at dim 384)
+
+    def __init__(self, ids, vectors, precision: str = "int8", rescore_factor: int = 4,
+                 directory: Optional[str] = None):
+        """
+        Args:
+            ids: Movie ids, one per row
+            vectors: Embeddings, one row per movie
+            precision: "float16" or "int8"
+            rescore_factor: Candidates re-scored per requested result
+            directory: Where to memory-map the float32 vectors, or None to
+                keep them in memory
+        """
+        if precision not in self.PRECISIONS:
+            raise ValueError(
+                f"Unknown vector precision '{precision}' (expected one of {', '.join(self.PRECISIONS)})"
+            )
+        super().__init__(ids, vectors)
+        self.name = f"numpy-{precision}"
+        self.precision = precision
+        self.rescore_factor = max(1, int(rescore_factor))
+        self.path = None
+        matrix = self.matrix
+        self.scales = None
+        if precision == "float16":
+            self.codes = matrix.astype(np.float16)
+        else:
+            scales = np.abs(matrix).max(axis=1) / 127 if matrix.size else np.zeros(len(matrix))
+            self.scales = np.maximum(scales, 1e-12).astype(np.float32)
+            self.codes = np.rint(matrix / self.scales[:, None]).astype(np.int8)
+        if directory and matrix.size:
+            self.matrix = self._map(matrix, directory)
+
+    def _map(self, matrix: np.ndarray, directory: str) -> np.ndarray:
+        """Write the float32 vectors to a new file and map it read-only."""
+        os.makedirs(directory, exist_ok=True)
+        # Files of previous indexes; one still mapped elsewhere (Windows) is left for later
+        for stale in glob.glob(os.path.join(directory, "exact-*.f32")):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        # A fresh name per build: a live index keeps reading its own file during a swap
+        fd, self.path = tempfile.mkstemp(prefix="exact-", suffix=".f32", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            matrix.tofile(f)
+        return np.memmap(self.path, dtype=np.float32, mode="r", shape=matrix.shape)
+
+    @property
+    def nbytes(self) -> int:
+        size = self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+        if self.path is None:
+            size += self.matrix.nbytes
+        return size
+
+    def _scan(self, queries: np.ndarray, codes: np.ndarray,
+              scales: Optional[np.ndarray]) -> np.ndarray:
+        """Approximate scores of every query against the given codes (queries × rows)."""
+        count = len(codes)
+        scores = np.empty((count, len(queries)), dtype=np.float32)
+        block = np.empty((min(self.SCAN_BLOCK, count), codes.shape[1]), dtype=np.float32)
+        for start in range(0, count, self.SCAN_BLOCK):
+            end = min(start + self.SCAN_BLOCK, count)
+            part = block[:end - start]
+            np.copyto(part, codes[start:end])
+            np.matmul(part, queries.T, out=scores[start:end])
+        if scales is not None:
+            scores *= scales[:, None]
+        return scores.T
+
+    def _rescore(self, query: np.ndarray, rows: np.ndarray, k: int) -> List[SearchHit]:
+        # Sorted rows read the mapped file in order and break ties by row
+        rows = np.sort(rows)
+        scores = self.matrix[rows] @ query
+        order = np.argsort(-scores, kind="stable")[:k]
+        return self._hits(rows[order], scores[order])
+
+    def search(self, query_vector: np.ndarray, k: int,
+               mask: Optional[np.ndarray] = None) -> List[SearchHit]:
+        return self.search_batch(np.asarray(query_vector).reshape(1, -1), k, mask)[0]
+
+    def search_batch(self, query_vectors: np.ndarray, k: int,
+                     mask: Optional[np.ndarray] = None) -> List[List[SearchHit]]:
+        count = len(self)
+        if count == 0 or k <= 0:
+            return [[] for _ in query_vectors]
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.codes.shape[1])
+        codes, scales, candidates = self.codes, self.scales, None
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            if len(candidates) == 0:
+                return [[] for _ in queries]
+            codes = codes[candidates]
+            if scales is not None:
+                scales = scales[candidates]
+        count = len(codes)
+        depth = min(k * self.rescore_factor, count)
+
+        results = []
+        chunk = max(1, self.SCORE_BLOCK // count)
+        for start in range(0, len(queries), chunk):
+            batch = queries[start:start + chunk]
+            scores = self._scan(batch, codes, scales)
+            if depth < count:
+                rows = np.argpartition(-scores, depth - 1, axis=1)[:, :depth]
+            else:
+                rows = np.broadcast_to(np.arange(count), scores.shape)
+            if candidates is not None:
+                rows = candidates[rows]
+            results.extend(self._rescore(query, r, k) for query, r in zip(batch, rows))
+        return results
+
+
+VECTOR_BACKENDS = {
+    "chroma": ChromaIndex,
+    "numpy": NumpyIndex,
+    "faiss": FaissIndex,
+}
+
+VECTOR_PRECISIONS = ("float32",) + QuantizedIndex.PRECISIONS
+
+
+def build_vector_index(backend: str, collection, ids=None, vectors=None,
+                       precision: str = "float32", rescore_factor: int = 4,
+                       rescore_directory: Optional[str] = None) -> VectorIndex:
+    """
+    Create the configured vector index over a Chroma collection.
+
+    Chroma stays the persistent store; in-process backends load the stored
+    vectors once, so no document is embedded again.
+
+    Args:
+        backend: One of "chroma", "numpy" or "faiss"
+        collection: chromadb collection holding the movie documents
+        ids: Movie ids already read from the collection (in-process backends)
+        vectors: Matching stored embeddings (in-process backends)
+        precision: "float32", or "float16"/"int8" for a QuantizedIndex
+            (numpy backend only)
+        rescore_factor: Quantized candidates re-scored per result
+        rescore_directory: Where a QuantizedIndex maps its float32 vectors
+
+    Returns:
+        Vector index ready for search
+    """
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(
+            f"Unknown vector backend '{backend}' (expected one of {', '.join(VECTOR_BACKENDS)})"
+        )
+    if precision not in VECTOR_PRECISIONS:
+        raise ValueError(
+            f"Unknown vector precision '{precision}' (expected one of {', '.join(VECTOR_PRECISIONS)})"
+        )
+    if precision != "float32" and backend != "numpy":
+        raise ValueError(f"Vector precision '{precision}' needs the 'numpy' backend")
+    if precision != "float32" and not rescore_directory:
+        print(f"Warning: vector precision '{precision}' without a rescore directory "
+              "keeps the float32 vectors in memory too and saves no memory")
+    if backend == "chroma":
+        return ChromaIndex(collection, ids)
+    index_class, options = VECTOR_BACKENDS[backend], {}
+    if precision != "float32":
+        index_class = QuantizedIndex
+        options = {"precision": precision, "rescore_factor": rescore_factor,
+                   "directory": rescore_directory}
+    if ids is None:
+        return index_class.from_collection(collection, **options)
+    return index_class(ids, vectors, **options)
@@ -0,0 +1,253 @@
+"""Tests du client TMDB asynchrone contre un serveur HTTP local."""
+import asyncio
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import urlparse, parse_qs
+
+import fetch_tmdb_movies
+
+
+class FakeTMDBHandler(BaseHTTPRequestHandler):
+    """Imite les routes TMDB utilisées par le script."""
+
+    requests_seen = []
+    fail_once = set()
+    not_found = set()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        self.requests_seen.append(url.path)
+
+        if url.path in self.fail_once:
+            self.fail_once.discard(url.path)
+            self._send_json({"status_message": "rate limited"}, status=429)
+            return
+        if url.path in self.not_found:
+            self._send_json({"status_message": "not found"}, status=404)
+            return
+
+        if url.path == "/movie/popular":
+            page = int(params["page"][0])
+            results = [
+                {"id": page * 10 + i, "title": f"Film {page}-{i}", "poster_path": f"/{page}{i}.jpg"}
+                for i in range(2)
+            ]
+            self._send_json({"page": page, "results": results})
+        elif url.path.startswith("/movie/"):
+            movie_id = int(url.path.rsplit("/", 1)[1])
+            self._send_json({
+                "id": movie_id,
+                "title": f"Film {movie_id}",
+                "release_date": "2020-01-01",
+                "genres": [{"id": 1, "name": "Drame"}],
+                "overview": "Une histoire.",
+                "vote_average": 7.25,
+                "credits": {
+                    "crew": [{"job": "Director", "name": "Réalisatrice"}],
+                    "cast": [{"name": "A"}, {"name": "B"}, {"name": "C"}, {"name": "D"}]
+                }
+            })
+        elif url.path.startswith("/images/"):
+            body = b"jpeg"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json({}, status=404)
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """Base des tests utilisant le serveur TMDB local."""
+
+    def setUp(self):
+        """Démarre le serveur local."""
+        FakeTMDBHandler.requests_seen = []
+        FakeTMDBHandler.fail_once = set()
+        FakeTMDBHandler.not_found = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTMDBHandler)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+        self.image_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.image_dir, ignore_errors=True)
+        patcher = patch.object(fetch_tmdb_movies, "LOCAL_IMAGE_DIR", self.image_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fetch(self, num_pages, **kwargs):
+        return fetch_tmdb_movies.fetch_popular_movies(
+            num_pages,
+            base_url=self.base_url,
+            image_base=f"{self.base_url}/images",
+            requests_per_second=1000,
+            **kwargs
+        )
+
+
+class TestAsyncFetcher(LocalServerTestCase):
+    """Tests du téléchargement concurrent des films."""
+
+    def test_fetches_pages_and_details(self):
+        """Chaque film est récupéré avec ses crédits en une seule requête."""
+        movies = self._fetch(3)
+
+        self.assertEqual([m["id"] for m in movies], [10, 11, 20, 21, 30, 31])
+        self.assertEqual(movies[0]["director"], "Réalisatrice")
+        self.assertEqual(movies[0]["actors"], ["A", "B", "C"])
+        self.assertEqual(movies[0]["year"], "2020")
+        self.assertTrue((self.image_dir / "10.jpg").exists())
+        self.assertNotIn("/movie/10/credits", FakeTMDBHandler.requests_seen)
+
+    def test_retries_rate_limited_requests(self):
+        """Une réponse 429 est retentée."""
+        FakeTMDBHandler.fail_once = {"/movie/11"}
+
+        with patch.object(fetch_tmdb_movies, "RETRY_BACKOFF", 0.01):
+            movies = self._fetch(1)
+
+        self.assertEqual([m["id"] for m in movies], [10, 11])
+        self.assertEqual(FakeTMDBHandler.requests_seen.count("/movie/11"), 2)
+
+    def test_retry_after_forms(self):
+        """Retry-After est accepté en secondes comme en date HTTP."""
+        later = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+        self.assertEqual(fetch_tmdb_movies.parse_retry_after("2"), 2.0)
+        self.assertAlmostEqual(
+            fetch_tmdb_movies.parse_retry_after(format_datetime(later, usegmt=True)), 30, delta=2
+        )
+        self.assertEqual(fetch_tmdb_movies.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(fetch_tmdb_movies.parse_retry_after("bientôt"))
+        self.assertIsNone(fetch_tmdb_movies.parse_retry_after(None))
+
+
+class TestResumableHarvest(LocalServerTestCase):
+    """Tests de la reprise sur checkpoint et du cache HTTP."""
+    
+    def setUp(self):
+        """Prépare les répertoires de cache et de checkpoint."""
+        super().setUp()
+        self.state_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.state_dir, ignore_errors=True)
+    
+    def test_resume_skips_completed_pages(self):
+        """Les pages déjà récoltées ne sont pas retéléchargées."""
+        checkpoint = fetch_tmdb_movies.HarvestCheckpoint(self.state_dir)
+        self._fetch(1, checkpoint=checkpoint)
+        FakeTMDBHandler.requests_seen = []
+        
+        resumed = fetch_tmdb_movies.HarvestCheckpoint(self.state_dir).load()
+        movies = self._fetch(2, checkpoint=resumed)
+        
+        self.assertEqual([m["id"] for m in movies], [10, 11, 20, 21])
+        self.assertEqual(FakeTMDBHandler.requests_seen.count("/movie/popular"), 1)
+        self.assertNotIn("/movie/10", FakeTMDBHandler.requests_seen)
+    
+    def test_failed_movie_is_retried_on_resume(self):
+        """Une page dont un film a échoué n'est pas marquée terminée."""
+        FakeTMDBHandler.fail_once = {"/movie/11"}
+        checkpoint = fetch_tmdb_movies.HarvestCheckpoint(self.state_dir)
+        with patch.object(fetch_tmdb_movies, "MAX_RETRIES", 0):
+            first = self._fetch(1, checkpoint=checkpoint)
+        
+        resumed = fetch_tmdb_movies.HarvestCheckpoint(self.state_dir).load()
+        movies = self._fetch(1, checkpoint=resumed)
+        
+        self.assertEqual([m["id"] for m in first], [10])
+        self.assertEqual([m["id"] for m in movies], [10, 11])
+        self.assertEqual(list(resumed.pages), [1])
+    
+    def test_missing_movie_completes_page(self):
+        """Un film introuvable (404) n'empêche pas de terminer la page."""
+        FakeTMDBHandler.not_found = {"/movie/11"}
+        checkpoint = fetch_tmdb_movies.HarvestCheckpoint(self.state_dir)
+        
+        movies = self._fetch(1, checkpoint=checkpoint)
+        
+        self.assertEqual([m["id"] for m in movies], [10])
+        self.assertEqual(list(fetch_tmdb_movies.HarvestCheckpoint(self.state_dir).load().pages), [1])
+    
+    def test_torn_checkpoint_line_is_ignored(self):
+        """Une ligne tronquée correspond à une page à refaire."""
+        checkpoint = fetch_tmdb_movies.HarvestCheckpoint(self.state_dir)
+        checkpoint.record_page(1, [{"id": 10}])
+        with open(checkpoint.path, 'a', encoding='utf-8') as f:
+            f.write('{"page": 2, "mov')
+        
+        self.assertEqual(list(fetch_tmdb_movies.HarvestCheckpoint(self.state_dir).load().pages), [1])
+    
+    def test_cached_responses_are_revalidated(self):
+        """Un second passage ne reçoit que des réponses 304."""
+        cache = fetch_tmdb_movies.ResponseCache(self.state_dir / "http")
+        first = self._fetch(1, cache=cache)
+        
+        cache = fetch_tmdb_movies.ResponseCache(self.state_dir / "http")
+        second = self._fetch(1, cache=cache)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(cache.hits, 3)
+        self.assertEqual(cache.misses, 0)
+    
+    def test_existing_posters_are_kept(self):
+        """Les affiches déjà présentes ne sont pas retéléchargées."""
+        (self.image_dir / "10.jpg").write_bytes(b"old")
+        
+        self._fetch(1)
+        
+        self.assertEqual((self.image_dir / "10.jpg").read_bytes(), b"old")
+        self.assertNotIn("/images/10.jpg", FakeTMDBHandler.requests_seen)
+        self.assertIn("/images/11.jpg", FakeTMDBHandler.requests_seen)
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Tests du limiteur de débit."""
+
+    def test_limits_rate(self):
+        """Le débit ne dépasse pas le nombre de jetons par seconde."""
+        async def take(count):
+            bucket = fetch_tmdb_movies.TokenBucket(rate=50, capacity=1)
+            start = time.monotonic()
+            for _ in range(count):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        elapsed = asyncio.run(take(11))
+
+        self.assertGreaterEqual(elapsed, 0.18)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,74 @@
 """Tests unitaires pour le système RAG."""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import Mock, patch
+
+import chromadb
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+from src.catalog import MovieCatalog
 from src.data_processor import MovieDataProcessor
-from src.rag_system import RAGSystem
+from src.batching import QueryBatcher
+from src.cache import LRUCache
+from src.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.executor import RequestExecutor, ServerBusyError
+from src.genres import GENRE_BITS, extract_genres, genre_mask, normalize_genre, profile_genre_key
+from src.indexing import IndexingPipeline, iter_collection_pages
+from src.sessions import RowBitset, SessionStore
+from src.rag_system import RAGSystem, SimpleLLM
+from src.scoring import blend_scores, match_scores, profile_weights
+from src.diversity import mmr
+from src.profiles import ProfileEncoder, genre_centroids
+from src.lexical import LexicalIndex, reciprocal_rank_fusion, tokenize
+from src.vector_index import (
+    VECTOR_BACKENDS, NumpyIndex, QuantizedIndex, SearchHit, build_vector_index, faiss
+)
+
+
+class FakeEmbeddings(Embeddings):
+    """Embeddings déterministes pour les tests (sans modèle)."""
+    
+    def __init__(self, *args, **kwargs):
+        self.calls = 0
+    
+    def _vector(self, text):
+        # Insensible à la casse et aux espaces, comme le tokenizer de MiniLM
+        text = " ".join(text.lower().split())
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        vector = [b / 255.0 for b in digest[:16]]
+        norm = sum(v * v for v in vector) ** 0.5
+        return [v / norm for v in vector]
+    
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [self._vector(t) for t in texts]
+    
+    def embed_query(self, text):
+        self.calls += 1
+        return self._vector(text)
+
+
+def make_movie(movie_id, title, genre=("Drame",), description="Une histoire."):
+    """Construit un film minimal pour les tests."""
+    return {
+        "id": movie_id,
+        "title": title,
+        "year": 2000 + movie_id,
+        "genre": list(genre),
+        "director": f"Director {movie_id}",
+        "description": description,
+        "rating": 7.0,
+        "actors": ["Actor A", "Actor B"]
+    }
 
 
 class TestMovieDataProcessor(unittest.TestCase):
@@ -48,6 +114,27 @@ class TestMovieDataProcessor(unittest.TestCase):
         self.assertGreater(len(documents), 0)
         self.assertIn("content", documents[0])
         self.assertIn("metadata", documents[0])
+    
+    def test_iter_movies_streams_jsonl(self):
+        """Test de la lecture en flux d'un catalogue JSONL."""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        path = os.path.join(tmp_dir, "movies.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(make_movie(1, "Alpha")) + "\n")
+            f.write("{pas du json\n")
+            f.write(json.dumps({"id": 2}) + "\n")
+            f.write("\n")
+            f.write(json.dumps({"id": "3", "title": "Gamma"}) + "\n")
+        
+        movies = self.processor.iter_movies(path)
+        
+        self.assertNotIsInstance(movies, list)
+        movies = list(movies)
+        self.assertEqual([m["title"] for m in movies], ["Alpha", "Gamma"])
+        self.assertEqual(movies[1]["id"], 3)
+        self.assertEqual(movies[1]["genre"], [])
+        self.assertEqual(self.processor.skipped_movies, 2)
 
 
 class TestRAGSystem(unittest.TestCase):
@@ -66,5 +153,1378 @@ class TestRAGSystem(unittest.TestCase):
         self.assertIsNotNone(self.rag_system.memory)
 
 
+
+class RAGSystemTestCase(unittest.TestCase):
+    """Base des tests du RAGSystem sur une base Chroma temporaire."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test."""
+        self.persist_dir = tempfile.mkdtemp()
+        self.movies = [make_movie(1, "Alpha"), make_movie(2, "Beta"), make_movie(3, "Gamma")]
+        patchers = [
+            patch('src.rag_system.HuggingFaceEmbeddings', FakeEmbeddings),
+            patch.object(settings, 'chroma_persist_directory', self.persist_dir),
+            patch.object(settings, 'embedding_cache_enabled', False),
+            patch.object(MovieDataProcessor, 'load_sample_movies',
+                         lambda processor: self._load_movies(processor)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.persist_dir, ignore_errors=True)
+        self.rag_system = RAGSystem()
+    
+    def _load_movies(self, processor):
+        processor.movies_data = [dict(movie) for movie in self.movies]
+        return processor.movies_data
+
+
+class TestIncrementalIndexing(RAGSystemTestCase):
+    """Tests de l'indexation incrémentale."""
+    
+    def test_initial_build(self):
+        """Le premier passage ajoute tous les films."""
+        report = self.rag_system.initialize_vectorstore()
+        
+        self.assertEqual(report, {"added": 3, "updated": 0, "removed": 0, "unchanged": 0})
+        self.assertEqual(len(self.rag_system.vectorstore.get()["ids"]), 3)
+    
+    def test_rerun_only_embeds_changes(self):
+        """Un second passage n'embarque que les films modifiés."""
+        self.rag_system.initialize_vectorstore()
+        self.movies[1]["description"] = "Nouvelle description."
+        self.movies.pop(2)
+        self.movies.append(make_movie(4, "Delta"))
+        calls_before = self.rag_system.embeddings.calls
+        
+        report = self.rag_system.initialize_vectorstore()
+        
+        self.assertEqual(report, {"added": 1, "updated": 1, "removed": 1, "unchanged": 1})
+        self.assertEqual(self.rag_system.embeddings.calls - calls_before, 2)
+        self.assertEqual(sorted(self.rag_system.vectorstore.get()["ids"]), ["1", "2", "4"])
+    
+    def test_metadata_change_is_stored(self):
+        """Un changement d'affiche seul est détecté et écrit dans Chroma."""
+        self.rag_system.initialize_vectorstore()
+        self.movies[0]["image_url"] = "https://image.tmdb.org/t/p/w500/alpha.jpg"
+        
+        with patch.object(settings, 'indexing_read_page_size', 2):
+            report = self.rag_system.initialize_vectorstore()
+        
+        self.assertEqual(report, {"added": 0, "updated": 1, "removed": 0, "unchanged": 2})
+        self.assertEqual(self.rag_system.get_movie(1)["metadata"]["image_url"],
+                         "https://image.tmdb.org/t/p/w500/alpha.jpg")
+    
+    def test_full_rebuild(self):
+        """Le mode complet ré-embarque tout sans dupliquer."""
+        self.rag_system.initialize_vectorstore()
+        
+        report = self.rag_system.initialize_vectorstore(incremental=False)
+        
+        self.assertEqual(report["updated"], 3)
+        self.assertEqual(len(self.rag_system.vectorstore.get()["ids"]), 3)
+    
+    def test_index_loaded_in_pages(self):
+        """L'index et le catalogue sont chargés depuis Chroma par pages."""
+        with patch.object(settings, 'indexing_read_page_size', 2):
+            self.rag_system.initialize_vectorstore()
+        
+        self.assertEqual(sorted(self.rag_system.catalog.ids.tolist()), [1, 2, 3])
+        self.assertEqual(self.rag_system.index.matrix.shape[0], 3)
+        self.assertEqual(self.rag_system.get_movie(2)["metadata"]["title"], "Beta")
+    
+    def test_search_uses_refreshed_index(self):
+        """La recherche interroge l'index reconstruit après indexation."""
+        self.rag_system.initialize_vectorstore()
+        processor = MovieDataProcessor()
+        query = processor.get_movie_text(self.movies[1])
+        
+        results = self.rag_system.search_similar_movies(query, k=1)
+        
+        self.assertEqual(results[0]["metadata"]["title"], "Beta")
+    
+    def test_request_keeps_its_index_state(self):
+        """Une requête en cours sur l'ancien index garde son catalogue et ses exclusions."""
+        self.rag_system.initialize_vectorstore()
+        old_state = self.rag_system.state
+        session = self.rag_system.sessions.get("s")
+        session.exclusions(old_state.catalog).add(old_state.catalog.row_of(1))
+        self.movies = [make_movie(4, "Delta"), make_movie(1, "Alpha")]
+        
+        self.rag_system.initialize_vectorstore()
+        new_state = self.rag_system.state
+        old_hits = self.rag_system._search(old_state, "un drame", k=3,
+                                           exclude=session.exclusions(old_state.catalog))
+        new_hits = self.rag_system._search(new_state, "un drame", k=3,
+                                           exclude=session.exclusions(new_state.catalog))
+        
+        self.assertEqual(new_state.generation, old_state.generation + 1)
+        self.assertEqual(sorted(hit.metadata["id"] for hit in old_hits), [2, 3])
+        self.assertEqual([hit.metadata["id"] for hit in new_hits], [4])
+
+
+class TestRetrieval(RAGSystemTestCase):
+    """Tests des filtres et de la profondeur de recherche."""
+    
+    def test_genre_filter_uses_canonical_genres(self):
+        """Le filtre par genre reconnaît les noms anglais et français."""
+        self.movies = [
+            make_movie(1, "Alpha", genre=("Science Fiction",)),
+            make_movie(2, "Beta", genre=("Drame",)),
+            make_movie(3, "Gamma", genre=("Sci-Fi", "Drama")),
+        ]
+        self.rag_system.initialize_vectorstore()
+        
+        results = self.rag_system.search_similar_movies("un film de science-fiction", k=3)
+        
+        self.assertEqual(sorted(r["metadata"]["title"] for r in results), ["Alpha", "Gamma"])
+    
+    def test_rare_genre_fills_k(self):
+        """Un genre rare et les films déjà recommandés ne réduisent pas le nombre de résultats."""
+        self.movies = [make_movie(i, f"Film {i}") for i in range(1, 40)]
+        self.movies += [make_movie(100 + i, f"Western {i}", genre=("Western",)) for i in range(3)]
+        self.rag_system.initialize_vectorstore()
+        
+        first = self.rag_system.search_similar_movies("un western", k=2)
+        second = self.rag_system.search_similar_movies("un western", k=2)
+        
+        titles = [r["metadata"]["title"] for r in first + second]
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(sorted(titles), ["Western 0", "Western 1", "Western 2"])
+    
+    def test_structured_filters(self):
+        """Les filtres d'année et de note sont appliqués."""
+        self.rag_system.initialize_vectorstore()
+        
+        results = self.rag_system.search_similar_movies("film", k=5, min_year=2002)
+        
+        self.assertEqual(sorted(r["metadata"]["title"] for r in results), ["Beta", "Gamma"])
+        self.assertEqual(self.rag_system.search_similar_movies("film", k=5, min_rating=9), [])
+    
+    def test_adaptive_retrieval_rounds(self):
+        """La recherche part d'environ k candidats et ne grandit que si nécessaire."""
+        self.movies = [make_movie(i, f"Film {i}") for i in range(1, 40)]
+        self.rag_system.initialize_vectorstore()
+        
+        with patch.object(settings, 'retrieval_initial_factor', 1), \
+                patch.object(settings, 'retrieval_growth_factor', 4):
+            first = self.rag_system.search_similar_movies("un drame", k=2, session_id="s")
+            second = self.rag_system.search_similar_movies("un drame", k=2, session_id="s")
+        
+        stats = self.rag_system.cache_stats()["retrieval"]
+        self.assertEqual(stats["rounds"], {1: 2})
+        self.assertEqual(stats["mean_candidates"], (2 + 8) / 2)
+        self.assertFalse({r["metadata"]["id"] for r in first} & {r["metadata"]["id"] for r in second})
+    
+    def test_long_session_gets_full_pages(self):
+        """Au-delà du plafond, les exclusions sont appliquées dans l'index."""
+        self.movies = [make_movie(i, f"Film {i}") for i in range(1, 40)]
+        self.rag_system.initialize_vectorstore()
+        
+        seen = set()
+        with patch.object(settings, 'retrieval_max_candidates', 8):
+            for _ in range(9):
+                results = self.rag_system.search_similar_movies("un drame", k=4, session_id="s")
+                ids = {r["metadata"]["id"] for r in results}
+                self.assertFalse(ids & seen)
+                seen |= ids
+        
+        self.assertEqual(len(seen), 36)
+        self.assertGreater(self.rag_system.cache_stats()["retrieval"]["fallbacks"], 0)
+
+
+class TestResultCaching(RAGSystemTestCase):
+    """Tests des caches de requêtes et de résultats."""
+    
+    def test_repeated_query_skips_model(self):
+        """Une requête répétée est servie par le cache de requêtes."""
+        self.rag_system.initialize_vectorstore()
+        self.rag_system.search_similar_movies("Un grand drame", k=1)
+        calls_before = self.rag_system.embeddings.calls
+        
+        self.rag_system.search_similar_movies("  un GRAND  drame ", k=1)
+        
+        self.assertEqual(self.rag_system.embeddings.calls, calls_before)
+        stats = self.rag_system.cache_stats()["query_embeddings"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+    
+    def test_result_cache_applies_exclusions(self):
+        """Le classement mis en cache exclut les films déjà recommandés."""
+        self.rag_system.initialize_vectorstore()
+        first = self.rag_system.search_similar_movies("un drame", k=2)
+        self.rag_system.reset_conversation()
+        
+        again = self.rag_system.search_similar_movies("un drame", k=2)
+        third = self.rag_system.search_similar_movies("un drame", k=2)
+        
+        self.assertEqual(again, first)
+        self.assertEqual(len(third), 1)
+        self.assertNotIn(third[0]["metadata"]["id"], [r["metadata"]["id"] for r in first])
+        self.assertEqual(self.rag_system.result_cache.stats()["hits"], 2)
+    
+    def test_cached_results_hold_no_documents(self):
+        """Le cache ne garde que (id, score, ligne) ; chaque requête reçoit ses propres hits."""
+        self.rag_system.initialize_vectorstore()
+        
+        state = self.rag_system.state
+        first = self.rag_system._search(state, "un film triste", k=2, exclude=None)
+        second = self.rag_system._search(state, "un film triste", k=2, exclude=None)
+        
+        (ranked, _), _, _ = next(iter(self.rag_system.result_cache._entries.values()))
+        self.assertTrue(all(isinstance(entry, tuple) and len(entry) == 3 for entry in ranked))
+        self.assertEqual([h.id for h in first], [h.id for h in second])
+        self.assertFalse({id(h) for h in first} & {id(h) for h in second})
+        self.assertIsNotNone(first[0].page_content)
+    
+    def test_reindex_invalidates_results(self):
+        """Une réindexation change la génération et invalide les résultats."""
+        self.rag_system.initialize_vectorstore()
+        self.rag_system.search_similar_movies("un drame", k=1)
+        generation = self.rag_system.index_generation
+        self.movies = [make_movie(9, "Omega")]
+        self.rag_system.reset_conversation()
+        
+        self.rag_system.initialize_vectorstore()
+        results = self.rag_system.search_similar_movies("un drame", k=1)
+        
+        self.assertEqual(self.rag_system.index_generation, generation + 1)
+        self.assertEqual(results[0]["metadata"]["title"], "Omega")
+
+
+class TestSessions(RAGSystemTestCase):
+    """Tests des sessions de recommandation."""
+    
+    def test_sessions_are_isolated(self):
+        """Les films recommandés sont propres à chaque session."""
+        self.rag_system.initialize_vectorstore()
+        
+        alice = self.rag_system.search_similar_movies("un drame", k=2, session_id="alice")
+        bob = self.rag_system.search_similar_movies("un drame", k=2, session_id="bob")
+        self.rag_system.reset_conversation(session_id="bob")
+        alice_next = self.rag_system.search_similar_movies("un drame", k=2, session_id="alice")
+        
+        self.assertEqual(alice, bob)
+        self.assertEqual(len(alice_next), 1)
+        self.assertNotIn("bob", self.rag_system.sessions)
+    
+    def test_search_sessions_count_toward_memory_cap(self):
+        """Les sessions de recherche et de suggestions comptent dans le plafond mémoire."""
+        self.movies = [make_movie(i, f"Film {i}") for i in range(1, 41)]
+        self.rag_system.initialize_vectorstore()
+        sessions = self.rag_system.sessions
+        sessions.max_bytes = 12
+        
+        self.rag_system.get_profile_suggestions({"genres": {"drame": 5}}, k=1, session_id="p")
+        self.assertEqual(sessions.stats()["bytes"], 5)
+        for i in range(4):
+            self.rag_system.search_similar_movies("un drame", k=1, session_id=f"s{i}")
+        
+        self.assertLessEqual(sessions.stats()["bytes"], 12)
+        self.assertGreater(sessions.stats()["evictions"], 0)
+        self.assertNotIn("p", sessions)
+        self.assertNotIn("s0", sessions)
+        self.assertIn("s3", sessions)
+    
+    def test_exclusions_survive_reindex(self):
+        """Les exclusions suivent les films quand les lignes du catalogue changent."""
+        self.rag_system.initialize_vectorstore()
+        first = self.rag_system.search_similar_movies("un drame", k=2, session_id="s")
+        self.movies.insert(0, make_movie(4, "Delta"))
+        
+        self.rag_system.initialize_vectorstore()
+        rest = self.rag_system.search_similar_movies("un drame", k=4, session_id="s")
+        
+        seen = {r["metadata"]["id"] for r in first}
+        self.assertEqual(len(rest), 2)
+        self.assertFalse(seen & {r["metadata"]["id"] for r in rest})
+    
+    def test_concurrent_responses_are_independent(self):
+        """Des réponses concurrentes ne mélangent pas leurs documents."""
+        self.movies = [make_movie(i, f"Film {i}") for i in range(1, 30)]
+        self.rag_system.initialize_vectorstore()
+        processor = MovieDataProcessor()
+        queries = {m["title"]: processor.get_movie_text(m) for m in self.movies[:8]}
+        answers = {}
+        
+        def ask(title):
+            answers[title] = self.rag_system.get_response(queries[title], session_id=title)
+        
+        threads = [threading.Thread(target=ask, args=(title,)) for title in queries]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        for title, response in answers.items():
+            self.assertEqual(response["source_documents"][0]["metadata"]["title"], title)
+            self.assertIn(f"**{title}**", response["answer"])
+
+
+class TestBatchEndpoints(RAGSystemTestCase):
+    """Tests des recherches et suggestions par lots."""
+    
+    def test_batch_search(self):
+        """La recherche groupée encode chaque requête distincte une fois, sans session."""
+        self.movies.append(make_movie(4, "Delta", genre=("Western",)))
+        self.rag_system.initialize_vectorstore()
+        processor = MovieDataProcessor()
+        queries = [processor.get_movie_text(self.movies[1]), "un western",
+                   processor.get_movie_text(self.movies[1])]
+        calls_before = self.rag_system.embeddings.calls
+        
+        results = self.rag_system.search_similar_movies_batch(queries, k=2)
+        
+        self.assertEqual(self.rag_system.embeddings.calls - calls_before, 2)
+        self.assertEqual(results[0][0]["metadata"]["title"], "Beta")
+        self.assertEqual([r["metadata"]["title"] for r in results[1]], ["Delta"])
+        self.assertEqual(results[2], results[0])
+        self.assertEqual(self.rag_system.sessions.stats()["sessions"], 0)
+    
+    def test_batch_suggestions_match_single(self):
+        """Les suggestions groupées correspondent aux suggestions individuelles."""
+        self.rag_system.initialize_vectorstore()
+        profiles = [
+            {"genres": {"drame": 5}, "mood": ["émouvant"]},
+            {"genres": {"action": 4}, "description": "Des courses poursuites"},
+        ]
+        
+        batched = self.rag_system.get_profile_suggestions_batch(profiles, k=2)
+        
+        for i, profile in enumerate(profiles):
+            single = self.rag_system.get_profile_suggestions(profile, k=2, session_id=str(i))
+            self.assertEqual(batched[i], single)
+        self.assertEqual(len(batched[0]), 2)
+        self.assertEqual(batched[1], [])
+
+
+class TestProfileSuggestions(RAGSystemTestCase):
+    """Tests des suggestions de profil."""
+    
+    def test_known_profile_needs_no_encoder_call(self):
+        """Un profil déjà vu ne repasse pas par le modèle d'embeddings."""
+        self.rag_system.initialize_vectorstore()
+        genres_only = {"genres": {"drame": 5, "animation": 0}}
+        full = {"genres": {"drame": 5}, "mood": ["Émouvant"], "description": "Des histoires vraies"}
+        calls_before = self.rag_system.embeddings.calls
+        
+        self.rag_system.get_profile_suggestions(genres_only, k=2, session_id="a")
+        self.assertEqual(self.rag_system.embeddings.calls, calls_before)
+        
+        first = self.rag_system.get_profile_suggestions(full, k=2, session_id="b")
+        calls_after_first = self.rag_system.embeddings.calls
+        again = self.rag_system.get_profile_suggestions(dict(full, realisateurs="X"), k=2,
+                                                         session_id="c")
+        
+        self.assertEqual(calls_after_first - calls_before, 2)
+        self.assertEqual(self.rag_system.embeddings.calls, calls_after_first)
+        self.assertEqual(again, first)
+        self.assertEqual(self.rag_system.cache_stats()["profiles"]["hits"], 1)
+    
+    def test_profile_rerank(self):
+        """Le score de correspondance peut réordonner les suggestions."""
+        self.movies = [make_movie(i, f"Drame {i}") for i in range(1, 8)]
+        self.movies.append(make_movie(8, "Policier", genre=("Drame", "Crime")))
+        self.rag_system.initialize_vectorstore()
+        profile = {"genres": {"drame": 2, "crime": 3}}
+        # Vecteur de profil fixé sur « Drame 1 » pour isoler le réordonnancement
+        vector = np.asarray([FakeEmbeddings()._vector(
+            MovieDataProcessor().get_movie_text(self.movies[0]))], dtype=np.float32)
+        
+        with patch.object(self.rag_system.profile_encoder, 'encode_many', return_value=vector):
+            plain = self.rag_system.get_profile_suggestions_batch([profile], k=2)[0]
+            with patch.object(settings, 'match_rerank_weight', 1.0):
+                reranked = self.rag_system.get_profile_suggestions_batch([profile], k=2)[0]
+        
+        self.assertEqual(plain[0]["title"], "Drame 1")
+        self.assertNotIn("Policier", [m["title"] for m in plain])
+        self.assertEqual(reranked[0]["title"], "Policier")
+        self.assertEqual(reranked[0]["match_score"], 100.0)
+        self.assertEqual(reranked[1]["match_score"], 40.0)
+
+
+class TestStreaming(RAGSystemTestCase):
+    """Tests des réponses diffusées en SSE."""
+    
+    def test_stream_response(self):
+        """La réponse en flux envoie chaque film dès qu'il est rédigé."""
+        self.rag_system.initialize_vectorstore()
+        
+        events = list(self.rag_system.stream_response("un drame", session_id="flux"))
+        expected = self.rag_system.get_response("un drame", session_id="bloc")
+        
+        names = [event["event"] for event in events]
+        self.assertEqual(names, ["text", "source"] * 3 + ["done"])
+        self.assertTrue(events[0]["data"]["text"].startswith("Voici mes recommandations"))
+        self.assertEqual(events[-1]["data"]["answer"], expected["answer"])
+        self.assertEqual([e["data"] for e in events if e["event"] == "source"],
+                         expected["source_documents"])
+        session = self.rag_system.sessions.get("flux")
+        self.assertEqual(len(session.excluded), 3)
+        self.assertEqual(session.history[-1]["answer"], expected["answer"])
+    
+    def test_chat_sources_are_slim(self):
+        """Les sources du chat ne portent que les champs affichés par le client."""
+        self.rag_system.initialize_vectorstore()
+        
+        response = self.rag_system.get_response("un drame")
+        
+        self.assertEqual(len(response["source_documents"]), 3)
+        for source in response["source_documents"]:
+            self.assertEqual(list(source), ["metadata"])
+            self.assertEqual(set(source["metadata"]), {"id", "title", "year"})
+        self.assertIn("Réalisé par Director", response["answer"])
+    
+    def test_stream_without_results(self):
+        """Sans film trouvé, le flux contient le message d'excuse."""
+        self.rag_system.initialize_vectorstore()
+        self.rag_system.get_response("un drame", session_id="s")
+        
+        events = list(self.rag_system.stream_response("un drame", session_id="s"))
+        
+        self.assertEqual([event["event"] for event in events], ["text", "done"])
+        self.assertTrue(events[-1]["data"]["answer"].startswith("Désolé"))
+
+
+class TestLexicalFastPath(RAGSystemTestCase):
+    """Tests de la recherche par nom sans encodeur."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test, en mode hybride."""
+        super().setUp()
+        patcher = patch.object(settings, 'search_mode', 'hybrid')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_name_lookup_skips_encoder(self):
+        """Une requête nommant assez de films est servie sans l'encodeur."""
+        self.movies[2]["director"] = "Christopher Nolan"
+        self.rag_system.initialize_vectorstore()
+        calls_before = self.rag_system.embeddings.calls
+        
+        results = self.rag_system.search_similar_movies("Films de Christopher Nolan", k=1)
+        
+        self.assertEqual([r["metadata"]["title"] for r in results], ["Gamma"])
+        self.assertEqual(self.rag_system.embeddings.calls, calls_before)
+        self.assertEqual(self.rag_system.cache_stats()["retrieval"]["lexical_answers"], 1)
+        
+        vector = self.rag_system.search_similar_movies("Films de Christopher Nolan", k=3,
+                                                       session_id="s", mode="vector")
+        self.assertEqual(len(vector), 3)
+        self.assertEqual(self.rag_system.embeddings.calls, calls_before + 1)
+        with self.assertRaises(ValueError):
+            self.rag_system.search_similar_movies("Nolan", mode="inconnu")
+    
+    def test_named_movies_come_first_and_fill_k(self):
+        """Un titre nommé passe en tête, complété par des films proches jusqu'à k."""
+        self.movies = [make_movie(i, f"Drame {i}") for i in range(1, 8)]
+        self.movies.append(make_movie(8, "Interstellar"))
+        self.rag_system.initialize_vectorstore()
+        
+        for query in ("Interstellar", "je veux voir Interstellar"):
+            with self.subTest(query=query):
+                results = self.rag_system.search_similar_movies(query, k=5, session_id=query)
+                
+                self.assertEqual(len(results), 5)
+                self.assertEqual(results[0]["metadata"]["title"], "Interstellar")
+                self.assertEqual(len({r["metadata"]["id"] for r in results}), 5)
+        self.assertEqual(self.rag_system.cache_stats()["retrieval"]["lexical_answers"], 0)
+
+
+class TestDiverseRecommendations(RAGSystemTestCase):
+    """Tests de la diversification MMR."""
+    
+    def test_diverse_suggestions(self):
+        """Le re-classement MMR écarte un quasi-doublon, avec les vecteurs de l'index."""
+        self.movies = [make_movie(i, f"Drame {i}") for i in range(1, 9)]
+        self.rag_system.initialize_vectorstore()
+        profile = {"genres": {"drame": 1}}
+        vector = np.asarray([FakeEmbeddings()._vector(
+            MovieDataProcessor().get_movie_text(self.movies[0]))], dtype=np.float32)
+        index = self.rag_system.index
+        
+        with patch.object(self.rag_system.profile_encoder, 'encode_many', return_value=vector):
+            plain = self.rag_system.get_profile_suggestions_batch([profile], k=2)[0]
+            first, second = (self.rag_system.catalog.row_of(m["id"]) for m in plain)
+            
+            def vectors(rows):
+                # Le deuxième film devient un doublon exact du premier
+                matrix = NumpyIndex.vectors(index, rows)
+                matrix[rows == second] = index.matrix[first]
+                return matrix
+            
+            calls_before = self.rag_system.embeddings.calls
+            with patch.object(index, 'vectors', side_effect=vectors) as spy:
+                diverse = self.rag_system.get_profile_suggestions_batch(
+                    [profile], k=2, mmr_lambda=0.5)[0]
+        
+        self.assertEqual(len(spy.call_args[0][0]), 8)
+        self.assertEqual(self.rag_system.embeddings.calls, calls_before)
+        self.assertEqual(diverse[0]["id"], plain[0]["id"])
+        self.assertNotEqual(diverse[1]["id"], plain[1]["id"])
+    
+    def test_diverse_chat_keeps_top_k(self):
+        """Avec le re-classement MMR, la réponse garde top_k films et les exclut ensuite."""
+        self.movies = [make_movie(i, f"Drame {i}") for i in range(1, 13)]
+        self.rag_system.initialize_vectorstore()
+        
+        first = self.rag_system.get_response("une histoire", session_id="mmr", mmr_lambda=0.3)
+        second = self.rag_system.get_response("une histoire", session_id="mmr", mmr_lambda=0.3)
+        
+        ids = [d["metadata"]["id"] for d in first["source_documents"]]
+        self.assertEqual(len(ids), settings.top_k_results)
+        self.assertFalse(set(ids) & {d["metadata"]["id"] for d in second["source_documents"]})
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Tests du cache d'embeddings persistant."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+    
+    def test_vectors_survive_reopen(self):
+        """Les vecteurs sont relus depuis le disque."""
+        cache = EmbeddingCache(self.cache_dir)
+        key = EmbeddingCache.make_key("model", True, "texte")
+        cache.put_many([key], [[0.5, 0.25, 0.125]])
+        
+        reopened = EmbeddingCache(self.cache_dir)
+        vector = reopened.get_many([key])[0]
+        
+        self.assertEqual(vector.tolist(), [0.5, 0.25, 0.125])
+    
+    def test_least_recently_used_is_evicted(self):
+        """Le cache plein évince l'entrée la moins récemment utilisée."""
+        cache = EmbeddingCache(self.cache_dir, max_entries=2)
+        cache.put_many(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+        cache.get_many(["a"])
+        cache.put_many(["c"], [[1.0, 1.0]])
+        
+        reopened = EmbeddingCache(self.cache_dir, max_entries=2)
+        
+        self.assertIsNone(reopened.get_many(["b"])[0])
+        self.assertEqual(reopened.get_many(["a"])[0].tolist(), [1.0, 0.0])
+        self.assertEqual(reopened.get_many(["c"])[0].tolist(), [1.0, 1.0])
+    
+    def test_interrupted_slot_reuse(self):
+        """Un emplacement réécrit sans ligne de journal ne sert plus son ancienne clé."""
+        cache = EmbeddingCache(self.cache_dir, max_entries=2)
+        cache.put_many(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+        # Arrêt pendant la réutilisation de l'emplacement de "b" : vecteur écrit, journal non
+        slot = cache._entries["b"]
+        cache._fingerprints[slot] = 0
+        cache._vectors[slot] = [9.0, 9.0]
+        cache._fingerprints.flush()
+        cache._vectors.flush()
+        
+        reopened = EmbeddingCache(self.cache_dir, max_entries=2)
+        
+        self.assertIsNone(reopened.get_many(["b"])[0])
+        self.assertEqual(reopened.get_many(["a"])[0].tolist(), [1.0, 0.0])
+        reopened.put_many(["c"], [[1.0, 1.0]])
+        self.assertEqual(reopened.get_many(["a", "c"])[1].tolist(), [1.0, 1.0])
+    
+    def test_shared_directory(self):
+        """Deux processus sur le même répertoire ne lisent jamais le vecteur d'une autre clé."""
+        first = EmbeddingCache(self.cache_dir, max_entries=2)
+        second = EmbeddingCache(self.cache_dir, max_entries=2)
+        first.put_many(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+        
+        second.put_many(["c"], [[1.0, 1.0]])
+        
+        self.assertEqual(len(second), 2)
+        self.assertIsNone(first.get_many(["a"])[0])
+        self.assertEqual(first.get_many(["b"])[0].tolist(), [0.0, 1.0])
+        self.assertEqual(second.get_many(["c"])[0].tolist(), [1.0, 1.0])
+    
+    def test_cached_embeddings_skip_model(self):
+        """Les textes déjà vus ne repassent pas par le modèle."""
+        model = FakeEmbeddings()
+        embeddings = CachedEmbeddings(model, EmbeddingCache(self.cache_dir), model_name="fake")
+        first = embeddings.embed_documents(["un", "deux"])
+        
+        second = embeddings.embed_documents(["deux", "trois"])
+        query = embeddings.embed_query("un")
+        
+        self.assertEqual(model.calls, 3)
+        self.assertAlmostEqual(second[0][0], first[1][0], places=6)
+        self.assertAlmostEqual(query[0], first[0][0], places=6)
+
+
+
+class TestLRUCache(unittest.TestCase):
+    """Tests du cache LRU en mémoire."""
+    
+    def test_evicts_least_recently_used(self):
+        """Le plus ancien accès est évincé en premier."""
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+        self.assertEqual(cache.stats()["evictions"], 1)
+    
+    def test_byte_limit(self):
+        """La taille totale des valeurs reste sous la limite."""
+        cache = LRUCache(max_entries=10, max_bytes=100, sizeof=len)
+        cache.put("a", b"x" * 60)
+        cache.put("b", b"x" * 60)
+        cache.put("c", b"x" * 200)
+        
+        self.assertEqual(len(cache), 1)
+        self.assertIn("b", cache)
+        self.assertEqual(cache.bytes, 60)
+    
+    def test_ttl(self):
+        """Une entrée expirée n'est plus servie."""
+        cache = LRUCache(ttl=10)
+        with patch("src.cache.time.monotonic", return_value=100.0):
+            cache.put("a", 1)
+        with patch("src.cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+        
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+class TestRequestExecutor(unittest.TestCase):
+    """Tests du pool de workers borné."""
+    
+    def test_bounded_queue(self):
+        """Au-delà des workers et de la file, les appels sont refusés sans bloquer."""
+        executor = RequestExecutor(max_workers=2, max_queue=1)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+        
+        async def scenario():
+            calls = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            with self.assertRaises(ServerBusyError):
+                await executor.run(release.wait)
+            stats = executor.stats()
+            release.set()
+            await asyncio.gather(*calls)
+            return stats
+        
+        stats = asyncio.run(scenario())
+        
+        self.assertEqual((stats["running"], stats["queued"], stats["rejected"]), (2, 1, 1))
+        self.assertEqual(executor.stats()["completed"], 3)
+    
+    def test_event_loop_stays_responsive(self):
+        """Le travail bloquant ne retarde pas les autres coroutines."""
+        executor = RequestExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        
+        async def scenario():
+            work = asyncio.ensure_future(executor.run(time.sleep, 0.3))
+            start = time.monotonic()
+            await asyncio.sleep(0.01)
+            latency = time.monotonic() - start
+            await work
+            return latency
+        
+        self.assertLess(asyncio.run(scenario()), 0.2)
+
+
+class TestQueryBatcher(unittest.TestCase):
+    """Tests du regroupement des requêtes concurrentes."""
+    
+    def _run_concurrently(self, batcher, texts):
+        results = {}
+        
+        def embed(text):
+            results[text] = batcher.embed(text)
+        
+        threads = [threading.Thread(target=embed, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def test_concurrent_queries_share_batches(self):
+        """Les requêtes simultanées sont encodées en peu d'appels."""
+        batch_sizes = []
+        
+        def embed_many(texts):
+            batch_sizes.append(len(texts))
+            time.sleep(0.02)
+            return [f"vecteur {text}" for text in texts]
+        
+        batcher = QueryBatcher(embed_many, max_batch_size=8, max_wait=0.05)
+        self.addCleanup(batcher.close)
+        texts = [f"requête {i}" for i in range(16)]
+        
+        results = self._run_concurrently(batcher, texts)
+        
+        self.assertEqual(results, {text: f"vecteur {text}" for text in texts})
+        self.assertLess(len(batch_sizes), 16)
+        self.assertLessEqual(max(batch_sizes), 8)
+        stats = batcher.stats()
+        self.assertEqual(stats["queries"], 16)
+        self.assertEqual(stats["batches"], len(batch_sizes))
+        self.assertEqual(stats["window_ms"], 50)
+    
+    def test_duplicate_queries_encoded_once(self):
+        """Une même requête dans un lot n'est encodée qu'une fois."""
+        encoded = []
+        
+        def embed_many(texts):
+            # Le premier appel attend que les autres requêtes soient en file
+            deadline = time.perf_counter() + 2
+            while not encoded and batcher._queue.qsize() < 4 - len(texts) \
+                    and time.perf_counter() < deadline:
+                time.sleep(0.001)
+            encoded.extend(texts)
+            return [len(text) for text in texts]
+        
+        batcher = QueryBatcher(embed_many, max_batch_size=4, max_wait=0.2)
+        self.addCleanup(batcher.close)
+        
+        results = self._run_concurrently(batcher, ["drame"] * 4)
+        
+        self.assertEqual(results, {"drame": 5})
+        self.assertLessEqual(len(encoded), 2)
+        self.assertEqual(batcher.stats()["queries"], 4)
+    
+    def test_single_query_skips_window(self):
+        """Une requête seule est encodée sans attendre la fenêtre."""
+        batcher = QueryBatcher(lambda texts: [len(t) for t in texts], max_wait=1.0)
+        self.addCleanup(batcher.close)
+        
+        start = time.perf_counter()
+        for _ in range(3):
+            batcher.embed("drame")
+        
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertLess(batcher.stats()["mean_wait_ms"], 100)
+    
+    def test_errors_reach_callers(self):
+        """Une erreur de l'encodeur est renvoyée à l'appelant."""
+        def embed_many(texts):
+            raise ValueError("modèle indisponible")
+        
+        batcher = QueryBatcher(embed_many, max_wait=0)
+        self.addCleanup(batcher.close)
+        
+        with self.assertRaises(ValueError):
+            batcher.embed("drame")
+
+
+class TestSessionStore(unittest.TestCase):
+    """Tests du stockage des sessions."""
+    
+    def test_row_bitset(self):
+        """Le bitset stocke un bit par ligne."""
+        bitset = RowBitset(20)
+        bitset.update([3, 17, 3, 25])
+        
+        self.assertEqual(len(bitset), 2)
+        self.assertIn(17, bitset)
+        self.assertNotIn(4, bitset)
+        self.assertEqual(bitset.rows().tolist(), [3, 17])
+        self.assertEqual(bitset.nbytes, 3)
+    
+    def test_least_recently_used_is_evicted(self):
+        """Au-delà du nombre maximal, la session la moins récente est évincée."""
+        store = SessionStore(max_sessions=2)
+        store.get("a")
+        store.get("b")
+        store.get("a")
+        store.get("c")
+        
+        self.assertEqual(sorted(store._sessions), ["a", "c"])
+        self.assertEqual(store.stats()["evictions"], 1)
+    
+    def test_idle_sessions_expire(self):
+        """Une session inactive est supprimée."""
+        store = SessionStore(idle_timeout=60)
+        with patch("src.sessions.time.monotonic", return_value=0.0):
+            store.get("a")
+        with patch("src.sessions.time.monotonic", return_value=100.0):
+            store.get("b")
+        
+        self.assertNotIn("a", store)
+        self.assertEqual(store.stats()["expirations"], 1)
+    
+    def test_memory_cap(self):
+        """La mémoire totale des sessions reste sous le plafond."""
+        store = SessionStore(max_bytes=100, history_size=3)
+        for session_id in ("a", "b"):
+            store.get(session_id).add_exchange("question", "x" * 60)
+            store.touch(session_id)
+        
+        self.assertEqual(len(store), 1)
+        self.assertIn("b", store)
+        self.assertLessEqual(store.stats()["bytes"], 100)
+    
+    def test_history_is_bounded(self):
+        """L'historique ne garde que les derniers échanges."""
+        store = SessionStore(history_size=2)
+        state = store.get("a")
+        for i in range(5):
+            state.add_exchange(f"q{i}", "r")
+        
+        self.assertEqual([item["question"] for item in state.history], ["q3", "q4"])
+
+
+class TestMovieCatalog(unittest.TestCase):
+    """Tests du catalogue colonnaire."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test."""
+        processor = MovieDataProcessor()
+        processor.load_sample_movies()
+        self.documents = processor.format_movies_for_rag()
+        self.catalog = MovieCatalog((d["content"], d["metadata"]) for d in self.documents)
+    
+    def test_round_trip(self):
+        """Le catalogue restitue les documents d'origine."""
+        for document in self.documents:
+            expected = dict(document["metadata"])
+            expected.pop("content_hash")
+            movie = self.catalog.get(expected["id"])
+            
+            self.assertEqual(movie["content"], document["content"])
+            self.assertEqual(movie["metadata"], expected)
+    
+    def test_columns(self):
+        """Les colonnes sont typées et compactes."""
+        row = self.catalog.row_of(self.documents[2]["metadata"]["id"])
+        
+        self.assertEqual(row, 2)
+        self.assertEqual(self.catalog.years.dtype, np.int16)
+        self.assertEqual(self.catalog.ratings.dtype, np.float32)
+        self.assertIsNone(self.catalog.row_of(-1))
+        self.assertLess(self.catalog.nbytes, sum(len(d["content"]) for d in self.documents) * 2)
+    
+    def test_many_genre_names(self):
+        """Le nombre de noms de genres distincts n'est pas limité."""
+        processor = MovieDataProcessor()
+        movies = [make_movie(i, f"Film {i}", genre=(f"Genre {i}", "Drame")) for i in range(300)]
+        documents = [processor.format_movie_for_rag(movie) for movie in movies]
+        
+        catalog = MovieCatalog((d["content"], d["metadata"]) for d in documents)
+        
+        self.assertEqual(len(catalog.genre_names), 301)
+        self.assertEqual(catalog.genres(299), ["Genre 299", "Drame"])
+        self.assertTrue(catalog.filter_mask(genre_mask(["Drame"])).all())
+    
+    def test_answer_snippets(self):
+        """Les extraits de réponse précalculés sont ceux dérivés du document."""
+        for document in self.documents:
+            row = self.catalog.row_of(document["metadata"]["id"])
+            movie = self.catalog.get(document["metadata"]["id"])
+            doc = SearchHit(movie["metadata"]["id"], 0.0, movie["content"], movie["metadata"])
+            
+            self.assertEqual(self.catalog.snippet(row), SimpleLLM._snippet(doc))
+    
+    def test_snippet_without_description(self):
+        """Sans ligne de description, l'extrait reprend le début du document."""
+        catalog = MovieCatalog([("Énorme " * 100, {"id": 1, "title": "Été", "year": "1999"})])
+        
+        self.assertTrue(catalog.snippet(0).startswith("**Été** (1999) - Note: 0.0/10\n"))
+        self.assertTrue(catalog.snippet(0).endswith("   " + ("Énorme " * 100)[:500]))
+    
+    def test_genre_masks(self):
+        """Le masque canonique ignore l'orthographe des genres."""
+        catalog = MovieCatalog([
+            ("a", {"id": 1, "genre": json.dumps(["Science-Fiction", "Comédie"])}),
+            ("b", {"id": 2, "genre": json.dumps(["Sci-Fi"])}),
+            ("c", {"id": 3, "genre": json.dumps([])}),
+        ])
+        
+        self.assertEqual(int(catalog.genre_masks[0]),
+                         GENRE_BITS["science-fiction"] | GENRE_BITS["comedie"])
+        self.assertEqual(int(catalog.genre_masks[1]), GENRE_BITS["science-fiction"])
+        self.assertEqual(int(catalog.genre_masks[2]), 0)
+    
+    def test_filter_mask(self):
+        """Les filtres structurés se combinent en un masque de lignes."""
+        catalog = MovieCatalog([
+            ("a", {"id": 1, "year": "1999", "rating": 8.0, "genre": json.dumps(["Drame"])}),
+            ("b", {"id": 2, "year": "2010", "rating": 6.0, "genre": json.dumps(["Drama"])}),
+            ("c", {"id": 3, "year": "2012", "rating": 9.0, "genre": json.dumps(["Action"])}),
+            ("d", {"id": 4, "year": "N/A", "rating": 9.5, "genre": json.dumps(["Drame"])}),
+        ])
+        
+        self.assertIsNone(catalog.filter_mask())
+        self.assertEqual(catalog.filter_mask(genres=genre_mask(["drame"])).tolist(),
+                         [True, True, False, True])
+        self.assertEqual(catalog.filter_mask(min_year=2000, max_year=2011).tolist(),
+                         [False, True, False, False])
+        self.assertEqual(catalog.filter_mask(min_rating=7, exclude_ids={3, 99}).tolist(),
+                         [True, False, False, True])
+
+
+class TestGenres(unittest.TestCase):
+    """Tests du vocabulaire de genres."""
+    
+    def test_normalize_genre(self):
+        """Les variantes d'un genre donnent le même genre canonique."""
+        for name in ("Science-Fiction", "Sci-Fi", "science fiction"):
+            self.assertEqual(normalize_genre(name), "science-fiction")
+        self.assertEqual(normalize_genre("Comédie"), "comedie")
+        self.assertEqual(normalize_genre("Histoire"), "historique")
+        self.assertIsNone(normalize_genre("Inconnu"))
+    
+    def test_genre_mask(self):
+        """Le masque contient un bit par genre reconnu."""
+        self.assertEqual(genre_mask(["Drama", "drame", "Action", "Inconnu"]),
+                         GENRE_BITS["drame"] | GENRE_BITS["action"])
+        self.assertEqual(genre_mask([]), 0)
+    
+    def test_extract_genres(self):
+        """Les genres sont détectés sans tenir compte des accents."""
+        self.assertEqual(extract_genres("Une COMÉDIE d'horreur"), ["comedie", "horreur"])
+        self.assertEqual(extract_genres("Un bon film"), [])
+    
+    def test_extract_genres_whole_words(self):
+        """Les mots-clés courts ne correspondent qu'à des mots entiers."""
+        self.assertEqual(extract_genres("Un transfert réussi"), [])
+        self.assertEqual(extract_genres("Un film de SF"), ["science-fiction"])
+        self.assertEqual(extract_genres("Des westerns et des thrillers"), ["thriller", "western"])
+        self.assertEqual(extract_genres("Des films animés"), ["animation"])
+    
+    def test_extract_genres_hyphenated(self):
+        """Les formes composées avec trait d'union donnent chacun de leurs genres."""
+        self.assertEqual(extract_genres("Un film d'action-aventure"), ["action", "aventure"])
+        self.assertEqual(extract_genres("Un drame-thriller"), ["drame", "thriller"])
+        self.assertEqual(extract_genres("De la sci-fi"), ["science-fiction"])
+        self.assertEqual(extract_genres("Une come\u0301die"), ["comedie"])  # accent décomposé
+
+
+class TestProfileEncoder(unittest.TestCase):
+    """Tests des vecteurs de profil."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test."""
+        self.embeddings = FakeEmbeddings()
+        self.encoder = ProfileEncoder(
+            lambda texts: np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        )
+        self.keys = ["action", "drame"]
+        self.centroids = np.eye(2, 16, dtype=np.float32)
+        self.encoder.set_centroids(self.keys, self.centroids)
+    
+    def test_genre_centroids(self):
+        """Le centroïde d'un genre est la moyenne normalisée de ses films."""
+        counts = np.array([[1, 0], [1, 1], [0, 2]], dtype=np.uint8)
+        matrix = np.array([[1, 0], [0, 1], [0, 1]], dtype=np.float32)
+        
+        centroids = genre_centroids(counts, matrix)
+        
+        np.testing.assert_allclose(centroids, [[2 ** -0.5, 2 ** -0.5], [0, 1]], rtol=1e-6)
+    
+    def test_full_genre_distribution(self):
+        """Toutes les préférences de genre pèsent, pas seulement les deux premières."""
+        vector = self.encoder.encode({"genres": {"action": 3, "drame": 1, "western": 0}})
+        
+        np.testing.assert_allclose(vector[:2], np.array([3, 1]) / 10 ** 0.5, rtol=1e-6)
+        self.assertEqual(self.embeddings.calls, 0)
+    
+    def test_texts_encoded_once(self):
+        """Humeurs, description et genres sans centroïde sont encodés une seule fois."""
+        profiles = [
+            {"genres": {"action": 3, "western": 2}, "mood": ["Sombre"]},
+            {"genres": {"drame": 1}, "mood": ["Sombre"], "description": "Un duel"},
+            {"mood": ["Sombre"], "genres": {"western": 2, "action": 3}, "periode": "Années 80-90"},
+        ]
+        
+        vectors = self.encoder.encode_many(profiles)
+        
+        self.assertEqual(self.embeddings.calls, 3)
+        np.testing.assert_array_equal(vectors[0], vectors[2])
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1, rtol=1e-6)
+        self.assertEqual(self.encoder.stats()["entries"], 2)
+    
+    def test_new_centroids_clear_cache(self):
+        """Un nouvel index invalide les vecteurs de profil en cache."""
+        profile = {"genres": {"action": 1}}
+        before = self.encoder.encode(profile)
+        
+        self.encoder.set_centroids(self.keys, self.centroids[::-1])
+        
+        self.assertEqual(len(self.encoder.cache), 0)
+        self.assertFalse(np.array_equal(self.encoder.encode(profile), before))
+
+
+class TestLexicalIndex(unittest.TestCase):
+    """Tests de l'index BM25 sur les noms."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test."""
+        processor = MovieDataProcessor()
+        processor.movies_data = [
+            dict(make_movie(1, "Inception"), director="Christopher Nolan",
+                 actors=["Leonardo DiCaprio", "Elliot Page"]),
+            dict(make_movie(2, "Titanic"), director="James Cameron",
+                 actors=["Leonardo DiCaprio", "Kate Winslet"]),
+            dict(make_movie(3, "Avatar"), director="James Cameron",
+                 actors=["Sam Worthington"]),
+            dict(make_movie(4, "Le Seigneur des Anneaux"), director="Peter Jackson",
+                 actors=["Elijah Wood"]),
+            dict(make_movie(5, "Une Nuit"), director="Christopher Guest",
+                 actors=["Actor A"]),
+        ]
+        documents = processor.format_movies_for_rag()
+        self.catalog = MovieCatalog((d["content"], d["metadata"]) for d in documents)
+        self.index = LexicalIndex(self.catalog)
+    
+    def titles(self, hits):
+        return [self.catalog.titles[hit.row] for hit in hits]
+    
+    def test_tokenize(self):
+        """Les mots vides et les accents sont retirés."""
+        self.assertEqual(tokenize("Les films de Jean-Pierre Jeunet"), ["jean", "pierre", "jeunet"])
+        self.assertEqual(tokenize("Élodie"), ["elodie"])
+    
+    def test_lookup_names(self):
+        """Titres, noms complets et noms de famille sont reconnus."""
+        self.assertEqual(sorted(self.titles(self.index.lookup("films de James Cameron", 5))),
+                         ["Avatar", "Titanic"])
+        self.assertEqual(sorted(self.titles(self.index.lookup("avec Leonardo DiCaprio", 5))),
+                         ["Inception", "Titanic"])
+        self.assertEqual(self.titles(self.index.lookup("Nolan", 5)), ["Inception"])
+        self.assertEqual(self.titles(self.index.lookup("le seigneur des anneaux", 5)),
+                         ["Le Seigneur des Anneaux"])
+        self.assertEqual(self.titles(self.index.lookup("un drame avec Sam Worthington", 5)),
+                         ["Avatar"])
+    
+    def test_lookup_needs_confident_match(self):
+        """Un prénom seul ou un mot de titre isolé ne suffit pas."""
+        self.assertEqual(self.index.lookup("Christopher", 5), [])
+        self.assertEqual(self.index.lookup("seigneur", 5), [])
+        self.assertEqual(self.titles(self.index.lookup("une nuit", 5)), ["Une Nuit"])
+        self.assertEqual(self.index.lookup("James Cameron et Peter Jackson", 5), [])
+        self.assertEqual(self.index.lookup("un drame", 5), [])
+    
+    def test_search_ranks_by_bm25(self):
+        """La recherche classe par BM25 et respecte le masque."""
+        hits = self.index.search("James Cameron et Peter Jackson", 5)
+        self.assertEqual(sorted(self.titles(hits)), ["Avatar", "Le Seigneur des Anneaux", "Titanic"])
+        
+        mask = np.array([True, False, True, True, True])
+        self.assertEqual(self.titles(self.index.lookup("James Cameron", 5, mask)), ["Avatar"])
+        self.assertEqual(self.index.search("Zorglub", 5), [])
+    
+    def test_reciprocal_rank_fusion(self):
+        """La fusion favorise les films bien classés dans les deux listes."""
+        vector = [SearchHit(3, 0.9, row=2), SearchHit(2, 0.8, row=1), SearchHit(1, 0.7, row=0)]
+        lexical = [SearchHit(2, 5.0, row=1), SearchHit(4, 4.0, row=3)]
+        
+        fused = reciprocal_rank_fusion([vector, lexical], 3)
+        
+        self.assertEqual([hit.row for hit in fused], [1, 2, 3])
+        self.assertAlmostEqual(fused[0].score, 1 / 62 + 1 / 61)
+
+
+class TestMatchScoring(unittest.TestCase):
+    """Tests du score de correspondance vectorisé."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test."""
+        processor = MovieDataProcessor()
+        processor.load_sample_movies()
+        documents = processor.format_movies_for_rag()
+        self.catalog = MovieCatalog((d["content"], d["metadata"]) for d in documents)
+    
+    def _reference_score(self, profile, row):
+        # Calcul film par film, tel qu'il était fait pour chaque suggestion
+        preferences = profile["genres"]
+        raw = sum(preferences.get(profile_genre_key(g), 0) for g in self.catalog.genres(row))
+        return round(min(100.0, raw / sum(preferences.values()) * 100), 1)
+    
+    def test_matches_per_movie_formula(self):
+        """Le produit matriciel donne les mêmes scores que le calcul par film."""
+        profiles = [
+            {"genres": {"action": 5, "science-fiction": 4, "drame": 1}},
+            {"genres": {"horreur": 3, "romantique": 2, "comedie": 2}},
+        ]
+        rows = np.arange(len(self.catalog))
+        
+        for profile in profiles:
+            weights = profile_weights(profile, self.catalog.profile_keys)
+            scores = match_scores(self.catalog.profile_genre_counts[rows], weights)
+            self.assertEqual(scores.tolist(),
+                             [self._reference_score(profile, row) for row in rows])
+    
+    def test_thriller_counts_as_horreur(self):
+        """Thriller et horreur comptent chacun pour la clé horreur."""
+        catalog = MovieCatalog([
+            ("a", {"id": 1, "genre": json.dumps(["Thriller", "Horreur"])}),
+            ("b", {"id": 2, "genre": json.dumps(["Romance"])}),
+        ])
+        weights = profile_weights({"genres": {"horreur": 1, "romantique": 3}},
+                                  catalog.profile_keys)
+        
+        self.assertEqual(match_scores(catalog.profile_genre_counts, weights).tolist(),
+                         [50.0, 75.0])
+    
+    def test_empty_profile(self):
+        """Un profil sans préférence donne des scores nuls."""
+        weights = profile_weights({"genres": {}}, self.catalog.profile_keys)
+        
+        self.assertIsNone(weights)
+        self.assertEqual(match_scores(self.catalog.profile_genre_counts[:3], weights).tolist(),
+                         [0.0, 0.0, 0.0])
+    
+    def test_blend_scores(self):
+        """Le mélange pondère similarité et score de correspondance."""
+        similarities = [0.9, 0.5]
+        scores = np.array([0.0, 100.0])
+        
+        self.assertEqual(blend_scores(similarities, scores, 0).tolist(), [0.9, 0.5])
+        self.assertEqual(blend_scores(similarities, scores, 1).tolist(), [0.0, 1.0])
+        self.assertAlmostEqual(blend_scores(similarities, scores, 0.5)[1], 0.75)
+
+
+class TestDiversity(unittest.TestCase):
+    """Tests du re-classement par pertinence marginale maximale."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test."""
+        self.vectors = np.asarray([
+            [1.0, 0.0, 0.0],
+            [1.0, 0.0, 0.0],   # doublon du premier
+            [0.0, 1.0, 0.0],
+            [0.0, 0.0, 1.0],
+        ], dtype=np.float32)
+        self.relevance = [0.9, 0.85, 0.5, 0.6]
+    
+    def test_relevance_only(self):
+        """Avec lambda = 1, l'ordre de pertinence est conservé."""
+        self.assertEqual(mmr(self.relevance, self.vectors, 4, 1.0).tolist(), [0, 1, 3, 2])
+    
+    def test_duplicate_is_skipped(self):
+        """Un doublon du premier choix passe après des films différents."""
+        self.assertEqual(mmr(self.relevance, self.vectors, 3, 0.5).tolist(), [0, 3, 2])
+        self.assertEqual(mmr(self.relevance, self.vectors, 2, 0.0)[1], 2)
+    
+    def test_bounds(self):
+        """k est borné par le nombre de candidats et lambda par [0, 1]."""
+        self.assertEqual(sorted(mmr(self.relevance, self.vectors, 10, 0.5).tolist()), [0, 1, 2, 3])
+        self.assertEqual(len(mmr(self.relevance, self.vectors, 0, 0.5)), 0)
+        self.assertEqual(mmr(self.relevance, self.vectors, 4, 5.0).tolist(), [0, 1, 3, 2])
+        self.assertEqual(mmr([1.0, 1.0], self.vectors[:2], 2, 0.5).tolist(), [0, 1])
+
+
+class TestVectorIndex(unittest.TestCase):
+    """Tests des backends d'index vectoriel."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test."""
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((50, 8)).astype(np.float32)
+        self.vectors /= np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        client = chromadb.EphemeralClient()
+        self.collection = client.get_or_create_collection(f"test_{self.id()}")
+        self.collection.add(
+            ids=[str(i) for i in range(50)],
+            embeddings=self.vectors.tolist(),
+            documents=[f"Film {i}" for i in range(50)],
+            metadatas=[{"id": i} for i in range(50)]
+        )
+        self.addCleanup(client.delete_collection, self.collection.name)
+    
+    def test_backends_agree(self):
+        """Tous les backends renvoient les mêmes voisins dans le même format."""
+        query = self.vectors[7]
+        for backend in VECTOR_BACKENDS:
+            if backend == "faiss" and faiss is None:
+                continue
+            with self.subTest(backend=backend):
+                hits = build_vector_index(backend, self.collection).search(query, 5)
+                
+                self.assertEqual(len(hits), 5)
+                self.assertEqual(hits[0].id, 7)
+                self.assertAlmostEqual(hits[0].score, 1.0, places=4)
+                self.assertEqual([h.score for h in hits], sorted((h.score for h in hits), reverse=True))
+    
+    def test_masked_search(self):
+        """Le masque est appliqué dans la recherche et renvoie k résultats valides."""
+        mask = np.zeros(50, dtype=bool)
+        mask[10:20] = True
+        for backend in VECTOR_BACKENDS:
+            if backend == "faiss" and faiss is None:
+                continue
+            with self.subTest(backend=backend):
+                index = build_vector_index(backend, self.collection,
+                                           ids=np.arange(50), vectors=self.vectors)
+                
+                hits = index.search(self.vectors[7], 5, mask)
+                
+                self.assertEqual(len(hits), 5)
+                self.assertTrue(all(10 <= h.id < 20 for h in hits))
+                self.assertEqual(len(index.search(self.vectors[7], 20, mask)), 10)
+                self.assertEqual(index.search(self.vectors[7], 5, np.zeros(50, dtype=bool)), [])
+    
+    def test_large_mask_on_chroma(self):
+        """Un masque de dizaines de milliers d'ids est appliqué sans filtre SQL géant."""
+        count = 40000
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((count, 4)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        client = chromadb.EphemeralClient()
+        collection = client.get_or_create_collection(f"large_{self.id()}")
+        self.addCleanup(client.delete_collection, collection.name)
+        for start in range(0, count, 5000):
+            stop = start + 5000
+            collection.add(ids=[str(i) for i in range(start, stop)],
+                           embeddings=vectors[start:stop].tolist(),
+                           metadatas=[{"id": i} for i in range(start, stop)])
+        index = build_vector_index("chroma", collection, ids=np.arange(count))
+        exact = build_vector_index("numpy", collection, ids=np.arange(count), vectors=vectors)
+        mask = np.arange(count) % 2 == 0
+        mask[:100] = False
+        
+        with patch.object(collection, 'query', wraps=collection.query) as query:
+            hits = index.search_batch(vectors[[1, 2]], 5, mask)
+        
+        self.assertTrue(all(call.kwargs["where"] is None for call in query.call_args_list))
+        for query_hits, vector in zip(hits, vectors[[1, 2]]):
+            self.assertEqual(len(query_hits), 5)
+            self.assertTrue(all(mask[hit.id] for hit in query_hits))
+            best = exact.search(vector, 1, mask)[0]
+            self.assertEqual(query_hits[0].id, best.id)
+    
+    def test_search_batch_matches_search(self):
+        """La recherche groupée renvoie les mêmes résultats que requête par requête."""
+        queries = self.vectors[[3, 7, 42]]
+        mask = np.arange(50) % 3 == 0
+        for backend in VECTOR_BACKENDS:
+            if backend == "faiss" and faiss is None:
+                continue
+            with self.subTest(backend=backend):
+                index = build_vector_index(backend, self.collection,
+                                           ids=np.arange(50), vectors=self.vectors)
+                for batch_mask in (None, mask):
+                    batched = index.search_batch(queries, 4, batch_mask)
+                    single = [index.search(query, 4, batch_mask) for query in queries]
+                    
+                    self.assertEqual([[h.id for h in hits] for hits in batched],
+                                     [[h.id for h in hits] for hits in single])
+    
+    def test_unknown_backend(self):
+        """Un backend inconnu est refusé."""
+        with self.assertRaises(ValueError):
+            build_vector_index("annoy", self.collection)
+    
+    def test_quantized_matches_float32(self):
+        """Les index quantifiés renvoient les voisins et scores exacts après re-scoring."""
+        exact = NumpyIndex(np.arange(50), self.vectors)
+        queries = self.vectors[[3, 7, 42]]
+        mask = np.arange(50) % 3 == 0
+        for precision in QuantizedIndex.PRECISIONS:
+            with self.subTest(precision=precision):
+                index = build_vector_index("numpy", self.collection, precision=precision,
+                                           rescore_factor=3)
+                
+                for batch_mask in (None, mask):
+                    expected = exact.search_batch(queries, 5, batch_mask)
+                    for hits, query, reference in zip(index.search_batch(queries, 5, batch_mask),
+                                                      queries, expected):
+                        self.assertEqual([h.id for h in hits], [h.id for h in reference])
+                        self.assertEqual([h.id for h in index.search(query, 5, batch_mask)],
+                                         [h.id for h in reference])
+                        for hit, ref in zip(hits, reference):
+                            self.assertAlmostEqual(hit.score, ref.score, places=5)
+                self.assertEqual(index.search(queries[0], 5, np.zeros(50, dtype=bool)), [])
+    
+    def test_int8_codes(self):
+        """Le codage int8 est symétrique avec une échelle par vecteur."""
+        index = QuantizedIndex(np.arange(50), self.vectors, "int8")
+        
+        self.assertEqual(index.codes.dtype, np.int8)
+        self.assertEqual(int(np.abs(index.codes).max(axis=1).min()), 127)
+        decoded = index.codes * index.scales[:, None]
+        self.assertLess(float(np.abs(decoded - self.vectors).max()), float(index.scales.max()))
+        self.assertEqual(index.nbytes, index.codes.nbytes + index.scales.nbytes + self.vectors.nbytes)
+    
+    def test_rescore_vectors_on_disk(self):
+        """Les vecteurs float32 du re-scoring sont mappés depuis le disque."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        
+        first = QuantizedIndex(np.arange(50), self.vectors, "float16", directory=directory)
+        second = QuantizedIndex(np.arange(50), self.vectors, "float16", directory=directory)
+        
+        self.assertIsInstance(second.matrix, np.memmap)
+        self.assertEqual(second.nbytes, second.codes.nbytes)
+        self.assertEqual(os.listdir(directory), [os.path.basename(second.path)])
+        # The first index keeps serving from its own mapping
+        self.assertEqual(first.search(self.vectors[7], 1)[0].id, 7)
+        self.assertEqual(second.search(self.vectors[7], 1)[0].id, 7)
+    
+    def test_vectors_by_row(self):
+        """Chaque backend renvoie les vecteurs stockés des lignes demandées."""
+        rows = np.array([7, 3, 42])
+        for backend in VECTOR_BACKENDS:
+            if backend == "faiss" and faiss is None:
+                continue
+            with self.subTest(backend=backend):
+                index = build_vector_index(backend, self.collection,
+                                           ids=np.arange(50), vectors=self.vectors)
+                
+                np.testing.assert_allclose(index.vectors(rows), self.vectors[rows], atol=1e-6)
+    
+    def test_unknown_precision(self):
+        """Une précision inconnue ou sans backend numpy est refusée."""
+        with self.assertRaises(ValueError):
+            build_vector_index("numpy", self.collection, precision="int4")
+        with self.assertRaises(ValueError):
+            build_vector_index("chroma", self.collection, precision="int8")
+
+
+
+class TestIndexingPipeline(unittest.TestCase):
+    """Tests du pipeline d'indexation par lots."""
+    
+    def setUp(self):
+        """Initialisation avant chaque test."""
+        client = chromadb.EphemeralClient()
+        self.collection = client.get_or_create_collection(f"test_{self.id()}")
+        self.addCleanup(client.delete_collection, self.collection.name)
+        processor = MovieDataProcessor()
+        processor.movies_data = [make_movie(i, f"Film {i}") for i in range(1, 8)]
+        self.documents = processor.format_movies_for_rag()
+    
+    def test_batches_and_commits(self):
+        """Les documents sont embarqués par lots et tous écrits."""
+        embeddings = FakeEmbeddings()
+        pipeline = IndexingPipeline(embeddings, self.collection, batch_size=2, commit_size=3)
+        
+        stats = pipeline.run(iter(self.documents))
+        
+        self.assertEqual(stats["documents"], 7)
+        self.assertEqual(self.collection.count(), 7)
+        self.assertEqual(embeddings.calls, 7)
+    
+    def test_worker_processes(self):
+        """Les lots peuvent être répartis sur des processus."""
+        pipeline = IndexingPipeline(FakeEmbeddings(), self.collection, batch_size=3,
+                                    workers=2, embeddings_factory=FakeEmbeddings)
+        
+        stats = pipeline.run(iter(self.documents))
+        stored = self.collection.get(ids=["4"], include=["embeddings"])
+        
+        self.assertEqual(stats["documents"], 7)
+        expected = FakeEmbeddings().embed_query(self.documents[3]["content"])
+        np.testing.assert_allclose(stored["embeddings"][0], expected, rtol=1e-5)
+    
+    def test_collection_read_in_pages(self):
+        """La collection est relue par pages, sans doublon ni oubli."""
+        IndexingPipeline(FakeEmbeddings(), self.collection).run(iter(self.documents))
+        
+        pages = list(iter_collection_pages(self.collection, ["metadatas"], 3))
+        
+        self.assertEqual([len(page["ids"]) for page in pages], [3, 3, 1])
+        self.assertEqual(sorted(int(i) for page in pages for i in page["ids"]), list(range(1, 8)))
+
+
 if __name__ == "__main__":
     unittest.main()